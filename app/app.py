@@ -1,16 +1,40 @@
 import dash_bootstrap_components as dbc
 from dash_extensions.enrich import Input, Output, State, html, dcc, dash_table
 from dash_extensions.enrich import DashProxy, MultiplexerTransform, LogTransform, NoOutputTransform
+from dash_extensions import EventSource
 import dash
+from dash import ClientsideFunction
+from flask import Response, abort, g, has_request_context, jsonify, request, send_file
 from rich import print
-import requests as r
 import logging
 import sys
 import os
-from datetime import datetime, timedelta
 import locale
 import json
 import time
+import threading
+
+from app.cache import ResultCache, fingerprint
+from app.paging import query_rows
+from app.push import Broadcaster, StreamSlots, table_diff
+from app.responses import encode_body, encoded_response, not_modified
+from app.predictions import load_prediction
+from app.store import STORE_PATH, content_hash, open_predictions
+from app.submissions import FORBIDDEN, SubmissionLog, entry_predictions, submission_file, validate
+from app.watcher import PredictionsWatcher
+from app.live import API_URL, ResultsPoller
+from app.constants import MATCH_SLOTS, TEAMS_ES_EN, TEAMS_NAMES_CODES
+from app.snapshot import SNAPSHOT_DIR, SnapshotStore
+from app.flags import HASHED_ASSET, write_sprite
+from app.database import Database
+from app.elimination import eliminate
+from app.export import chunked, csv_lines, grid_npz, grid_records, ndjson_lines
+from app.fixtures import Fixtures, Stage
+from app.jobs import JobQueue
+from app.leagues import LEAGUE_KEY, LeagueRouter, league_dirs
+from app.odds import simulate
+from app.metrics import CONTENT_TYPE, METRICS_DIR, SIZE_BUCKETS, Registry
+from app.scoring import EXACT, OUTCOME, MISS, DEFAULT_RULES, STAT_COLUMNS, ResultVector, Leaderboard, load_rules, rank, scoring_rules
 
 # Init logging
 logging.basicConfig(
@@ -35,208 +59,111 @@ try:
 except locale.Error:
     locale.setlocale(locale.LC_TIME, 'en_US.UTF-8')
 
-MATCH_TAGS = [
-    'Alemania-Escocia',
-    'Hungría-Suiza',
-    'España-Croacia',
-    'Italia-Albania',
-    'Eslovenia-Dinamarca',
-    'Serbia-Inglaterra',
-    'Polonia-Países Bajos',
-    'Austria-Francia',
-    'Rumanía-Ucrania',
-    'Bélgica-Eslovaquia',
-    'Turquía-Georgia',
-    'Portugal-República Checa',
-    'Alemania-Hungría',
-    'Escocia-Suiza',
-    'Croacia-Albania',
-    'España-Italia',
-    'Eslovenia-Serbia',
-    'Dinamarca-Inglaterra',
-    'Polonia-Austria',
-    'Países Bajos-Francia',
-    'Eslovaquia-Ucrania',
-    'Bélgica-Rumanía',
-    'Georgia-República Checa',
-    'Turquía-Portugal',
-    'Suiza-Alemania',
-    'Escocia-Hungría',
-    'Albania-España',
-    'Croacia-Italia',
-    'Inglaterra-Eslovenia',
-    'Dinamarca-Serbia',
-    'Países Bajos-Austria',
-    'Francia-Polonia',
-    'Eslovaquia-Rumanía',
-    'Ucrania-Bélgica',
-    'Georgia-Portugal',
-    'República Checa-Turquía',
-    '2024-06-29 18:00',
-    '2024-06-29 21:00',
-    '2024-06-30 18:00',
-    '2024-06-30 21:00',
-    '2024-07-01 18:00',
-    '2024-07-01 21:00',
-    '2024-07-02 18:00',
-    '2024-07-02 21:00',
-    '2024-07-05 18:00',
-    '2024-07-05 21:00',
-    '2024-07-06 18:00',
-    '2024-07-06 21:00',
-    '2024-07-09 21:00 49',
-    '2024-07-10 21:00 50',
-    '2024-07-14 21:00'
-]
+# SCORING RULES, points per stat column and the real champion of the league
+SCORING_RULES = os.environ.get('SCORING_RULES', 'app/assets/scoring.json')
+RULES = load_rules(SCORING_RULES) if os.path.exists(SCORING_RULES) else DEFAULT_RULES
 
-TEAMS_EN_ES = {
-    'Albania': 'Albania',
-    'Austria': 'Austria',
-    'Belgium': 'Bélgica',
-    'Croatia': 'Croacia',
-    'Czech Republic': 'República Checa',
-    'Denmark': 'Dinamarca',
-    'England': 'Inglaterra',
-    'France': 'Francia',
-    'Georgia': 'Georgia',
-    'Germany': 'Alemania',
-    'Hungary': 'Hungría',
-    'Italy': 'Italia',
-    'Netherlands': 'Países Bajos',
-    'Poland': 'Polonia',
-    'Portugal': 'Portugal',
-    'Romania': 'Rumanía',
-    'Scotland': 'Escocia',
-    'Serbia': 'Serbia',
-    'Slovakia': 'Eslovaquia',
-    'Slovenia': 'Eslovenia',
-    'Spain': 'España',
-    'Switzerland': 'Suiza',
-    'Turkey': 'Turquía',
-    'Ukraine': 'Ucrania'
-}
+# LOAD PREDICTIONS
+BASE_DIR = os.environ.get('PREDICTIONS_DIR', 'app/assets/predictions/')
+PREDICTIONS_STORE = os.environ.get('PREDICTIONS_STORE', STORE_PATH)
 
-TEAMS_ES_EN = {v: k for k, v in TEAMS_EN_ES.items()}
-
-TEAMS_NAMES_CODES = {'Germany': 'GER',
-                     'Scotland': 'SCO',
-                     'Hungary': 'HUN',
-                     'Switzerland': 'SUI',
-                     'Spain': 'ESP',
-                     'Croatia': 'CRO',
-                     'Italy': 'ITA',
-                     'Albania': 'ALB',
-                     'Slovenia': 'SVN',
-                     'Denmark': 'DEN',
-                     'Serbia': 'SRB',
-                     'England': 'ENG',
-                     'Poland': 'POL',
-                     'Netherlands': 'NED',
-                     'Austria': 'AUT',
-                     'France': 'FRA',
-                     'Romania': 'ROU',
-                     'Ukraine': 'UKR',
-                     'Belgium': 'BEL',
-                     'Slovakia': 'SVK',
-                     'Turkey': 'TUR',
-                     'Georgia': 'GEO',
-                     'Portugal': 'POR',
-                     'Czech Republic': 'CZE'}
+# Predictions submitted through /submissions, replayed on top of the files
+SUBMISSIONS_LOG = os.environ.get('SUBMISSIONS_LOG')
 
-# LOAD PREDICTIONS
-BASE_DIR = 'app/assets/predictions/'
-
-files = os.listdir(BASE_DIR)
-files.sort()
-
-PREDICTIONS = {}
-
-for file in files:
-    clean_preds = []
-    with open(BASE_DIR + file, 'r') as f:
-        preds = f.readlines()
-        for pred in preds:
-            clean_pred = pred.strip()
-            if clean_pred != '':
-                clean_preds.append(clean_pred)
-    PREDICTIONS[file] = clean_preds
-
-COLUMNS = [
-    {
-        "name": 'Date',
-        "id": 'date'
-    },
-    {
-        "name": 'Home vs Away',
-        "id": 'match',
-        "presentation": "markdown"
-    },
-    {
-        "name": 'Result',
-        "id": 'result',
-    },
-    *[
+# Optional SQLite mirror of the league, set DATABASE to its path
+DATABASE = os.environ.get('DATABASE')
+
+# One process can serve several leagues, a directory each under LEAGUES_DIR.
+# Without it the single league configured above is served.
+LEAGUES_DIR = os.environ.get('LEAGUES_DIR')
+
+def matches_columns(files):
+    return [
+        {
+            "name": 'Date',
+            "id": 'date'
+        },
         {
-            "name": name.split('.')[0].title(),
-            "id": name,
+            "name": 'Home vs Away',
+            "id": 'match',
             "presentation": "markdown"
-        }
-        for name in files
+        },
+        {
+            "name": 'Result',
+            "id": 'result',
+        },
+        *[
+            {
+                "name": name.split('.')[0].title(),
+                "id": name,
+                "presentation": "markdown"
+            }
+            for name in files
+        ]
     ]
-]
 
-TABLE_STYLE_CELL_CONDITIONAL = [
-    {'if': {'column_id': 'date'}, 'width': '20px', 'white-space': 'normal'},
-    {'if': {'column_id': 'match'}, 'width': '120px'},
-    {'if': {'column_id': 'result'}, 'width': '20px'},
-    *[
-        {'if': {'column_id': name}, 'width': '50px', }
-        for name in files
+
+def matches_style_cell_conditional(files):
+    return [
+        {'if': {'column_id': 'date'}, 'width': '20px', 'white-space': 'normal'},
+        {'if': {'column_id': 'match'}, 'width': '120px'},
+        {'if': {'column_id': 'result'}, 'width': '20px'},
+        *[
+            {'if': {'column_id': name}, 'width': '50px', }
+            for name in files
+        ]
     ]
-]
 
-CLASSIFICATION_COLUMNS = [
-    {
-        "name": 'Pos.',
-        "id": 'position'
-    },
-    {
-        "name": 'Nombre participante',
-        "id": 'nombre'
-    },
-    {
-        "name": 'Total ptos',
-        "id": 'total',
-    },
-    {
-        "name": 'Res. exacto (10 ptos)',
-        "id": 'res_exacto'
-    },
-    {
-        "name": 'Res. partido (5 ptos)',
-        "id": 'res_partido',
-    },
-    {
-        "name": 'Eq. octavos (6 ptos)',
-        "id": 'octavos',
-    },
-    {
-        "name": 'Eq. cuartos (12 ptos)',
-        "id": 'cuartos',
-    },
-    {
-        "name": 'Eq. semis (24 ptos)',
-        "id": 'semis',
-    },
-    {
-        "name": 'Eq. final (48 ptos)',
-        "id": 'final',
-    },
-    {
-        "name": 'Eq. campeón (50 ptos)',
-        "id": 'campeon',
-    }
-]
+
+# Participant columns are sent one page at a time, unless picked by name
+PARTICIPANTS_PER_PAGE = 25
+
+
+def participant_pages(files):
+    return max(1, -(-len(files) // PARTICIPANTS_PER_PAGE))
+
+
+def visible_participants(files, participants, participants_page):
+    if participants:
+        available = set(files)
+        return [name for name in participants if name in available]
+    page = min(participants_page or 1, participant_pages(files)) - 1
+    return files[page * PARTICIPANTS_PER_PAGE:(page + 1) * PARTICIPANTS_PER_PAGE]
+
+
+STAT_LABELS = {
+    'res_exacto': 'Res. exacto',
+    'res_partido': 'Res. partido',
+    'octavos': 'Eq. octavos',
+    'cuartos': 'Eq. cuartos',
+    'semis': 'Eq. semis',
+    'final': 'Eq. final',
+    'campeon': 'Eq. campeón',
+}
+
+
+def classification_columns(points):
+    return [
+        {
+            "name": 'Pos.',
+            "id": 'position'
+        },
+        {
+            "name": 'Nombre participante',
+            "id": 'nombre'
+        },
+        {
+            "name": 'Total ptos',
+            "id": 'total',
+        },
+        *[
+            {
+                "name": f'{STAT_LABELS[column]} ({value} ptos)',
+                "id": column
+            }
+            for column, value in zip(STAT_COLUMNS, points)
+        ]
+    ]
 
 CLASSIFICATION_TABLE_STYLE_CELL_CONDITIONAL = [
     {'if': {'column_id': 'position'}, 'width': '1%'},
@@ -252,6 +179,22 @@ CLASSIFICATION_TABLE_STYLE_CELL_CONDITIONAL = [
 ]
 
 
+def team_code(team):
+    return TEAMS_NAMES_CODES[TEAMS_ES_EN[team]]
+
+
+# Team names by flag code, sent once with the layout so the cells can travel
+# as codes and be rendered in the browser (assets/cells.js)
+TEAM_NAMES = {team_code(team): team for team in TEAMS_ES_EN}
+
+# One cacheable sprite for every flag, single PNGs if it cannot be written
+try:
+    FLAG_SPRITE, SPRITE_CODES = write_sprite()
+except (OSError, ValueError) as e:
+    log.info(f'Error writing the flag sprite: {e}')
+    FLAG_SPRITE, SPRITE_CODES = None, []
+
+
 app = DashProxy(
     __name__,
     title="Euro 2024 league",
@@ -268,526 +211,1158 @@ app = DashProxy(
 app.config.suppress_callback_exceptions = True
 server = app.server
 
-app.layout = html.Div(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.H1(["Euro 2024 league"]),
-                    width="auto"
-                ),
-            ],
-            justify="center",
-            align="center",
-            style={
-                'margin-top': '15px',
-            }
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        dbc.Checklist(
-                            options=[
-                                {"label": "Mostrar fase de Grupos", "value": 1}
-                            ],
-                            value=[],
-                            id="groups-input",
-                            switch=True
-                        ),
-                    ],
-                    width="auto"
-                ),
-            ],
-            justify="center",
-            align="center",
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        dcc.Loading(
-                            id="loading-table",
-                            type="default",
-                            children=[
-                                dash_table.DataTable(
-                                    id='matchs-table',
-                                    columns=COLUMNS,
-                                    page_size=200,
-                                    page_action='native',
-                                    sort_action='native',
-                                    filter_action='native',
-                                    filter_options={'case': 'insensitive'},
-                                    fixed_rows={'headers': True, 'data': 0},
-                                    style_as_list_view=True,
-                                    style_cell_conditional=TABLE_STYLE_CELL_CONDITIONAL,
-                                    style_data_conditional=[
-                                        {
-                                            "if": {"state": "selected"},
-                                            "backgroundColor": "none",
-                                            "border": "1px solid rgb(211, 211, 211)",
+
+@server.after_request
+def cache_assets(response):
+    # Assets named after their content, or versioned by Dash with ?m=, never
+    # change under the same URL
+    if request.path.startswith('/assets/') and response.status_code in (200, 304) and (
+            HASHED_ASSET.search(request.path) or 'm' in request.args):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def serve_layout():
+    # Initial state of the tables for the league of the page
+    league = current_league()
+    files = league.matrix.names
+    return html.Div(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.H1(["Euro 2024 league"]),
+                        width="auto"
+                    ),
+                ],
+                justify="center",
+                align="center",
+                style={
+                    'margin-top': '15px',
+                }
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Checklist(
+                                options=[
+                                    {"label": "Mostrar fase de Grupos", "value": 1}
+                                ],
+                                value=[],
+                                id="groups-input",
+                                switch=True
+                            ),
+                        ],
+                        width="auto"
+                    ),
+                    dbc.Col(
+                        [
+                            dcc.Dropdown(
+                                options=[
+                                    {"label": name.split('.')[0].title(), "value": name}
+                                    for name in files
+                                ],
+                                value=[],
+                                multi=True,
+                                placeholder="Participantes",
+                                id="participants-input",
+                                style={
+                                    'min-width': '300px',
+                                }
+                            ),
+                        ],
+                        width="auto"
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Pagination(
+                                id="participants-page",
+                                max_value=participant_pages(files),
+                                active_page=1,
+                                fully_expanded=False,
+                                size="sm",
+                                style={
+                                    'margin-bottom': '0px',
+                                }
+                            ),
+                        ],
+                        width="auto"
+                    ),
+                ],
+                justify="center",
+                align="center",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dcc.Loading(
+                                id="loading-table",
+                                type="default",
+                                children=[
+                                    dash_table.DataTable(
+                                        id='matchs-table',
+                                        columns=matches_columns(files[:PARTICIPANTS_PER_PAGE]),
+                                        page_current=0,
+                                        page_size=200,
+                                        page_action='custom',
+                                        sort_action='custom',
+                                        filter_action='custom',
+                                        filter_options={'case': 'insensitive'},
+                                        fixed_rows={'headers': True, 'data': 0},
+                                        style_as_list_view=True,
+                                        style_cell_conditional=matches_style_cell_conditional(files[:PARTICIPANTS_PER_PAGE]),
+                                        style_data_conditional=[
+                                            {
+                                                "if": {"state": "selected"},
+                                                "backgroundColor": "none",
+                                                "border": "1px solid rgb(211, 211, 211)",
+                                            }
+                                        ],
+                                        style_data={
+                                            'whiteSpace': 'nowrap',
+                                            'height': 'auto',
+                                            'padding': '10px',
+                                            'text-align': 'center',
+                                            'overflow-x': 'auto',
+                                        },
+                                        style_header={
+                                            'font-weight': 'bold',
+                                            'text-align': 'center',
+                                            "backgroundColor": "#e1e1e142",
+                                            'padding': '10px',
+                                            'height': '50px'
+                                        },
+                                        style_cell={
+                                            'font-family': 'sans-serif'
+                                        },
+                                        style_filter={
+                                            "backgroundColor": "#e1e1e142",
+                                            'text-align': 'center',
+                                            'height': '30px',
+                                            "color": "black"
                                         }
-                                    ],
-                                    style_data={
-                                        'whiteSpace': 'nowrap',
-                                        'height': 'auto',
-                                        'padding': '10px',
-                                        'text-align': 'center',
-                                        'overflow-x': 'auto',
-                                    },
-                                    style_header={
-                                        'font-weight': 'bold',
-                                        'text-align': 'center',
-                                        "backgroundColor": "#e1e1e142",
-                                        'padding': '10px',
-                                        'height': '50px'
-                                    },
-                                    style_cell={
-                                        'font-family': 'sans-serif'
-                                    },
-                                    style_filter={
-                                        "backgroundColor": "#e1e1e142",
-                                        'text-align': 'center',
-                                        'height': '30px',
-                                        "color": "black"
-                                    }
-                                ),
-                            ]
-                        ),
-                    ],
-                    width='auto',
-                    style={
-                        'margin-bottom': '50px',
-                    }
-                ),
-                dbc.Col(
-                    [
-                        dcc.Loading(
-                            id="loading-class-table",
-                            type="default",
-                            children=[
-                                dash_table.DataTable(
-                                    id='classification-table',
-                                    columns=CLASSIFICATION_COLUMNS,
-                                    page_size=200,
-                                    page_action='native',
-                                    sort_action='native',
-                                    filter_action='native',
-                                    filter_options={'case': 'insensitive'},
-                                    style_as_list_view=True,
-                                    style_cell_conditional=CLASSIFICATION_TABLE_STYLE_CELL_CONDITIONAL,
-                                    style_data_conditional=[
-                                        {
-                                            "if": {"state": "selected"},
-                                            "backgroundColor": "none",
-                                            "border": "1px solid rgb(211, 211, 211)",
+                                    ),
+                                ]
+                            ),
+                        ],
+                        width='auto',
+                        style={
+                            'margin-bottom': '50px',
+                        }
+                    ),
+                    dbc.Col(
+                        [
+                            dcc.Loading(
+                                id="loading-class-table",
+                                type="default",
+                                children=[
+                                    dash_table.DataTable(
+                                        id='classification-table',
+                                        columns=classification_columns(league.rules.points),
+                                        page_current=0,
+                                        page_size=200,
+                                        page_action='custom',
+                                        sort_action='custom',
+                                        filter_action='custom',
+                                        filter_options={'case': 'insensitive'},
+                                        style_as_list_view=True,
+                                        style_cell_conditional=CLASSIFICATION_TABLE_STYLE_CELL_CONDITIONAL,
+                                        style_data_conditional=[
+                                            {
+                                                "if": {"state": "selected"},
+                                                "backgroundColor": "none",
+                                                "border": "1px solid rgb(211, 211, 211)",
+                                            }
+                                        ],
+                                        style_data={
+                                            'whiteSpace': 'nowrap',
+                                            'height': 'auto',
+                                            'padding': '10px',
+                                            'text-align': 'center',
+                                            'overflow-x': 'auto',
+                                        },
+                                        style_header={
+                                            'font-weight': 'bold',
+                                            'text-align': 'center',
+                                            "backgroundColor": "#e1e1e142",
+                                            'padding': '10px',
+                                            'height': '50px'
+                                        },
+                                        style_cell={
+                                            'font-family': 'sans-serif'
+                                        },
+                                        style_filter={
+                                            "backgroundColor": "#e1e1e142",
+                                            'text-align': 'center',
+                                            'height': '30px',
+                                            "color": "black"
                                         }
-                                    ],
-                                    style_data={
-                                        'whiteSpace': 'nowrap',
-                                        'height': 'auto',
-                                        'padding': '10px',
-                                        'text-align': 'center',
-                                        'overflow-x': 'auto',
-                                    },
-                                    style_header={
-                                        'font-weight': 'bold',
-                                        'text-align': 'center',
-                                        "backgroundColor": "#e1e1e142",
-                                        'padding': '10px',
-                                        'height': '50px'
-                                    },
-                                    style_cell={
-                                        'font-family': 'sans-serif'
-                                    },
-                                    style_filter={
-                                        "backgroundColor": "#e1e1e142",
-                                        'text-align': 'center',
-                                        'height': '30px',
-                                        "color": "black"
-                                    }
-                                ),
-                            ]
-                        ),
-                    ],
-                    width='auto',
-                    style={
-                        'margin-bottom': '50px',
-                    }
-                ),
-            ],
-            justify="center",
-            align="center",
-            style={
-                'margin-top': '7px',
-            }
-        ),
-        html.P(
-            id='placeholder',
-            style={
-                'display': 'none'
-            }
-        )
-    ],
-    style={
-        'width': '100vw',
-        'margin': 'auto',
-        'height': '100vh',
-        'display': 'flex',
-        'flex-direction': 'column'
+                                    ),
+                                ]
+                            ),
+                        ],
+                        width='auto',
+                        style={
+                            'margin-bottom': '50px',
+                        }
+                    ),
+                ],
+                justify="center",
+                align="center",
+                style={
+                    'margin-top': '7px',
+                }
+            ),
+            dcc.Store(id='matches-cells'),
+            # Table diffs pushed by the server, see /events. Relative, so it
+            # follows the /<league>/ prefix of the page.
+            EventSource(id='results-events', url='events'),
+            dcc.Store(id='matches-patch'),
+            dcc.Store(id='tables-refresh'),
+            dcc.Store(id='classification-refresh'),
+            dcc.Store(id='team-names', data=TEAM_NAMES),
+            dcc.Store(id='flag-sprite', data=FLAG_SPRITE),
+            html.P(
+                id='placeholder',
+                style={
+                    'display': 'none'
+                }
+            )
+        ],
+        style={
+            'width': '100vw',
+            'margin': 'auto',
+            'height': '100vh',
+            'display': 'flex',
+            'flex-direction': 'column'
+        }
+    )
+
+
+app.layout = serve_layout
+
+
+STATE_COLORS = {
+    EXACT: '#92ff9273',
+    OUTCOME: '#ffff0080',
+    MISS: '#ff3e3e59',
+}
+
+
+# Compact cells
+MATCH_CELL = 'm'  # ['m', home code, away code]
+PAIRING_CELL = 'p'  # ['p', home code, home mark, away code, away mark]
+CHAMPION_CELL = 'c'  # ['c', code, mark]
+
+# Pairing and champion marks
+TEAM_RIGHT = 1
+TEAM_WRONG = -1
+TEAM_UNDECIDED = 0
+
+
+def flag(code):
+    if FLAG_SPRITE is not None and code in SPRITE_CODES:
+        return f"assets/{FLAG_SPRITE}#{code}"
+    return f"assets/country-flags/{code}.png"
+
+
+def marked_team(code, mark):
+    if mark == TEAM_RIGHT:
+        return f'**{TEAM_NAMES[code]}**'
+    if mark == TEAM_WRONG:
+        return f'~~{TEAM_NAMES[code]}~~'
+    return TEAM_NAMES[code]
+
+
+def cell_markdown(cell):
+    # What the browser shows for a compact cell, also what the server filters
+    # and sorts on so both keep working on the visible text
+    if not isinstance(cell, list):
+        return cell
+    if cell[0] == MATCH_CELL:
+        _, home, away = cell
+        return f"![home_flag]({flag(home)}) **{TEAM_NAMES[home]}** vs **{TEAM_NAMES[away]}** ![away_flag]({flag(away)})"
+    if cell[0] == PAIRING_CELL:
+        _, home, home_mark, away, away_mark = cell
+        return f"![home_flag]({flag(home)}) {marked_team(home, home_mark)} vs {marked_team(away, away_mark)} ![away_flag]({flag(away)})"
+    _, code, mark = cell
+    return f"![home_flag]({flag(code)}) {marked_team(code, mark)}"
+
+
+def pack_rows(rows, columns):
+    # Column ids once and one value list per row, None where a row has no
+    # value for the column
+    return {
+        'columns': columns,
+        'rows': [[row.get(column) for column in columns] for row in rows],
     }
+
+
+def cell_text(row, column):
+    return cell_markdown(row.get(column))
+
+
+def match_cell(home_team, away_team, home_code, away_code):
+    if TEAM_NAMES.get(home_code) == home_team and TEAM_NAMES.get(away_code) == away_team:
+        return [MATCH_CELL, home_code, away_code]
+    return f"![home_flag]({flag(home_code)}) **{home_team}** vs **{away_team}** ![away_flag]({flag(away_code)})"
+
+
+def champion_cell(champion_team, real_champion):
+    if champion_team not in TEAMS_ES_EN:
+        return '---'
+    # Nobody is right or wrong until the final is played
+    if real_champion is None:
+        mark = TEAM_UNDECIDED
+    else:
+        mark = TEAM_RIGHT if champion_team == real_champion else TEAM_WRONG
+    return [CHAMPION_CELL, team_code(champion_team), mark]
+
+
+def pairing_cell(pred_match, real_teams):
+    teams = pred_match.split('-')
+    # Unknown teams are already reported when the predictions are loaded
+    if len(teams) != 2 or any(team not in TEAMS_ES_EN for team in teams):
+        return None
+
+    por_definir = 'Por definir' in real_teams
+    cell = [PAIRING_CELL]
+    for team in teams:
+        if team in real_teams:
+            mark = TEAM_RIGHT
+        elif not por_definir:
+            mark = TEAM_WRONG
+        else:
+            mark = TEAM_UNDECIDED
+        cell += [team_code(team), mark]
+    return cell
+
+
+def state_field(p):
+    return f'state_{p}'
+
+
+class MatchesView:
+    # Everything the callbacks need for one data version. Participant cells
+    # are rendered on demand and only for the visible columns, the scores are
+    # read from the shared snapshot.
+    def __init__(self, preds, fixtures, match_rows, pred_rows, states, counts, points, results, real_teams,
+                 real_champion, version):
+        self.preds = preds
+        self.version = version
+        self.fixtures = fixtures
+        self.match_rows = match_rows
+        self.pred_rows = pred_rows
+        self.states = states
+        # Hit counts per stat column, pred_rows ranks them by points
+        self.counts = counts
+        self.points = points
+        self.results = results
+        self.real_teams = real_teams
+        self.real_champion = real_champion
+        self.pairing_cells = {}
+
+    def cell(self, p, match, slot):
+        preds = self.preds
+        if match['date'] == '-':
+            if match['tag'] == 'winner':
+                return champion_cell(preds.champion_name[p], self.real_champion)
+            return '---'
+        if slot is None or not preds.valid[p, slot]:
+            return None
+
+        # Check if the teams are right
+        if match['type'] != 'group' and preds.key[p, slot] != self.results.key[slot]:
+            key = (match['type'], preds.key[p, slot])
+            if key not in self.pairing_cells:
+                self.pairing_cells[key] = pairing_cell(
+                    preds.pairing(key[1]), self.real_teams[match['type']])
+            if self.pairing_cells[key] is not None:
+                return self.pairing_cells[key]
+
+        return f'{preds.home[p, slot]} - {preds.away[p, slot]}'
+
+    def rows(self, match_rows, participants):
+        rows = []
+        for match in match_rows:
+            row = dict(match)
+            slot = MATCH_SLOTS.get(match['tag'])
+            for p, name in participants:
+                cell = self.cell(p, match, slot)
+                if cell is not None:
+                    row[name] = cell
+            # Hidden per-row fields holding the scoring state of each cell,
+            # styled by a fixed set of rules per participant
+            if slot is not None and match['date'] != '-':
+                for p, _ in participants:
+                    if self.states[p, slot]:
+                        row[state_field(p)] = int(self.states[p, slot])
+            rows.append(row)
+        return rows
+
+
+def state_styles(participants):
+    return [
+        {
+            "if": {"state": "selected"},
+            "backgroundColor": "none",
+            "border": "1px solid rgb(211, 211, 211)",
+        },
+        *[
+            {
+                'if': {
+                    'filter_query': '{' + state_field(p) + '} = ' + str(state),
+                    'column_id': name
+                },
+                'backgroundColor': color,
+            }
+            for p, name in participants
+            for state, color in STATE_COLORS.items()
+        ]
+    ]
+
+
+# Live results are only polled when LIVE_RESULTS_INTERVAL is set, otherwise
+# the stored final_matches.json is served
+LIVE_RESULTS_INTERVAL = int(os.environ.get('LIVE_RESULTS_INTERVAL', 0))
+
+RESULTS_POLLER = ResultsPoller(
+    url=os.environ.get('LIVE_RESULTS_URL', API_URL),
+    interval=LIVE_RESULTS_INTERVAL or 60
 )
 
+# Recomputes run here, off the request path, one shared run per data version
+JOBS = JobQueue(workers=int(os.environ.get('JOB_WORKERS', 2)))
+# Open /events streams end after EVENTS_LIFETIME seconds and reconnect
+EVENTS_LIFETIME = int(os.environ.get('EVENTS_LIFETIME', 300))
+# Open /events streams per worker, every one holds a thread. Past the cap
+# clients reconnect every EVENTS_POLL_INTERVAL seconds instead
+EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 16))
+EVENTS_POLL_INTERVAL = int(os.environ.get('EVENTS_POLL_INTERVAL', 30))
+EVENT_SLOTS = StreamSlots(EVENTS_MAX_STREAMS)
+# Reload predictions when the files change, disable with PREDICTIONS_WATCH=0
+PREDICTIONS_WATCH = os.environ.get('PREDICTIONS_WATCH', '1') != '0'
+
+SNAPSHOTS = SnapshotStore(os.environ.get('SNAPSHOT_DIR', SNAPSHOT_DIR))
+
+
+class League:
+    # One league served by this process: its participants, scoring rules and
+    # the tables built for them. Results, fixtures, background workers and
+    # the Dash app are shared by every league.
+    def __init__(self, name, base_dir, rules=DEFAULT_RULES, store_path=STORE_PATH,
+                 submissions_log=None, database=None):
+        self.name = name
+        self.base_dir = base_dir
+        self.rules = rules
+        self.matrix = open_predictions(base_dir, store_path)
+
+        # Predictions submitted through /submissions, replayed on top of the files
+        self.submissions = SubmissionLog(submissions_log) if submissions_log else None
+        self.submitted = entry_predictions(self.submissions.sync()) if self.submissions is not None else {}
+        if self.submitted:
+            self.matrix = self.matrix.replace(self.submitted)
+
+        self.db = Database(database, rules.points) if database else None
+        if self.db is not None:
+            self.sync_database()
+
+        self.fingerprint = content_hash(self.matrix)
+        # Incremental scoring state, moved forward whenever this worker builds
+        # a snapshot
+        self.leaderboard = Leaderboard(self.matrix)
+        self.lock = threading.Lock()
+        self.matches = ResultCache(maxsize=8)
+        self.odds = ResultCache(maxsize=4)
+        self.alive = ResultCache(maxsize=4)
+        self.push = Broadcaster(lifetime=EVENTS_LIFETIME)
+        self.watcher = PredictionsWatcher(base_dir, self.reload_predictions)
+
+    def start(self):
+        if PREDICTIONS_WATCH:
+            self.watcher.start()
+        # Entries appended by the other workers are merged as they show up
+        if self.submissions is not None:
+            self.submissions.on_entries = self.merge_submissions
+            self.submissions.follow()
+
+    def sync_database(self, chunk=500):
+        # Brings the database up to the predictions the league started with,
+        # only the participants whose digest changed are parsed again
+        stored = self.db.digests()
+        changed = [
+            name for name, digest in zip(self.matrix.names, self.matrix.digests)
+            if stored.get(name) != digest
+        ]
+        for start in range(0, len(changed), chunk):
+            self.db.write_participants({
+                name: self.submitted[name] if name in self.submitted else load_prediction(self.base_dir, name)
+                for name in changed[start:start + chunk]
+            })
+        self.db.write_participants({}, set(stored) - set(self.matrix.names))
+
+    def reload_predictions(self, changed, removed):
+        # Reparse only the changed files, the ones that fail are returned so
+        # the watcher tries them again
+        reloaded = {}
+        failed = []
+        for file in changed:
+            try:
+                reloaded[file] = load_prediction(self.base_dir, file)
+            except Exception as e:
+                log.info(f'Error reading {file} predictions: {e}')
+                failed.append(file)
+
+        self.merge_predictions(reloaded, removed)
+        return failed
+
+    def merge_predictions(self, reloaded, removed=()):
+        # Swap every prediction derived attribute at once, keeping the scores
+        # of the participants that did not change
+        with self.lock:
+            matrix = self.matrix.replace(reloaded, removed)
+            self.leaderboard.reload(matrix, set(reloaded))
+
+            self.matrix = matrix
+            self.fingerprint = content_hash(matrix)
+            self.matches.invalidate()
+
+        if self.db is not None:
+            self.db.write_participants(reloaded, removed)
+        refresh_matches(self)
+
+    def merge_submissions(self, entries):
+        self.merge_predictions(entry_predictions(entries))
+
+
+def load_leagues():
+    # {name: League} of LEAGUES_DIR, each directory with its predictions/
+    # folder and optionally scoring.json, submissions.log and league.db
+    # (only used when present), or the single league of the environment
+    if not LEAGUES_DIR:
+        return {'default': League('default', BASE_DIR, RULES, PREDICTIONS_STORE, SUBMISSIONS_LOG, DATABASE)}
+
+    leagues = {}
+    for name, path in league_dirs(LEAGUES_DIR).items():
+        tic = time.perf_counter()
+        present = {
+            file: os.path.join(path, file) if os.path.exists(os.path.join(path, file)) else None
+            for file in ('scoring.json', 'submissions.log', 'league.db')
+        }
+        leagues[name] = League(
+            name, os.path.join(path, 'predictions', ''),
+            load_rules(present['scoring.json']) if present['scoring.json'] else RULES,
+            os.path.join(path, 'predictions.bin'),
+            present['submissions.log'], present['league.db'])
+        tac = time.perf_counter()
+        print(f'Loading league {name} took {tac - tic} seconds.')
+    if not leagues:
+        raise SystemExit(f'No leagues found in {LEAGUES_DIR}')
+    return leagues
+
+
+LEAGUES = load_leagues()
+DEFAULT_LEAGUE = LEAGUES.get(os.environ.get('DEFAULT_LEAGUE'), next(iter(LEAGUES.values())))
+server.wsgi_app = LeagueRouter(server.wsgi_app, LEAGUES)
+
+
+def current_league():
+    # Picked by LeagueRouter for each request, the default one elsewhere
+    if has_request_context():
+        return LEAGUES.get(request.environ.get(LEAGUE_KEY), DEFAULT_LEAGUE)
+    return DEFAULT_LEAGUE
+
+
+# Metrics served on /metrics, added up over every gunicorn worker
+METRICS = Registry()
+PHASE_SECONDS = METRICS.histogram(
+    'euro_league_phase_seconds', 'Time spent in each phase of the table callbacks.',
+    'phase', ['fetch', 'rows', 'scoring', 'ranking', 'render', 'styles'])
+CALLBACK_SECONDS = METRICS.histogram(
+    'euro_league_callback_seconds', 'Time spent in the table callbacks.',
+    'callback', ['matches', 'classification'])
+RESPONSE_BYTES = METRICS.histogram(
+    'euro_league_response_bytes', 'Size of the callback responses, before compression.',
+    'output', ['matches-cells', 'classification-table', 'other'], buckets=SIZE_BUCKETS)
+RESPONSE_WIRE_BYTES = METRICS.histogram(
+    'euro_league_response_wire_bytes', 'Bytes sent for the callback responses, after compression.',
+    'output', ['matches-cells', 'classification-table', 'other'], buckets=SIZE_BUCKETS)
+CACHE_REQUESTS = METRICS.counter(
+    'euro_league_cache_requests_total', 'Lookups of the computed tables.',
+    'result', ['hit', 'miss', 'stale', 'snapshot_hit', 'snapshot_miss', 'response_hit', 'not_modified'])
+EVENT_STREAMS = METRICS.counter(
+    'euro_league_event_streams_total', 'Connections to /events, held open or answered for polling.',
+    'mode', ['stream', 'poll'])
+METRICS.gauge(
+    'euro_league_participants', 'Participants loaded in each league.',
+    lambda: {league.name: len(league.matrix.names) for league in LEAGUES.values()}, label='league')
+METRICS.gauge(
+    'euro_league_prediction_errors', 'Parse errors in the predictions of each participant.',
+    lambda: {
+        name if len(LEAGUES) == 1 else f'{league.name}/{name}': errors
+        for league in LEAGUES.values()
+        for name, errors in zip(league.matrix.names, league.matrix.errors)
+    }, label='participant')
+METRICS.open(os.environ.get('METRICS_DIR', METRICS_DIR))
+
+
+@server.route('/metrics')
+def metrics():
+    return Response(METRICS.exposition(), content_type=CONTENT_TYPE)
+
+
+@server.after_request
+def observe_response_size(response):
+    # after_request hooks run last registered first, so the cached callback
+    # responses are already encoded here and g.payload_bytes holds their
+    # size before compression
+    if request.path.endswith('/_dash-update-component') and response.status_code == 200:
+        output = (request.get_json(silent=True) or {}).get('output', '')
+        output = output.strip('.').split('.')[0]
+        output = output if output in RESPONSE_BYTES.offsets else 'other'
+        wire = response.calculate_content_length() or 0
+        RESPONSE_BYTES.observe(g.get('payload_bytes', wire), output)
+        RESPONSE_WIRE_BYTES.observe(wire, output)
+    return response
+
+
+# Seconds a submission waits for its batch to be durable
+SUBMIT_TIMEOUT = 30
+
+
+@server.route('/submissions', methods=['POST'])
+def submit_predictions():
+    # {"name", "predictions": the text of a .txt file, "token" to replace a
+    # previous submission}. Answers once the entry is durable and scored.
+    league = current_league()
+    if league.submissions is None:
+        abort(404)
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'errors': ['the body must be a JSON object']}), 400
+    name = body.get('name')
+    token = body.get('token')
+    if token is not None and not isinstance(token, str):
+        return jsonify({'errors': ['token must be a string']}), 400
+    prediction, errors = validate(name, body.get('predictions'))
+    if errors:
+        return jsonify({'errors': errors}), 400
+    if os.path.exists(os.path.join(league.base_dir, submission_file(name))):
+        return jsonify({'errors': [f'"{name}" is taken by a predictions file']}), 409
+
+    try:
+        status, token = league.submissions.submit(name, body['predictions'], token).result(SUBMIT_TIMEOUT)
+    except TimeoutError:
+        return jsonify({'errors': ['the submission log is busy, try again']}), 503
+    except Exception as e:
+        log.info(f'Error storing the submission of {name}: {e}')
+        return jsonify({'errors': ['the submission could not be stored, try again']}), 503
+    if status == FORBIDDEN:
+        return jsonify({'errors': [f'"{name}" was submitted with another token']}), 403
+
+    # The total is left out if the merge has not picked the entry up yet
+    with league.lock:
+        names = league.leaderboard.preds.names
+        counts = league.leaderboard.counts
+        p = names.index(submission_file(name)) if submission_file(name) in names else None
+        total = None if counts is None or p is None else int(counts[p] @ league.rules.points)
+
+    return jsonify({'name': name, 'token': token, 'digest': prediction.digest, 'total': total}), 201
+
+
+def version_id(version):
+    return fingerprint(list(version))[:16]
+
+
+def publish_diff(league, old, new):
+    # Sent to every open /events stream of the league. Viewers holding the
+    # old version patch their tables, anybody else reloads them.
+    diff = None if old is None else table_diff(old, new)
+    version = version_id(new.version)
+    previous = None if old is None else version_id(old.version)
+    if diff is None:
+        league.push.publish(version, {'type': 'reload', 'version': version}, previous)
+    else:
+        league.push.publish(version, {**diff, 'from': previous, 'version': version}, previous)
+
+
+@server.route('/events')
+def events():
+    league = current_league()
+    last_version = request.headers.get('Last-Event-ID')
+    if EVENT_SLOTS.acquire():
+        EVENT_STREAMS.inc('stream')
+        response = Response(league.push.stream(last_version), mimetype='text/event-stream')
+        # Run by the server once the stream ends or the client goes away
+        response.call_on_close(EVENT_SLOTS.release)
+    else:
+        # Catch up and close, the browser comes back after the retry delay
+        EVENT_STREAMS.inc('poll')
+        response = Response(league.push.stream(last_version, lifetime=0, retry=EVENTS_POLL_INTERVAL * 1000),
+                            mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def compute_matches(league, key, rounds):
+    # Runs in the job queue. Another job may have cached the key meanwhile
+    result = league.matches.get(key)
+    if result is not None:
+        return result
+
+    previous = JOBS.latest(('matches', league.name))
+    tic = time.perf_counter()
+    with league.lock:
+        result = build_matches(league, rounds, key[0])
+        league.matches.put(key, result)
+    tac = time.perf_counter()
+    print(f'Total data postprocessing took {tac - tic} seconds.')
+
+    publish_diff(league, None if previous is None else previous[1], result)
+
+    # Only the slots that changed since the stored version are rescored
+    if league.db is not None:
+        league.db.write_fixtures(result.fixtures, result.real_champion)
+    return result
+
+
+def refresh_matches(league):
+    # Queue the build of the current data version, if it is not cached yet
+    version, rounds = RESULTS_POLLER.snapshot()
+    key = (version, league.fingerprint)
+    if league.matches.get(key) is None:
+        return JOBS.submit(('matches', league.name), key, lambda: compute_matches(league, key, rounds))
+    return None
+
+
+def refresh_leagues():
+    # New results, every league builds its tables on the shared fixtures
+    for league in LEAGUES.values():
+        refresh_matches(league)
+
+
+def get_matches(league=None):
+    league = league or current_league()
+    # Pinned per request, so the ETag and the callback see the same snapshot
+    if has_request_context() and 'view' in g and league is current_league():
+        return g.view
+
+    with PHASE_SECONDS.time('fetch'):
+        version, rounds = RESULTS_POLLER.snapshot()
+        key = (version, league.fingerprint)
+        result = league.matches.get(key)
+        if result is None:
+            future = JOBS.submit(('matches', league.name), key, lambda: compute_matches(league, key, rounds))
+            latest = JOBS.latest(('matches', league.name))
+
+    if result is not None:
+        CACHE_REQUESTS.inc('hit')
+        return result
+
+    # Serve the last good tables while the new version is built, only the
+    # very first request of a worker waits for the build
+    if latest is not None:
+        CACHE_REQUESTS.inc('stale')
+        return latest[1]
+
+    CACHE_REQUESTS.inc('miss')
+    return future.result()
+
+
+# Table callback responses depend only on the inputs and the data version.
+# They are tagged with an ETag, compressed once and shared by every visitor,
+# repeat requests (see assets/etag.js) get a 304.
+CALLBACK_RESPONSES = ResultCache(maxsize=256)
+CACHED_OUTPUTS = {'matches-cells', 'classification-table'}
+
+
+def callback_output():
+    output = (request.get_json(silent=True) or {}).get('output', '')
+    return output.strip('.').split('.')[0]
+
+
+@server.before_request
+def cached_callback_response():
+    if request.method != 'POST' or not request.path.endswith('/_dash-update-component') or \
+            callback_output() not in CACHED_OUTPUTS:
+        return None
 
-def get_res_symbol(result):
-    res_symbol = '1'
-    if result[0] < result[1]:
-        res_symbol = '2'
-    elif result[0] == result[1]:
-        res_symbol = 'X'
-    return res_symbol
+    league = current_league()
+    g.view = get_matches(league)
+    g.etag = fingerprint([league.name, version_id(g.view.version), request.get_data(as_text=True)])
+    if request.if_none_match.contains_weak(g.etag):
+        CACHE_REQUESTS.inc('not_modified')
+        return not_modified(g.etag)
 
+    bodies = CALLBACK_RESPONSES.get(g.etag)
+    if bodies is not None:
+        CACHE_REQUESTS.inc('response_hit')
+        g.served = True
+        g.payload_bytes = len(bodies['identity'])
+        return encoded_response(bodies, g.etag, request.headers.get('Accept-Encoding', ''))
+    return None
 
-final_matches = []
-with open('app/assets/final_matches.json', 'r') as f:
-    final_matches = json.load(f)
+
+@server.after_request
+def store_callback_response(response):
+    etag = g.get('etag')
+    if etag is None or g.get('served') or response.status_code != 200:
+        return response
+
+    bodies = encode_body(response.get_data())
+    CALLBACK_RESPONSES.put(etag, bodies)
+    g.payload_bytes = len(bodies['identity'])
+    return encoded_response(bodies, etag, request.headers.get('Accept-Encoding', ''))
 
 
 @app.callback(
     Input('placeholder', 'title'),
     Input('groups-input', 'value'),
-    Output('matchs-table', 'data'),
-    Output('classification-table', 'data'),
+    Input('participants-input', 'value'),
+    Input('participants-page', 'active_page'),
+    Input('matchs-table', 'page_current'),
+    Input('matchs-table', 'page_size'),
+    Input('matchs-table', 'sort_by'),
+    Input('matchs-table', 'filter_query'),
+    Input('tables-refresh', 'data'),
+    Output('matches-cells', 'data'),
+    Output('matchs-table', 'page_count'),
     Output('matchs-table', 'style_data_conditional'),
+    Output('matchs-table', 'columns'),
+    Output('matchs-table', 'style_cell_conditional'),
+    Output('participants-input', 'options'),
+    Output('participants-page', 'max_value'),
 )
-def load_matches(x, show_groups):
-    rounds = []
-    tic = time.perf_counter()
+@CALLBACK_SECONDS.timed('matches')
+def load_matches(x, show_groups, participants, participants_page, page_current, page_size, sort_by, filter_query, refresh=None):
+    view = get_matches()
+    files = view.preds.names
+    match_rows = view.match_rows
 
-    print('Calling the API')
-    try:
-        # response = r.get(
-        #     'https://raw.githubusercontent.com/openfootball/euro.json/master/2024/euro.json', timeout=8)
-        # print(f'Response status code: {response.status_code}')
-        rounds = final_matches['rounds']
-        # UNCOMMENT FOR TESTING
-        # with open('tests/matches.json', 'r') as f:
-        #     rounds = json.load(f)['rounds']
-    except:
-        print('API call failed, no stored matches fallback for now')
+    if len(show_groups) == 0:
+        match_rows = [row for row in match_rows if row['type'] != 'group']
 
-    tac = time.perf_counter()
-    print(f'API call ended in {tac - tic} seconds.')
+    visible = visible_participants(files, participants, participants_page)
+    indexes = {name: p for p, name in enumerate(files)}
+    visible_states = [(indexes[name], name) for name in visible]
+    columns = matches_columns(visible)
+    with PHASE_SECONDS.time('render'):
+        match_rows = view.rows(match_rows, visible_states)
+        match_rows, page_count = query_rows(
+            match_rows, page_current, page_size, sort_by, filter_query, value=cell_text)
+        match_rows = pack_rows(
+            match_rows, [column['id'] for column in columns] + ['tag'] + [state_field(p) for p, _ in visible_states])
+        # Diffs pushed on /events apply on top of this version
+        match_rows['version'] = version_id(view.version)
+
+    with PHASE_SECONDS.time('styles'):
+        styles = state_styles(visible_states)
+        style_cell_conditional = matches_style_cell_conditional(visible)
+
+    options = [
+        {"label": name.split('.')[0].title(), "value": name}
+        for name in files
+    ]
+
+    return match_rows, page_count, styles, columns, style_cell_conditional, options, participant_pages(files)
+
+
+# The cells arrive compact and are turned into markdown in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='cells', function_name='render'),
+    Output('matchs-table', 'data'),
+    Input('matches-cells', 'data'),
+    Input('matches-patch', 'data'),
+    State('team-names', 'data'),
+    State('flag-sprite', 'data'),
+    State('matchs-table', 'data'),
+)
+
+# Diffs from /events patch the rendered cells and refetch the classification
+# page, a version they do not apply to reloads both tables
+app.clientside_callback(
+    ClientsideFunction(namespace='events', function_name='receive'),
+    Output('matches-patch', 'data'),
+    Output('tables-refresh', 'data'),
+    Output('classification-refresh', 'data'),
+    Input('results-events', 'message'),
+    State('tables-refresh', 'data'),
+    State('classification-refresh', 'data'),
+)
 
+
+@app.callback(
+    Input('placeholder', 'title'),
+    Input('classification-table', 'page_current'),
+    Input('classification-table', 'page_size'),
+    Input('classification-table', 'sort_by'),
+    Input('classification-table', 'filter_query'),
+    Input('tables-refresh', 'data'),
+    Input('classification-refresh', 'data'),
+    Output('classification-table', 'data'),
+    Output('classification-table', 'page_count'),
+)
+@CALLBACK_SECONDS.timed('classification')
+def load_classification(x, page_current, page_size, sort_by, filter_query, refresh=None, reclassify=None):
+    view = get_matches()
+
+    return query_rows(view.pred_rows, page_current, page_size, sort_by, filter_query)
+
+
+# Leaderboard pages read from the materialized totals of the database
+@server.route('/leaderboard')
+def leaderboard():
+    league = current_league()
+    if league.db is None:
+        abort(404)
+    page = max(request.args.get('page', 1, type=int), 1)
+    size = min(max(request.args.get('size', PARTICIPANTS_PER_PAGE, type=int), 1), 1000)
+    rows = league.db.leaderboard(offset=(page - 1) * size, limit=size)
+    return jsonify({'page': page, 'size': size, 'participants': league.db.count(), 'rows': rows})
+
+
+@server.route('/scoring')
+def scoring():
+    rules = current_league().rules
+    return jsonify({
+        'points': dict(zip(STAT_COLUMNS, rules.points.tolist())),
+        'champion': rules.champion,
+    })
+
+
+# The classification under other points, e.g. /scoring/preview?res_exacto=3&campeon=100.
+# Hit counts are cached with the tables, so it is one product per request.
+@server.route('/scoring/preview')
+def scoring_preview():
+    points = dict(zip(STAT_COLUMNS, current_league().rules.points.tolist()))
+    points.update({column: request.args[column] for column in STAT_COLUMNS if column in request.args})
+    try:
+        rules = scoring_rules(points)
+    except ValueError as e:
+        return jsonify({'errors': [str(e)]}), 400
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    size = min(max(request.args.get('size', PARTICIPANTS_PER_PAGE, type=int), 1), 1000)
+    view = get_matches()
+    ranked = rank(view.preds.names, view.counts, rules.points)
+    rows = ranked[(page - 1) * size:page * size]
+    # Positions gained against the current rules
+    positions = {row['nombre']: row['position'] for row in view.pred_rows}
+    for row in rows:
+        row['moved'] = positions[row['nombre']] - row['position']
+    return jsonify({
+        'points': dict(zip(STAT_COLUMNS, rules.points.tolist())),
+        'page': page,
+        'size': size,
+        'participants': len(ranked),
+        'rows': rows,
+    })
+
+
+# Title odds, simulated once per league, data version and request parameters
+ODDS_WORKERS = int(os.environ.get('ODDS_WORKERS', 1))
+MAX_SIMULATIONS = 1000000
+
+
+def pending_response():
+    # Nothing computed yet for these parameters, the job is already queued
+    response = jsonify({'status': 'pending'})
+    response.status_code = 202
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+def compute_odds(league, view, sims, top):
+    tic = time.perf_counter()
+    rows = simulate(view.preds, view.results, view.match_rows,
+                    sims=sims, top=top, workers=ODDS_WORKERS, points=view.points)
+    league.odds.put((view.version, sims, top), rows)
+    tac = time.perf_counter()
+    print(f'Simulating {sims} tournaments took {tac - tic} seconds.')
+    return rows
+
+
+@server.route('/odds')
+def odds():
+    sims = min(request.args.get('sims', 100000, type=int), MAX_SIMULATIONS)
+    top = request.args.get('top', 3, type=int)
+    league = current_league()
+    view = get_matches(league)
+    # Checked here, a job failing on them would leave the request pending
+    participants = len(view.preds.names)
+    if sims < 1:
+        return jsonify({'errors': [f'sims must be between 1 and {MAX_SIMULATIONS}']}), 400
+    if not 0 < top <= participants:
+        return jsonify({'errors': [f'top must be between 1 and {participants}']}), 400
+
+    rows = league.odds.get((view.version, sims, top))
+    stale = rows is None
+    if stale:
+        # The last simulation with the same parameters is served meanwhile
+        kind = ('odds', league.name, sims, top)
+        JOBS.submit(kind, view.version, lambda: compute_odds(league, view, sims, top))
+        latest = JOBS.latest(kind)
+        if latest is None:
+            return pending_response()
+        rows = latest[1]
+
+    return jsonify({'sims': sims, 'top': top, 'stale': stale, 'participants': rows})
+
+
+# Who is still mathematically alive, solved once per league and data version
+ALIVE_WORKERS = int(os.environ.get('ALIVE_WORKERS', 1))
+# Seconds the searches may take, rows left unsolved report the positions reached
+ALIVE_TIME_BUDGET = float(os.environ.get('ALIVE_TIME_BUDGET', 30))
+
+
+def compute_alive(league, view):
     tic = time.perf_counter()
+    rows = eliminate(view.preds, view.results, view.match_rows, workers=ALIVE_WORKERS, points=view.points,
+                     budget=ALIVE_TIME_BUDGET)
+    league.alive.put(view.version, rows)
+    tac = time.perf_counter()
+    print(f'Solving the reachable positions took {tac - tic} seconds.')
+    return rows
 
-    for round in rounds:
-        round['matches'] = sorted(round['matches'], key=lambda x: datetime.strptime(
-            x['date'] + ' ' + x['time'], '%Y-%m-%d %H:%M'))
-
-    prev_type = 'group'
-
-    match_rows = []
-    added_matches = []
-
-    real_octavos_teams = []  # teams advancing to knockout stage
-    real_cuartos_teams = []  # quarter-finalists
-    real_semis_teams = []  # semi-finalists
-    real_final_teams = []  # finalists
-    real_champion = 'España'
-
-    for round in rounds:
-        for match in round['matches']:
-            home_team = TEAMS_EN_ES.get(
-                match['team1']['name'], match['team1']['name'])
-            away_team = TEAMS_EN_ES.get(
-                match['team2']['name'], match['team2']['name'])
-            home_flag = f"assets/country-flags/{match['team1']['code']}.png"
-            away_flag = f"assets/country-flags/{match['team2']['code']}.png"
-            score = match.get('score', {}).get('ft', None)
-            home_score = score[0] if score else None
-            away_score = score[1] if score else None
-            match_tag = f"{home_team}-{away_team}"
-            match_key = match_tag
-            date = datetime.strptime(
-                match['date'] + ' ' + match['time'], '%Y-%m-%d %H:%M')
-
-            round_type = round['name']
-            if round['name'].split(' ')[0] != 'Matchday':
-                match_tag = match['date'] + ' ' + match['time']
-            else:
-                round_type = 'group'
-
-            if match_tag == 'Test-Test':
-                home_score = 1
-                away_score = 1
-
-            row = {
-                'date': date.strftime('%a, %d %b, %H:%M').title(),
-                'match': f"![home_flag]({home_flag}) **{home_team}** vs **{away_team}** ![away_flag]({away_flag})",
-                'match_key': match_key,
-                'home_team': home_team,
-                'away_team': away_team,
-                'tag': match_tag,
-                'result': 'Not started' if home_score is None else f'{home_score} - {away_score}',
-                'type': round_type
-            }
 
-            if row['type'] == 'Round of 16':
-                real_octavos_teams.append(home_team)
-                real_octavos_teams.append(away_team)
-                if prev_type == 'group':
-                    match_rows.append(
-                        {
-                            'date': '-',
-                            'match': f"**OCTAVOS**",
-                            'match_key': '',
-                            'home_team': '',
-                            'away_team': '',
-                            'tag': '',
-                            'result': 'Not started',
-                            'type': ''
-                        }
-                    )
-            elif row['type'] == 'Quarter-finals':
-                real_cuartos_teams.append(home_team)
-                real_cuartos_teams.append(away_team)
-                if prev_type == 'Round of 16':
-                    match_rows.append(
-                        {
-                            'date': '-',
-                            'match': f"**CUARTOS**",
-                            'match_key': '',
-                            'home_team': '',
-                            'away_team': '',
-                            'tag': '',
-                            'result': 'Not started',
-                            'type': ''
-                        }
-                    )
-            elif row['type'] == 'Semi-finals':
-                row['tag'] += f" {match.get('num', 0)}"
-                match_tag += f" {match.get('num', 0)}"
-                real_semis_teams.append(home_team)
-                real_semis_teams.append(away_team)
-                if prev_type == 'Quarter-finals':
-                    match_rows.append(
-                        {
-                            'date': '-',
-                            'match': f"**SEMIS**",
-                            'match_key': '',
-                            'home_team': '',
-                            'away_team': '',
-                            'tag': '',
-                            'result': 'Not started',
-                            'type': ''
-                        }
-                    )
-            elif row['type'] == 'Final' and prev_type == 'Semi-finals':
-                real_final_teams.append(home_team)
-                real_final_teams.append(away_team)
-                match_rows.append(
-                    {
-                        'date': '-',
-                        'match': f"**FINAL**",
-                        'match_key': '',
-                        'home_team': '',
-                        'away_team': '',
-                        'tag': '',
-                        'result': 'Not started',
-                        'type': ''
-                    }
-                )
-
-            prev_type = row['type']
-
-            if match_tag not in added_matches and home_team != '--' and away_team != '--':
-                match_rows.append(row)
-                added_matches.append(match_tag)
-
-    match_rows.append(
-        {
-            'date': '-',
-            'match': f"**GANADOR**",
-            'match_key': '',
-            'home_team': '',
-            'away_team': '',
-            'tag': 'winner',
-            'result': 'Not started',
-            'type': ''
-        }
-    )
+@server.route('/alive')
+def alive():
+    league = current_league()
+    view = get_matches(league)
 
-    styles = [
-        {
-            "if": {"state": "selected"},
-            "backgroundColor": "none",
-            "border": "1px solid rgb(211, 211, 211)",
-        }
-    ]
+    rows = league.alive.get(view.version)
+    stale = rows is None
+    if stale:
+        kind = ('alive', league.name)
+        JOBS.submit(kind, view.version, lambda: compute_alive(league, view))
+        latest = JOBS.latest(kind)
+        if latest is None:
+            return pending_response()
+        rows = latest[1]
 
-    real_teams = {
-        'Round of 16': real_octavos_teams,
-        'Quarter-finals': real_cuartos_teams,
-        'Semi-finals': real_semis_teams,
-        'Final': real_final_teams
-    }
+    return jsonify({'stale': stale, 'participants': rows})
 
-    pred_rows = []
-
-    for file, clean_preds in PREDICTIONS.items():
-        pred_row = {
-            'nombre': file.split('.')[0].title(),
-            'total': 0,
-            'res_exacto': 0,
-            'res_partido': 0,
-            'octavos': 0,
-            'cuartos': 0,
-            'semis': 0,
-            'final': 0,
-            'campeon': 0,
-        }
 
-        group_stage_preds = clean_preds[:36] + \
-            clean_preds[76:84] + \
-            clean_preds[92:96] + \
-            clean_preds[100:102] + \
-            [clean_preds[104]]
+# Full predictions × results grid, one line per match and participant,
+# streamed so memory does not grow with the league
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
 
-        octavos_teams = clean_preds[60:76]  # teams advancing to knockout stage
-        cuartos_teams = clean_preds[84:92]  # quarter-finalists
-        semis_teams = clean_preds[96:100]  # semi-finalists
-        final_teams = clean_preds[102:104]  # finalists
-        champion_team = clean_preds[105]  # winner
 
-        for match in match_rows:
-            if match['date'] == '-':
-                match[file] = '---'
-                if match['tag'] == 'winner':
-                    champion_team_code = TEAMS_NAMES_CODES[TEAMS_ES_EN[champion_team]]
-                    champion_team_flag = f"assets/country-flags/{champion_team_code}.png"
-                    if champion_team == real_champion:
-                        champion_team = f'**{champion_team}**'
-                    else:
-                        champion_team = f'~~{champion_team}~~'
-                    match[file] = f"![home_flag]({champion_team_flag}) {champion_team}"
-                continue
-            try:
-                match_idx = MATCH_TAGS.index(match['tag'])
-
-                pred_result = [int(goals) for goals in group_stage_preds[match_idx].split('|')[
-                    1].split('-')]
-                match[file] = f'{pred_result[0]} - {pred_result[1]}'
-
-                if match['type'] == 'Round of 16':
-                    if match['home_team'] in octavos_teams:
-                        pred_row['octavos'] += 1
-                    if match['away_team'] in octavos_teams:
-                        pred_row['octavos'] += 1
-                elif match['type'] == 'Quarter-finals':
-                    if match['home_team'] in cuartos_teams:
-                        pred_row['cuartos'] += 1
-                    if match['away_team'] in cuartos_teams:
-                        pred_row['cuartos'] += 1
-                elif match['type'] == 'Semi-finals':
-                    if match['home_team'] in semis_teams:
-                        pred_row['semis'] += 1
-                    if match['away_team'] in semis_teams:
-                        pred_row['semis'] += 1
-                elif match['type'] == 'Final':
-                    if match['home_team'] in final_teams:
-                        pred_row['final'] += 1
-                    if match['away_team'] in final_teams:
-                        pred_row['final'] += 1
-                    if champion_team == real_champion:
-                        pred_row['campeon'] += 1
-
-                # Check if the teams are right
-                if match['type'] != 'group' and match['match_key'] != group_stage_preds[match_idx].split('·')[0]:
-                    pred_match = group_stage_preds[match_idx].split('·')[0]
-                    teams = pred_match.split('-')
-                    home_team = teams[0]
-                    home_team_code = TEAMS_NAMES_CODES[TEAMS_ES_EN[home_team]]
-                    home_team_flag = f"assets/country-flags/{home_team_code}.png"
-                    away_team = teams[1]
-                    away_team_code = TEAMS_NAMES_CODES[TEAMS_ES_EN[away_team]]
-                    away_team_flag = f"assets/country-flags/{away_team_code}.png"
-
-                    por_definir = 'Por definir' in real_teams[match['type']]
-                    if home_team in real_teams[match['type']]:
-                        home_team = f'**{home_team}**'
-                    elif not por_definir:
-                        home_team = f'~~{home_team}~~'
-                    if away_team in real_teams[match['type']]:
-                        away_team = f'**{away_team}**'
-                    elif not por_definir:
-                        away_team = f'~~{away_team}~~'
-
-                    match[file] = f"![home_flag]({home_team_flag}) {home_team} vs {away_team} ![away_flag]({away_team_flag})"
-                elif match['result'] != 'Not started':
-                    real_result = [int(goals)
-                                   for goals in match['result'].split('-')]
-                    real_res_symbol = get_res_symbol(real_result)
-                    pred_res_symbol = get_res_symbol(pred_result)
-
-                    if real_result[0] == pred_result[0] and real_result[1] == pred_result[1]:
-                        pred_row['res_exacto'] += 1
-                        styles.append({
-                            'if': {
-                                'filter_query': '{match} = "' + match['match'] + '"' + ' && {date} = "' + match['date'] + '"',
-                                'column_id': file
-                            },
-                            'backgroundColor': '#92ff9273',
-                        })
-                    elif real_res_symbol == pred_res_symbol:
-                        pred_row['res_partido'] += 1
-                        styles.append({
-                            'if': {
-                                'filter_query': '{match} = "' + match['match'] + '"' + ' && {date} = "' + match['date'] + '"',
-                                'column_id': file
-                            },
-                            'backgroundColor': '#ffff0080',
-                        })
-                    else:
-                        styles.append({
-                            'if': {
-                                'filter_query': '{match} = "' + match['match'] + '"' + ' && {date} = "' + match['date'] + '"',
-                                'column_id': file
-                            },
-                            'backgroundColor': '#ff3e3e59',
-                        })
+@server.route('/export/grid.<format>')
+def export_grid(format):
+    view = get_matches()
+    if format == 'npz':
+        return send_file(grid_npz(view), mimetype='application/octet-stream',
+                         as_attachment=True, download_name='grid.npz')
+    if format not in EXPORT_FORMATS:
+        abort(404)
 
-            except Exception as e:
-                log.info(
-                    f'Error parsing {pred_row["nombre"]} predictions: {e}')
+    lines, mimetype = EXPORT_FORMATS[format]
+    response = Response(chunked(lines(grid_records(view))), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=grid.{format}'
+    return response
 
-        pred_row['total'] = pred_row['res_exacto'] * 10 + \
-            pred_row['res_partido'] * 5 + \
-            pred_row['octavos'] * 6 + \
-            pred_row['cuartos'] * 12 + \
-            pred_row['semis'] * 24 + \
-            pred_row['final'] * 48 + \
-            pred_row['campeon'] * 50
 
-        pred_rows.append(pred_row)
+STAGE_HEADERS = {
+    Stage.ROUND_OF_16: '**OCTAVOS**',
+    Stage.QUARTER_FINALS: '**CUARTOS**',
+    Stage.SEMI_FINALS: '**SEMIS**',
+    Stage.FINAL: '**FINAL**',
+}
 
-    pred_rows.sort(key=lambda x: x['total'], reverse=True)
 
-    index = 0
-    prev_total = 0
-    for row in pred_rows:
-        if row['total'] != prev_total:
-            index += 1
-        prev_total = row['total']
-        row['position'] = index
+def header_row(match, tag=''):
+    return {
+        'date': '-',
+        'match': match,
+        'match_key': '',
+        'home_team': '',
+        'away_team': '',
+        'tag': tag,
+        'result': 'Not started',
+        'type': ''
+    }
 
-    if len(show_groups) == 0:
-        match_rows = [row for row in match_rows if row['type'] != 'group']
 
-    tac = time.perf_counter()
-    print(f'Total data postprocessing took {tac - tic} seconds.')
+def fixture_row(fixture):
+    return {
+        'date': fixture.date_label,
+        'match': match_cell(fixture.home_team, fixture.away_team, fixture.home_code, fixture.away_code),
+        'match_key': fixture.key,
+        'home_team': fixture.home_team,
+        'away_team': fixture.away_team,
+        'tag': fixture.tag,
+        'result': fixture.result,
+        'type': fixture.type
+    }
+
 
-    return match_rows, pred_rows, styles
+# Fixtures and their table rows, compiled once per results version and
+# shared by every league
+FIXTURES_CACHE = ResultCache(maxsize=4)
+FIXTURES_LOCK = threading.Lock()
+
+
+def get_fixtures(rounds, version):
+    with FIXTURES_LOCK:
+        compiled = FIXTURES_CACHE.get(version)
+        if compiled is None:
+            fixtures = Fixtures(rounds)
+            match_rows = []
+            for fixture in fixtures.matches:
+                if fixture.opens:
+                    match_rows.append(header_row(STAGE_HEADERS[fixture.stage]))
+                if fixture.listed:
+                    match_rows.append(fixture_row(fixture))
+            match_rows.append(header_row('**GANADOR**', tag='winner'))
+            compiled = (fixtures, match_rows)
+            FIXTURES_CACHE.put(version, compiled)
+    return compiled
+
+
+def build_matches(league, rounds, version):
+    rows_tic = time.perf_counter()
+    fixtures, match_rows = get_fixtures(rounds, version)
+    real_champion = league.rules.champion or fixtures.champion
+    real_teams = fixtures.real_teams
+    preds = league.matrix
+
+    PHASE_SECONDS.observe(time.perf_counter() - rows_tic, 'rows')
+
+    with PHASE_SECONDS.time('scoring'):
+        results = ResultVector(preds, match_rows, real_champion)
+
+        def score():
+            league.leaderboard.update(results)
+            return {'states': league.leaderboard.states, 'counts': league.leaderboard.counts}
+
+        builds = SNAPSHOTS.builds
+        # Counts do not depend on the points, only on the champion
+        scores = SNAPSHOTS.load_or_build(
+            f'{league.name}-{fingerprint([version, league.fingerprint, real_champion])}', score)
+        CACHE_REQUESTS.inc(
+            'snapshot_miss' if SNAPSHOTS.builds > builds else 'snapshot_hit')
+
+    with PHASE_SECONDS.time('ranking'):
+        pred_rows = rank(preds.names, scores['counts'], league.rules.points)
+
+    return MatchesView(preds, fixtures, match_rows, pred_rows, scores['states'], scores['counts'],
+                       league.rules.points, results, real_teams, real_champion, (version, league.fingerprint))
+
+
+# Build the tables once the module is loaded and whenever the poller publishes new results
+RESULTS_POLLER.on_change = refresh_leagues
+for league in LEAGUES.values():
+    league.start()
+refresh_leagues()
+if LIVE_RESULTS_INTERVAL:
+    RESULTS_POLLER.start()
 
 
 if __name__ == "__main__":
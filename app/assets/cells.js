@@ -0,0 +1,86 @@
+// Turns the packed compact rows sent by load_matches into the markdown rows
+// the table shows. Keep in sync with pack_rows and cell_markdown in app.py.
+// Diffs pushed on /events (see events.js) are applied to the rendered rows.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    cells: {
+        render: function (rows, patch, names, sprite, current) {
+            var triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+                return t.prop_id;
+            });
+            if (patch && current && triggered.indexOf('matches-patch.data') !== -1) {
+                var matches = {};
+                patch.matches.forEach(function (match) {
+                    matches[match.tag] = match;
+                });
+                return current.map(function (row) {
+                    var match = matches[row.tag];
+                    if (!match) {
+                        return row;
+                    }
+                    row = Object.assign({}, row, {result: match.result});
+                    match.states.forEach(function (state) {
+                        var field = 'state_' + state[0];
+                        if (!(state[1] in row)) {
+                            return;
+                        }
+                        if (state[2]) {
+                            row[field] = state[2];
+                        } else {
+                            delete row[field];
+                        }
+                    });
+                    return row;
+                });
+            }
+
+            if (!rows) {
+                return [];
+            }
+            window.leagueVersion = rows.version;
+
+            function flag(code) {
+                if (sprite) {
+                    return 'assets/' + sprite + '#' + code;
+                }
+                return 'assets/country-flags/' + code + '.png';
+            }
+
+            function team(code, mark) {
+                if (mark === 1) {
+                    return '**' + names[code] + '**';
+                }
+                if (mark === -1) {
+                    return '~~' + names[code] + '~~';
+                }
+                return names[code];
+            }
+
+            function markdown(cell) {
+                if (!Array.isArray(cell)) {
+                    return cell;
+                }
+                switch (cell[0]) {
+                    case 'm':
+                        return '![home_flag](' + flag(cell[1]) + ') ' + team(cell[1], 1) +
+                            ' vs ' + team(cell[2], 1) + ' ![away_flag](' + flag(cell[2]) + ')';
+                    case 'p':
+                        return '![home_flag](' + flag(cell[1]) + ') ' + team(cell[1], cell[2]) +
+                            ' vs ' + team(cell[3], cell[4]) + ' ![away_flag](' + flag(cell[3]) + ')';
+                    default:
+                        return '![home_flag](' + flag(cell[1]) + ') ' + team(cell[1], cell[2]);
+                }
+            }
+
+            var columns = rows.columns;
+            return rows.rows.map(function (values) {
+                var row = {};
+                for (var i = 0; i < columns.length; i++) {
+                    if (values[i] !== null) {
+                        row[columns[i]] = markdown(values[i]);
+                    }
+                }
+                return row;
+            });
+        }
+    }
+});
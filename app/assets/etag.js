@@ -0,0 +1,44 @@
+// Revalidates the table callbacks with the ETag of their last response. The
+// server answers 304 while the data version and the inputs are the same and
+// the cached body is handed to Dash as if it had been sent again.
+(function () {
+    var MAX_ENTRIES = 50;
+    var responses = new Map();  // request body -> {etag, text}
+    var fetch = window.fetch;
+
+    window.fetch = function (url, options) {
+        if (typeof url !== 'string' || url.indexOf('_dash-update-component') === -1 ||
+                !options || options.method !== 'POST' || typeof options.body !== 'string') {
+            return fetch.apply(this, arguments);
+        }
+
+        var key = options.body;
+        var cached = responses.get(key);
+        if (cached) {
+            var headers = new Headers(options.headers || {});
+            headers.set('If-None-Match', cached.etag);
+            options = Object.assign({}, options, {headers: headers});
+        }
+
+        return fetch.call(this, url, options).then(function (response) {
+            if (response.status === 304 && cached) {
+                return new Response(cached.text, {
+                    status: 200,
+                    headers: {'Content-Type': 'application/json'}
+                });
+            }
+            var etag = response.headers.get('ETag');
+            if (response.status !== 200 || !etag) {
+                return response;
+            }
+            return response.clone().text().then(function (text) {
+                responses.delete(key);
+                responses.set(key, {etag: etag, text: text});
+                if (responses.size > MAX_ENTRIES) {
+                    responses.delete(responses.keys().next().value);
+                }
+                return response;
+            });
+        });
+    };
+})();
@@ -0,0 +1,24 @@
+// Reacts to the events of /events. A diff that starts at the version on
+// screen is handed to cells.render and refetches the classification page,
+// anything else reloads both tables from the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    events: {
+        receive: function (message, refresh, reclassify) {
+            var no_update = window.dash_clientside.no_update;
+            if (!message || window.leagueVersion === undefined) {
+                return [no_update, no_update, no_update];
+            }
+
+            var event = JSON.parse(message);
+            if (event.version === window.leagueVersion) {
+                return [no_update, no_update, no_update];
+            }
+            if (event.type === 'diff' && event.from === window.leagueVersion) {
+                window.leagueVersion = event.version;
+                var moved = Object.keys(event.ranks).length > 0;
+                return [event, no_update, moved ? (reclassify || 0) + 1 : no_update];
+            }
+            return [no_update, (refresh || 0) + 1, no_update];
+        }
+    }
+});
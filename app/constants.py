@@ -0,0 +1,145 @@
+MATCH_TAGS = [
+    'Alemania-Escocia',
+    'Hungría-Suiza',
+    'España-Croacia',
+    'Italia-Albania',
+    'Eslovenia-Dinamarca',
+    'Serbia-Inglaterra',
+    'Polonia-Países Bajos',
+    'Austria-Francia',
+    'Rumanía-Ucrania',
+    'Bélgica-Eslovaquia',
+    'Turquía-Georgia',
+    'Portugal-República Checa',
+    'Alemania-Hungría',
+    'Escocia-Suiza',
+    'Croacia-Albania',
+    'España-Italia',
+    'Eslovenia-Serbia',
+    'Dinamarca-Inglaterra',
+    'Polonia-Austria',
+    'Países Bajos-Francia',
+    'Eslovaquia-Ucrania',
+    'Bélgica-Rumanía',
+    'Georgia-República Checa',
+    'Turquía-Portugal',
+    'Suiza-Alemania',
+    'Escocia-Hungría',
+    'Albania-España',
+    'Croacia-Italia',
+    'Inglaterra-Eslovenia',
+    'Dinamarca-Serbia',
+    'Países Bajos-Austria',
+    'Francia-Polonia',
+    'Eslovaquia-Rumanía',
+    'Ucrania-Bélgica',
+    'Georgia-Portugal',
+    'República Checa-Turquía',
+    '2024-06-29 18:00',
+    '2024-06-29 21:00',
+    '2024-06-30 18:00',
+    '2024-06-30 21:00',
+    '2024-07-01 18:00',
+    '2024-07-01 21:00',
+    '2024-07-02 18:00',
+    '2024-07-02 21:00',
+    '2024-07-05 18:00',
+    '2024-07-05 21:00',
+    '2024-07-06 18:00',
+    '2024-07-06 21:00',
+    '2024-07-09 21:00 49',
+    '2024-07-10 21:00 50',
+    '2024-07-14 21:00'
+]
+
+MATCH_SLOTS = {tag: slot for slot, tag in enumerate(MATCH_TAGS)}
+
+GROUP_MATCHES = 36
+
+# Groups A to F
+GROUPS = [
+    ['Alemania', 'Escocia', 'Hungría', 'Suiza'],
+    ['España', 'Croacia', 'Italia', 'Albania'],
+    ['Eslovenia', 'Dinamarca', 'Serbia', 'Inglaterra'],
+    ['Polonia', 'Países Bajos', 'Austria', 'Francia'],
+    ['Rumanía', 'Ucrania', 'Bélgica', 'Eslovaquia'],
+    ['Turquía', 'Georgia', 'Portugal', 'República Checa'],
+]
+
+# Group positions playing each round of 16 match. '3DEF' is one of the four
+# best third placed teams, coming from group D, E or F.
+ROUND_OF_16 = {
+    '2024-06-29 18:00': ('2A', '2B'),
+    '2024-06-29 21:00': ('1A', '2C'),
+    '2024-06-30 18:00': ('1C', '3DEF'),
+    '2024-06-30 21:00': ('1B', '3ADEF'),
+    '2024-07-01 18:00': ('2D', '2E'),
+    '2024-07-01 21:00': ('1F', '3ABC'),
+    '2024-07-02 18:00': ('1E', '3ABCD'),
+    '2024-07-02 21:00': ('1D', '2F'),
+}
+
+# Matches whose winners play each later knockout match, home team first
+KNOCKOUT_BRACKET = {
+    '2024-07-05 18:00': ('2024-06-30 21:00', '2024-06-29 21:00'),
+    '2024-07-05 21:00': ('2024-07-01 21:00', '2024-07-01 18:00'),
+    '2024-07-06 18:00': ('2024-06-30 18:00', '2024-06-29 18:00'),
+    '2024-07-06 21:00': ('2024-07-02 18:00', '2024-07-02 21:00'),
+    '2024-07-09 21:00 49': ('2024-07-05 18:00', '2024-07-05 21:00'),
+    '2024-07-10 21:00 50': ('2024-07-06 21:00', '2024-07-06 18:00'),
+    '2024-07-14 21:00': ('2024-07-09 21:00 49', '2024-07-10 21:00 50'),
+}
+
+TEAMS_EN_ES = {
+    'Albania': 'Albania',
+    'Austria': 'Austria',
+    'Belgium': 'Bélgica',
+    'Croatia': 'Croacia',
+    'Czech Republic': 'República Checa',
+    'Denmark': 'Dinamarca',
+    'England': 'Inglaterra',
+    'France': 'Francia',
+    'Georgia': 'Georgia',
+    'Germany': 'Alemania',
+    'Hungary': 'Hungría',
+    'Italy': 'Italia',
+    'Netherlands': 'Países Bajos',
+    'Poland': 'Polonia',
+    'Portugal': 'Portugal',
+    'Romania': 'Rumanía',
+    'Scotland': 'Escocia',
+    'Serbia': 'Serbia',
+    'Slovakia': 'Eslovaquia',
+    'Slovenia': 'Eslovenia',
+    'Spain': 'España',
+    'Switzerland': 'Suiza',
+    'Turkey': 'Turquía',
+    'Ukraine': 'Ucrania'
+}
+
+TEAMS_ES_EN = {v: k for k, v in TEAMS_EN_ES.items()}
+
+TEAMS_NAMES_CODES = {'Germany': 'GER',
+                     'Scotland': 'SCO',
+                     'Hungary': 'HUN',
+                     'Switzerland': 'SUI',
+                     'Spain': 'ESP',
+                     'Croatia': 'CRO',
+                     'Italy': 'ITA',
+                     'Albania': 'ALB',
+                     'Slovenia': 'SVN',
+                     'Denmark': 'DEN',
+                     'Serbia': 'SRB',
+                     'England': 'ENG',
+                     'Poland': 'POL',
+                     'Netherlands': 'NED',
+                     'Austria': 'AUT',
+                     'France': 'FRA',
+                     'Romania': 'ROU',
+                     'Ukraine': 'UKR',
+                     'Belgium': 'BEL',
+                     'Slovakia': 'SVK',
+                     'Turkey': 'TUR',
+                     'Georgia': 'GEO',
+                     'Portugal': 'POR',
+                     'Czech Republic': 'CZE'}
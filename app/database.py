@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from app.fixtures import Fixtures, Stage
+from app.predictions import MISSING_GOALS, load_prediction
+from app.scoring import DEFAULT_RULES, POINTS, STAT_COLUMNS, load_rules
+
+log = logging.getLogger("app")
+
+# Optional embedded storage of the whole league. The files stay the source
+# the app starts from, the database mirrors them and keeps the leaderboard
+# materialized so it can be paged without loading every participant.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    digest TEXT NOT NULL,
+    champion TEXT
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    slot INTEGER NOT NULL,
+    participant INTEGER NOT NULL,
+    home INTEGER NOT NULL,
+    away INTEGER NOT NULL,
+    pairing TEXT,
+    PRIMARY KEY (slot, participant)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS predictions_participant ON predictions (participant);
+CREATE TABLE IF NOT EXISTS stage_teams (
+    stage INTEGER NOT NULL,
+    team TEXT NOT NULL,
+    participant INTEGER NOT NULL,
+    PRIMARY KEY (stage, team, participant)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stage_teams_participant ON stage_teams (participant);
+CREATE TABLE IF NOT EXISTS fixtures (
+    slot INTEGER PRIMARY KEY,
+    stage INTEGER NOT NULL,
+    kickoff TEXT NOT NULL,
+    home_team TEXT NOT NULL,
+    away_team TEXT NOT NULL,
+    pairing TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    slot INTEGER PRIMARY KEY,
+    home INTEGER NOT NULL,
+    away INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS slot_scores (
+    slot INTEGER NOT NULL,
+    participant INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    {stats},
+    PRIMARY KEY (slot, participant)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS slot_scores_participant ON slot_scores (participant);
+CREATE TABLE IF NOT EXISTS totals (
+    participant INTEGER PRIMARY KEY,
+    {stats},
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS totals_total ON totals (total DESC, participant);
+'''.format(stats=',\n    '.join(f'{column} INTEGER NOT NULL' for column in STAT_COLUMNS))
+
+STAT_LIST = ', '.join(STAT_COLUMNS)
+
+
+def total_sql(points):
+    return ' + '.join(f'{column} * {int(value)}' for column, value in zip(STAT_COLUMNS, points))
+
+
+# Contribution of every (slot, participant) to the stats, the same rules as
+# score_predictions. Only slots with a fixture count, knockout results only
+# when the predicted pairing was right.
+SLOT_SCORES = f'''
+WITH scored AS (
+    SELECT p.slot, p.participant, p.home, p.away, f.stage, r.home AS real_home, r.away AS real_away,
+           pa.champion, f.home_team, f.away_team,
+           r.slot IS NOT NULL AND (f.stage = {Stage.GROUP} OR p.pairing = f.pairing) AS scored
+    FROM predictions p
+    JOIN fixtures f ON f.slot = p.slot
+    JOIN participants pa ON pa.id = p.participant
+    LEFT JOIN results r ON r.slot = p.slot
+    WHERE {{where}}
+), states AS (
+    SELECT *,
+           CASE
+               WHEN NOT scored THEN 0
+               WHEN home = real_home AND away = real_away THEN 1
+               WHEN (home > away) - (home < away) = (real_home > real_away) - (real_home < real_away) THEN 2
+               ELSE 3
+           END AS state,
+           CASE WHEN stage = {Stage.GROUP} THEN 0 ELSE
+               EXISTS (SELECT 1 FROM stage_teams t WHERE t.stage = s.stage AND t.team = s.home_team
+                       AND t.participant = s.participant) +
+               EXISTS (SELECT 1 FROM stage_teams t WHERE t.stage = s.stage AND t.team = s.away_team
+                       AND t.participant = s.participant)
+           END AS hits
+    FROM scored s
+)
+INSERT INTO slot_scores (slot, participant, state, {STAT_LIST})
+SELECT slot, participant, state, state = 1, state = 2,
+       {', '.join(f'CASE WHEN stage = {stage} THEN hits ELSE 0 END'
+                  for stage in (Stage.ROUND_OF_16, Stage.QUARTER_FINALS, Stage.SEMI_FINALS, Stage.FINAL))},
+       stage = {Stage.FINAL} AND COALESCE(champion = (SELECT value FROM settings WHERE name = 'champion'), 0)
+FROM states
+'''
+
+# Adds (sign 1) or takes back (sign -1) the slot scores matching a filter
+APPLY_SCORES = f'''
+UPDATE totals SET {', '.join(f'{column} = totals.{column} + {{sign}} * d.{column}' for column in STAT_COLUMNS)},
+    total = totals.total + {{sign}} * d.total
+FROM (
+    SELECT participant, {', '.join(f'SUM({column}) AS {column}' for column in STAT_COLUMNS)},
+           SUM({{total}}) AS total
+    FROM slot_scores WHERE {{where}} GROUP BY participant
+) AS d
+WHERE totals.participant = d.participant
+'''
+
+LEADERBOARD = f'''
+SELECT name, total, {STAT_LIST}, DENSE_RANK() OVER (ORDER BY total DESC) AS position
+FROM totals JOIN participants ON participants.id = totals.participant
+ORDER BY total DESC, name
+LIMIT ? OFFSET ?
+'''
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+class Database:
+    # One connection per process, shared by the threads under a lock. WAL
+    # lets every gunicorn worker read while one of them writes.
+    def __init__(self, path, points=POINTS):
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.execute('PRAGMA synchronous = NORMAL')
+            self.connection.executescript(SCHEMA)
+        self.reweight(points)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+            self.connection.execute('COMMIT')
+
+    def reweight(self, points):
+        # Totals under new points are one pass over the materialized stats,
+        # no slot is scored again
+        self.total = total_sql(points)
+        value = json.dumps([int(value) for value in points])
+        with self.transaction() as db:
+            row = db.execute("SELECT value FROM settings WHERE name = 'points'").fetchone()
+            if row is None or row['value'] != value:
+                db.execute(f'UPDATE totals SET total = {self.total}')
+                db.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('points', ?)", (value,))
+
+    def rescore(self, db, column, values):
+        # Replaces the slot scores of the given slots or participants and
+        # moves the totals by the difference, set based
+        if not values:
+            return
+        where = f'{column} IN ({placeholders(values)})'
+        db.execute(APPLY_SCORES.format(where=where, sign=-1, total=self.total), values)
+        db.execute(f'DELETE FROM slot_scores WHERE {where}', values)
+        db.execute(SLOT_SCORES.format(where=f'p.{where}'), values)
+        db.execute(APPLY_SCORES.format(where=where, sign=1, total=self.total), values)
+
+    def digests(self):
+        with self._lock:
+            return dict(self.connection.execute('SELECT name, digest FROM participants'))
+
+    def write_participants(self, predictions, removed=()):
+        # Upserts {name: Prediction} and drops the removed names. Unchanged
+        # digests are skipped, so every worker can send the same changes.
+        with self.transaction() as db:
+            ids = []
+            for name, prediction in predictions.items():
+                row = db.execute(
+                    'SELECT id, digest FROM participants WHERE name = ?', (name,)).fetchone()
+                if row is not None and row['digest'] == prediction.digest:
+                    continue
+                if row is None:
+                    participant = db.execute(
+                        'INSERT INTO participants (name, digest, champion) VALUES (?, ?, ?)',
+                        (name, prediction.digest, prediction.champion)).lastrowid
+                    db.execute(
+                        f'INSERT INTO totals (participant, {STAT_LIST}, total) '
+                        f'VALUES (?, {placeholders(STAT_COLUMNS)}, 0)',
+                        (participant, *[0] * len(STAT_COLUMNS)))
+                else:
+                    participant = row['id']
+                    db.execute('UPDATE participants SET digest = ?, champion = ? WHERE id = ?',
+                               (prediction.digest, prediction.champion, participant))
+                    db.execute('DELETE FROM predictions WHERE participant = ?', (participant,))
+                    db.execute('DELETE FROM stage_teams WHERE participant = ?', (participant,))
+
+                db.executemany(
+                    'INSERT INTO predictions (slot, participant, home, away, pairing) VALUES (?, ?, ?, ?, ?)',
+                    [(slot, participant, prediction.home[slot], prediction.away[slot], prediction.pairings[slot])
+                     for slot in range(len(prediction.home)) if prediction.home[slot] != MISSING_GOALS])
+                db.executemany(
+                    'INSERT OR IGNORE INTO stage_teams (stage, team, participant) VALUES (?, ?, ?)',
+                    [(stage, team, participant)
+                     for stage, teams in enumerate(prediction.stage_teams, start=Stage.ROUND_OF_16)
+                     for team in teams])
+                ids.append(participant)
+
+            # Large imports are rescored in chunks of participants
+            for start in range(0, len(ids), 500):
+                self.rescore(db, 'participant', ids[start:start + 500])
+
+            for name in removed:
+                row = db.execute('SELECT id FROM participants WHERE name = ?', (name,)).fetchone()
+                if row is None:
+                    continue
+                for table in ('predictions', 'stage_teams', 'slot_scores', 'totals'):
+                    db.execute(f'DELETE FROM {table} WHERE participant = ?', (row['id'],))
+                db.execute('DELETE FROM participants WHERE id = ?', (row['id'],))
+
+    def write_fixtures(self, fixtures, champion):
+        # Stores the fixtures and results of a data version and rescores only
+        # the slots that changed
+        with self.transaction() as db:
+            stored = {
+                row['slot']: tuple(row)[1:]
+                for row in db.execute(
+                    'SELECT f.slot, stage, kickoff, home_team, away_team, pairing, r.home, r.away '
+                    'FROM fixtures f LEFT JOIN results r USING (slot)')
+            }
+            current = {
+                fixture.slot: (int(fixture.stage), fixture.date.isoformat(), fixture.home_team,
+                               fixture.away_team, fixture.key, fixture.home_score, fixture.away_score)
+                for fixture in fixtures.matches
+                if fixture.listed and fixture.slot is not None
+            }
+            changed = sorted(slot for slot in stored.keys() | current.keys()
+                             if stored.get(slot) != current.get(slot))
+
+            row = db.execute("SELECT value FROM settings WHERE name = 'champion'").fetchone()
+            if (row and row['value']) != champion:
+                db.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('champion', ?)", (champion,))
+                changed = sorted(set(changed) | {
+                    slot for slot, values in current.items() if values[0] == Stage.FINAL})
+
+            for slot in changed:
+                db.execute('DELETE FROM fixtures WHERE slot = ?', (slot,))
+                db.execute('DELETE FROM results WHERE slot = ?', (slot,))
+                if slot not in current:
+                    continue
+                stage, kickoff, home_team, away_team, pairing, home, away = current[slot]
+                db.execute(
+                    'INSERT INTO fixtures (slot, stage, kickoff, home_team, away_team, pairing) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', (slot, stage, kickoff, home_team, away_team, pairing))
+                if home is not None:
+                    db.execute('INSERT INTO results (slot, home, away) VALUES (?, ?, ?)', (slot, home, away))
+            self.rescore(db, 'slot', changed)
+        return changed
+
+    def leaderboard(self, offset=0, limit=25):
+        with self._lock:
+            rows = self.connection.execute(LEADERBOARD, (limit, offset)).fetchall()
+        return [
+            {'nombre': row['name'].split('.')[0].title(), 'total': row['total'],
+             **{column: row[column] for column in STAT_COLUMNS}, 'position': row['position']}
+            for row in rows
+        ]
+
+    def count(self):
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM participants').fetchone()[0]
+
+
+def import_files(database, base_dir, rounds, champion=None):
+    # The flat file layout, one participant at a time so memory does not
+    # grow with the league. The champion defaults to the winner of the final.
+    files = sorted(os.listdir(base_dir))
+    stored = database.digests()
+    for start in range(0, len(files), 500):
+        database.write_participants(
+            {file: load_prediction(base_dir, file) for file in files[start:start + 500]})
+    database.write_participants({}, removed=set(stored) - set(files))
+    fixtures = Fixtures(rounds)
+    database.write_fixtures(fixtures, champion or fixtures.champion)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else 'app/league.db'
+    base_dir = sys.argv[2] if len(sys.argv) > 2 else 'app/assets/predictions/'
+    results = sys.argv[3] if len(sys.argv) > 3 else 'app/assets/final_matches.json'
+    rules = load_rules(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_RULES
+    with open(results, 'r') as f:
+        rounds = json.load(f)['rounds']
+    database = Database(path, rules.points)
+    import_files(database, base_dir, rounds, rules.champion)
+    print(f'Imported {database.count()} participants to {path}')
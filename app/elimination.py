@@ -0,0 +1,595 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.constants import GROUP_MATCHES, KNOCKOUT_BRACKET, MATCH_SLOTS, ROUND_OF_16
+from app.odds import FINAL_SLOT, KNOCKOUT_STAGES, TEAMS, PoissonModel, Scorer, Simulation, Tournament
+from app.scoring import FINAL, POINTS
+
+# Best and worst final position every participant can still reach, position
+# being 1 + the distinct totals above theirs as in the classification, and so
+# whether they can still win. Tournaments that can still happen give
+# positions that are surely reachable: a few thousand played by the
+# simulator and, once the round of 16 is set, one going all each
+# participant's way and one going all against them. Score bounds give the
+# positions nobody can get past, and where the two meet the row is exact.
+# The rest are searched bracket by bracket: the points from the teams
+# reaching each stage are worked out once for every way the winners can
+# go, brackets whose bounds cannot beat the position reached are skipped,
+# and the others are searched depth first over the scores of their matches,
+# skipping states already visited.
+# Before the round of 16 is set, with more participants and brackets than
+# BRACKET_CELLS, or when a search runs out of nodes or time, the row keeps
+# the positions reached, the simulator's estimate, and is not exact. It can
+# still win if some tournament found has it first and is out if the bounds
+# rule that out, otherwise that is None.
+
+KNOCKOUT_SLOTS = [MATCH_SLOTS[tag] for tag in [*ROUND_OF_16, *KNOCKOUT_BRACKET]]
+KNOCKOUT_SOURCES = {
+    MATCH_SLOTS[tag]: tuple(KNOCKOUT_SLOTS.index(MATCH_SLOTS[source]) for source in sources)
+    for tag, sources in KNOCKOUT_BRACKET.items()
+}
+SLOT_STAGES = {MATCH_SLOTS[tag]: stage for tag, stage in KNOCKOUT_STAGES.items()}
+# Nodes every search gets before any of them gets node_limit
+QUICK_NODES = 5000
+# Simulated tournaments the reachable positions start from
+WITNESS_SIMS = 2000
+# Brackets times participants the searches keep at most, beyond that
+# the rows not settled by the bounds keep the positions reached
+BRACKET_CELLS = 1 << 22
+
+
+def levels_above(totals):
+    # Distinct totals above each participant's, one column per tournament
+    order = np.argsort(-totals, axis=0, kind='stable')
+    ordered = np.take_along_axis(totals, order, axis=0)
+    new = np.zeros(ordered.shape, dtype=np.int64)
+    new[1:] = ordered[1:] != ordered[:-1]
+    levels = np.empty_like(new)
+    np.put_along_axis(levels, order, np.cumsum(new, axis=0), axis=0)
+    return levels
+
+
+def distinct_above(diffs):
+    # Distinct values above 0 in each row
+    values = np.sort(np.where(diffs > 0, diffs, 0), axis=-1)
+    new = values > 0
+    new[..., 1:] &= values[..., 1:] != values[..., :-1]
+    return new.sum(axis=-1)
+
+
+def sorted_ranges(first, second):
+    # Ranges sorted by their first end, then their second, both ends being
+    # 0 or more: packed into one integer they sort in one go
+    keys = np.sort(first.astype(np.int64) << 32 | second, axis=1)
+    return keys >> 32, keys & 0xffffffff
+
+
+def fewest_distinct(low, high, limit=None):
+    # Fewest distinct values above 0 rivals each ranging over [low, high]
+    # can take, row by row, counted up to limit: the ones surely above need
+    # a value for each of their ranges no other value falls in. Picking
+    # from the lowest top up, the next value is the top of the first range
+    # starting above the last one, found for every range at once with the
+    # rows laid end to end.
+    sure = low > 0
+    high, low = sorted_ranges(np.where(sure, high, 0), np.where(sure, low, 0))
+    n_rows, n_rivals = low.shape
+    offsets = np.arange(n_rows)[:, None] * (int(high.max(initial=0)) + 1)
+    starts = np.maximum.accumulate(low, axis=1) + offsets
+    following = np.searchsorted(starts.ravel(), (high + offsets).ravel(), side='right').reshape(low.shape) - \
+        np.arange(n_rows)[:, None] * n_rivals
+    rows = np.arange(n_rows)
+    counts = np.zeros(n_rows, dtype=np.int64)
+    column = (~sure).sum(axis=1)
+    if limit is None:
+        limit = n_rivals
+    while ((column < n_rivals) & (counts < limit)).any():
+        picked = (column < n_rivals) & (counts < limit)
+        counts += picked
+        column = np.where(picked, following[rows, np.minimum(column, n_rivals - 1)], n_rivals)
+    return counts
+
+
+def most_distinct(low, high):
+    # Most distinct values above 0 the same rivals can take: every run of
+    # overlapping ranges holds at most one value per rival and per point
+    # it spans
+    maybe = high > 0
+    low, high = sorted_ranges(np.where(maybe, np.maximum(low, 1), 0), np.where(maybe, high, 0))
+    reach = np.maximum.accumulate(high, axis=1)
+    starts = low > 0
+    starts[:, 1:] &= low[:, 1:] > reach[:, :-1]
+    ends = low > 0
+    ends[:, :-1] &= starts[:, 1:]
+    rows, first = np.nonzero(starts)
+    last = np.nonzero(ends)[1]
+    runs = np.minimum(last - first + 1, reach[rows, last] - low[rows, first] + 1)
+    return np.bincount(rows, weights=runs, minlength=len(low)).astype(np.int64)
+
+
+class EliminationSolver:
+    def __init__(self, preds, results, match_rows, node_limit=50000, points=POINTS, deadline=None):
+        self.preds = preds
+        self.results = results
+        self.match_rows = match_rows
+        self.node_limit = node_limit
+        self.points = points
+        # time.time() past which the searches left give up
+        self.deadline = deadline
+        self.bracket_table = None
+        self.gains_seen = {}
+        self.tournament = tournament = Tournament(match_rows)
+        max_goals = int(max(preds.home.max(), preds.away.max(), 0)) + 1
+        self.scorer = scorer = Scorer(preds, results, tournament, max_goals, points)
+        self.base = scorer.fixed_totals[:, 0].astype(np.int64)
+        self.team_ids = np.array([preds.team_id(team) for team in TEAMS])
+
+        self.exact = all(tournament.fixed(slot) for slot in range(GROUP_MATCHES)) and \
+            all(MATCH_SLOTS[tag] in tournament.teams for tag in ROUND_OF_16)
+
+        # Results of each outcome, from the most likely scores on
+        width = scorer.width
+        self.outcomes = [
+            np.array([home * width + away for home in range(1, width) for away in range(home)]),
+            np.array([goals * width + goals for goals in range(width)]),
+            np.array([home * width + away for away in range(1, width) for home in range(away)]),
+        ]
+        self.champions = np.array([self.champion_points(team) for team in range(len(TEAMS))])
+
+        # Most points each participant can still add over the knockout
+        # matches, the champion included
+        n_players = len(preds.names)
+        self.knockout_high = np.zeros(n_players, dtype=np.int64)
+        for slot in KNOCKOUT_SLOTS:
+            if tournament.fixed(slot):
+                continue
+            best_result = scorer.result_points[slot].max(axis=1)
+            teams = tournament.teams.get(slot)
+            if teams is not None:
+                pair = self.pair(*teams)
+                self.knockout_high += scorer.stage_points[slot][:, pair] + \
+                    best_result * scorer.pairing_ok[slot][:, pair]
+            else:
+                self.knockout_high += scorer.stage_points[slot].max(axis=1) + \
+                    best_result * scorer.pairing_ok[slot].any(axis=1)
+        self.knockout_high += self.champions.max(axis=0) if scorer.champion is None else self.champions[0]
+
+        # Points from every match pairing and champion still possible, as
+        # columns the bounds pick from
+        self.pairings_seen = {}
+        self.columns = {}
+        stage_columns = []
+        score_columns = []
+        for slot, pairs in self.possible(0, (-1,) * len(KNOCKOUT_SLOTS)) if self.exact else []:
+            for pair in pairs:
+                self.columns[slot, pair] = len(self.columns)
+                if slot is None:
+                    stage_columns.append(self.champions[pair])
+                    score_columns.append(np.zeros(n_players))
+                else:
+                    stage_columns.append(scorer.stage_points[slot][:, pair])
+                    score_columns.append(
+                        scorer.result_points[slot].max(axis=1) * scorer.pairing_ok[slot][:, pair])
+        self.stage_columns = np.array(stage_columns, dtype=np.int32).T
+        self.score_columns = np.array(score_columns, dtype=np.int32).T
+
+    def possible(self, step, winners):
+        # Team pairings each match left can still have, and the champions
+        # (as match None)
+        tournament = self.tournament
+        matches = []
+        possible = []
+        for i, slot in enumerate(KNOCKOUT_SLOTS):
+            if i < step:
+                possible.append({winners[i]})
+                continue
+            if slot in tournament.teams:
+                homes, aways = [{team} for team in tournament.teams[slot]]
+            else:
+                homes, aways = [possible[source] for source in KNOCKOUT_SOURCES[slot]]
+            if slot in tournament.winners:
+                possible.append({tournament.winners[slot]})
+            else:
+                possible.append(homes | aways)
+            if not tournament.fixed(slot):
+                matches.append((slot, [self.pair(home, away) for home in sorted(homes) for away in sorted(aways)]))
+        if step < len(KNOCKOUT_SLOTS):
+            matches.append((None, sorted(possible[-1]) if self.scorer.champion is None else [0]))
+        return matches
+
+    def pairings(self, step, winners):
+        # Columns of the pairings still possible, and where each match
+        # starts among them
+        key = (step, winners)
+        if key not in self.pairings_seen:
+            columns = []
+            starts = []
+            for slot, pairs in self.possible(step, winners):
+                starts.append(len(columns))
+                columns += [self.columns[slot, pair] for pair in pairs]
+            self.pairings_seen[key] = (np.array(columns, dtype=np.intp), np.array(starts, dtype=np.intp))
+        return self.pairings_seen[key]
+
+    def pair(self, home, away):
+        return home * len(TEAMS) + away
+
+    def champion_points(self, winner):
+        # Champion points of everybody when the given team wins the final
+        preds = self.preds
+        champion = self.scorer.champion
+        if champion is None:
+            champion = self.scorer.champion_ids[winner]
+        return self.points[6] * (preds.valid[:, FINAL_SLOT] & (preds.champion == champion))
+
+    def unused(self, slot, players):
+        # One score of each outcome none of the players predicted
+        predicted = self.preds.home[players, slot].astype(np.int64) * self.scorer.width + \
+            self.preds.away[players, slot]
+        used = np.zeros(self.scorer.width ** 2, dtype=bool)
+        used[predicted[self.preds.valid[players, slot]]] = True
+        return [outcome[np.argmin(used[outcome])] for outcome in self.outcomes]
+
+    def gains(self, step, pair, home_wins):
+        # Result points of everybody with each score worth trying at a
+        # knockout match, given its pairing and the team going through. Any
+        # score nobody predicted does the same as the unpredicted one of its
+        # outcome, any predicted one can matter: rivals gaining points can
+        # tie with others above p as well as pass p.
+        key = (step, pair, home_wins)
+        if key not in self.gains_seen:
+            slot = KNOCKOUT_SLOTS[step]
+            scorer = self.scorer
+            players = np.arange(len(self.preds.names))
+            predicted = self.preds.home[:, slot].astype(np.int64) * scorer.width + self.preds.away[:, slot]
+            results = np.concatenate([self.unused(slot, players), np.unique(predicted[self.preds.valid[:, slot]])])
+            # A draw can send either team through
+            home_goals, away_goals = np.divmod(results, scorer.width)
+            results = results[home_goals >= away_goals if home_wins else home_goals <= away_goals]
+            self.gains_seen[key] = scorer.result_points[slot][:, results].T.astype(np.int64) * \
+                scorer.pairing_ok[slot][:, pair]
+        return self.gains_seen[key]
+
+    def backed(self, slot, teams):
+        # Whether each participant sees their team (one per participant)
+        # through the match slot
+        players = np.arange(len(self.preds.names))
+        stage = SLOT_STAGES[slot]
+        if stage == FINAL:
+            return self.preds.champion == self.scorer.champion_ids[teams]
+        return self.preds.stage_teams[stage + 1][players, self.team_ids[teams]]
+
+    def scenarios(self, against):
+        # Distinct totals above each participant p's in a tournament where
+        # every match left goes p's way (or against p). All of them are
+        # played at once, one column per tournament.
+        scorer = self.scorer
+        tournament = self.tournament
+        preds = self.preds
+        n_players = len(preds.names)
+        players = np.arange(n_players)
+        totals = np.repeat(self.base[:, None], n_players, axis=1)
+        winners = [None] * len(KNOCKOUT_SLOTS)
+        for step, slot in enumerate(KNOCKOUT_SLOTS):
+            if slot in tournament.teams:
+                home, away = [np.full(n_players, team) for team in tournament.teams[slot]]
+            else:
+                home, away = [winners[source] for source in KNOCKOUT_SOURCES[slot]]
+
+            if tournament.fixed(slot):
+                home_goals, away_goals = tournament.goals[slot]
+                if slot in tournament.winners:
+                    home_wins = home == tournament.winners[slot]
+                elif home_goals != away_goals:
+                    home_wins = np.full(n_players, home_goals > away_goals)
+                else:
+                    home_wins = self.backed(slot, home) != against
+                winners[step] = np.where(home_wins, home, away)
+                continue
+
+            # The team p sees through wins, or the one of p's predicted
+            # outcome when p sees both or none through, with p's score when
+            # it agrees
+            backs_home = self.backed(slot, home)
+            outcome = preds.outcome[:, slot]
+            home_wins = np.where(backs_home != self.backed(slot, away), backs_home, outcome >= 0) != against
+            pairs = self.pair(home, away)
+            fits = preds.valid[:, slot] & scorer.pairing_ok[slot][players, pairs] & \
+                np.where(home_wins, outcome >= 0, outcome <= 0)
+
+            # Otherwise an unpredicted score, against p of another outcome
+            # than p's, a draw when p has the winner right
+            kind = np.where(home_wins, 0, 2)
+            if against:
+                kind = np.where(np.where(home_wins, outcome == 1, outcome == -1), 1, kind)
+            unused_home, unused_away = np.divmod(self.unused(slot, players), scorer.width)
+            home_goals = unused_home[kind]
+            away_goals = unused_away[kind]
+            if not against:
+                home_goals = np.where(fits, preds.home[:, slot], home_goals)
+                away_goals = np.where(fits, preds.away[:, slot], away_goals)
+
+            totals += scorer.slot_points(slot, home, away, home_goals, away_goals)
+            winners[step] = np.where(home_wins, home, away)
+
+        if scorer.champion is None:
+            totals += self.champions[winners[-1]].T
+        else:
+            totals += self.champions[0][:, None]
+        return levels_above(totals)[players, players]
+
+    def winner(self, slot):
+        # Winner of a match already played, unless it was a draw the next
+        # match does not tell yet
+        tournament = self.tournament
+        if not tournament.fixed(slot):
+            return None
+        if slot in tournament.winners:
+            return tournament.winners[slot]
+        home_goals, away_goals = tournament.goals[slot]
+        if home_goals == away_goals:
+            return None
+        return tournament.teams[slot][0 if home_goals > away_goals else 1]
+
+    def bounds(self, chunk=1000000):
+        # Fewest and most distinct totals that can end up above each
+        # participant's, from the least and most points every rival can
+        # still gain on them, a block of participants at a time against
+        # everybody
+        n_players = len(self.preds.names)
+        if self.exact:
+            # Over the pairings still possible
+            columns, starts = self.pairings(0, (-1,) * len(KNOCKOUT_SLOTS))
+            stage = self.stage_columns[:, columns]
+            scores = self.score_columns[:, columns]
+            ends = [*starts[1:], len(columns)]
+        else:
+            # Before the round of 16 is set, anything can still happen in
+            # the group matches left
+            top = self.base + self.knockout_high
+            remaining = [slot for slot in range(GROUP_MATCHES) if not self.tournament.fixed(slot)]
+            if remaining:
+                top = top + self.scorer.result_points[remaining].max(axis=2).sum(axis=0)
+
+        fewest = np.zeros(n_players, dtype=np.int64)
+        most = np.zeros(n_players, dtype=np.int64)
+        block = max(1, chunk // n_players)
+        for first in range(0, n_players, block):
+            players = np.arange(first, min(first + block, n_players))
+            if self.exact:
+                low = (self.base[None] - self.base[players, None]).astype(np.int32)
+                high = low.copy()
+                for start, end in zip(starts, ends):
+                    change = stage[None, :, start:end] - stage[players, None, start:end]
+                    low += (change - scores[players, None, start:end]).min(axis=2)
+                    high += (change + scores[None, :, start:end]).max(axis=2)
+            else:
+                low = self.base[None] - top[players, None]
+                high = top[None] - self.base[players, None]
+            high[players - first, players] = 0
+            fewest[players] = fewest_distinct(low, high)
+            most[players] = most_distinct(low, high)
+        return fewest, most
+
+    def witnesses(self, sims=WITNESS_SIMS, batch=500):
+        # Fewest and most distinct totals above each participant's in
+        # tournaments that can still happen: the simulator's, and once the
+        # round of 16 is set, the ones going all each participant's way
+        # and all against them
+        model = PoissonModel(max_goals=self.scorer.width - 1)
+        rng = np.random.default_rng(0)
+        least = most = None
+        for first in range(0, sims, batch):
+            levels = levels_above(self.scorer.totals(
+                Simulation(self.tournament, model, min(batch, sims - first), rng)))
+            least = levels.min(axis=1) if least is None else np.minimum(least, levels.min(axis=1))
+            most = levels.max(axis=1) if most is None else np.maximum(most, levels.max(axis=1))
+        if self.exact:
+            least = np.minimum(least, self.scenarios(against=False))
+            most = np.maximum(most, self.scenarios(against=True))
+        return least, most
+
+    def brackets(self):
+        # Every way the knockout matches left can still go, one column per
+        # bracket: the winner and pairing of each match, the points every
+        # participant gets from the teams it takes through each stage, and
+        # for each match the first bracket with each pairing and winner and
+        # which one every bracket has. None when there are too many to keep.
+        if self.bracket_table is not None or not self.exact:
+            return self.bracket_table
+        tournament = self.tournament
+        n_players = len(self.preds.names)
+        open_steps = [step for step, slot in enumerate(KNOCKOUT_SLOTS) if self.winner(slot) is None]
+        n_brackets = 1 << len(open_steps)
+        if n_players * n_brackets > BRACKET_CELLS:
+            return None
+
+        brackets = np.arange(n_brackets)
+        winners = np.zeros((len(KNOCKOUT_SLOTS), n_brackets), dtype=np.intp)
+        pairs = np.zeros((len(KNOCKOUT_SLOTS), n_brackets), dtype=np.intp)
+        stage = np.zeros((n_players, n_brackets), dtype=np.int32)
+        kinds = []
+        for step, slot in enumerate(KNOCKOUT_SLOTS):
+            if slot in tournament.teams:
+                home, away = [np.full(n_brackets, team) for team in tournament.teams[slot]]
+            else:
+                home, away = [winners[source] for source in KNOCKOUT_SOURCES[slot]]
+            pairs[step] = self.pair(home, away)
+            if step in open_steps:
+                winners[step] = np.where((brackets >> open_steps.index(step)) & 1, away, home)
+            else:
+                winners[step] = self.winner(slot)
+            if not tournament.fixed(slot):
+                stage += self.scorer.stage_points[slot][:, pairs[step]]
+            kinds.append(np.unique(pairs[step] * 2 + (winners[step] == home), return_index=True,
+                                   return_inverse=True)[1:])
+        if self.scorer.champion is None:
+            stage += self.champions[winners[-1]].T
+        else:
+            stage += self.champions[0][:, None]
+        self.bracket_table = (winners, pairs, stage, kinds)
+        return self.bracket_table
+
+    def search(self, p, worst, reached, node_limit=None):
+        # Fewest (or most) distinct totals that can end up above p's, given
+        # a number of them already reached. Returns the best one found and
+        # whether the search got through, it stops when it runs out of
+        # nodes or time, or right away when the brackets are too many.
+        node_limit = self.node_limit if node_limit is None else node_limit
+        table = self.brackets()
+        if table is None or self.deadline is not None and time.time() > self.deadline:
+            return int(reached), False
+        winners, pairs, stage, kinds = table
+        others = np.delete(np.arange(len(self.preds.names)), p)
+        steps = [step for step, slot in enumerate(KNOCKOUT_SLOTS) if not self.tournament.fixed(slot)]
+        best = reached
+        nodes = 0
+        changes_seen = {}
+
+        def changes(step, bracket):
+            # Points every rival gains on p with each score worth trying at
+            # a match, the same for every bracket with its pairing and winner
+            pair = pairs[step, bracket]
+            key = (step, pair, bool(winners[step, bracket] == pair // len(TEAMS)))
+            if key not in changes_seen:
+                gained = self.gains(*key)
+                change = gained[:, others] - gained[:, [p]]
+                changes_seen[key] = change[sorted({row.tobytes(): i for i, row in enumerate(change)}.values())]
+            return changes_seen[key]
+
+        def promising(low, high):
+            # Rows whose bounds can still beat the best, the most promising
+            # first, with their fewest and most distinct totals above p
+            bound = most_distinct(low, high) if worst else fewest_distinct(low, high, best)
+            rows = np.flatnonzero(bound > best if worst else bound < best)
+            rows = rows[np.argsort(-bound[rows] if worst else bound[rows], kind='stable')]
+            if worst:
+                return zip(rows, fewest_distinct(low[rows], high[rows]).tolist(), bound[rows].tolist())
+            return zip(rows, bound[rows].tolist(), most_distinct(low[rows], high[rows]).tolist())
+
+        def visit(step, rivals, diffs, matches, rest_low, rest_high, seen):
+            # Every score of the match at step tried at once, the ones whose
+            # bounds can still beat the best go on to the next match
+            nonlocal best, nodes
+            nodes += 1
+            if nodes > node_limit or self.deadline is not None and time.time() > self.deadline:
+                raise StopIteration
+            key = (step, rivals.tobytes(), diffs.tobytes())
+            if key in seen:
+                return
+            seen.add(key)
+
+            children = diffs + matches[step][:, rivals]
+            if step == len(matches) - 1:
+                counts = distinct_above(children)
+                best = max(best, int(counts.max())) if worst else min(best, int(counts.min()))
+                return
+            high = children + rest_high[step + 1][rivals]
+            for child, fewest, most in promising(children + rest_low[step + 1][rivals], high):
+                if worst and most <= best or not worst and fewest >= best:
+                    break
+                if fewest == most:
+                    best = fewest
+                    continue
+                keep = high[child] > 0
+                visit(step + 1, rivals[keep], children[child, keep], matches, rest_low, rest_high, seen)
+
+        # The brackets whose bounds can beat the positions reached, the most
+        # promising first, each searched over the scores of its matches
+        diffs = (self.base[others] - self.base[p])[:, None] + stage[others] - stage[p]
+        low = diffs.T.copy()
+        high = diffs.T.copy()
+        for step in steps:
+            first, inverse = kinds[step]
+            low += np.array([changes(step, bracket).min(axis=0) for bracket in first])[inverse]
+            high += np.array([changes(step, bracket).max(axis=0) for bracket in first])[inverse]
+        try:
+            for bracket, fewest, most in promising(low, high):
+                if worst and most <= best or not worst and fewest >= best:
+                    break
+                if fewest == most:
+                    best = fewest
+                    continue
+                # The matches that can change the most first, the bounds of
+                # the rest narrow down soonest that way
+                matches = [changes(step, bracket) for step in steps]
+                matches.sort(key=lambda change: -int((change.max(axis=0) - change.min(axis=0)).sum()))
+                rest_low = np.zeros((len(steps) + 1, len(others)), dtype=np.int64)
+                rest_high = np.zeros((len(steps) + 1, len(others)), dtype=np.int64)
+                for step in reversed(range(len(steps))):
+                    rest_low[step] = rest_low[step + 1] + matches[step].min(axis=0)
+                    rest_high[step] = rest_high[step + 1] + matches[step].max(axis=0)
+                rivals = np.flatnonzero(high[bracket] > 0)
+                visit(0, rivals, diffs[rivals, bracket], matches, rest_low, rest_high, set())
+                if not worst and best == 0:
+                    break
+        except StopIteration:
+            return int(best), False
+        return int(best), True
+
+    def run_searches(self, searches, pool, workers):
+        if pool is None or len(searches) < 2:
+            return zip(searches, [self.search(*search) for search in searches])
+        chunks = [searches[i::workers * 4] for i in range(workers * 4)]
+        values = [value for chunk in pool.map(run_worker_searches, chunks) for value in chunk]
+        return zip([search for chunk in chunks for search in chunk], values)
+
+    def solve(self, workers=1, budget=None):
+        # budget: seconds the searches may take in all
+        self.deadline = None if budget is None else time.time() + budget
+        n_players = len(self.preds.names)
+        fewest, most = self.bounds()
+        # Positions reached are exact when they meet the bounds
+        positions = dict(zip((False, True), self.witnesses()))
+        exact = {False: positions[False] == fewest, True: positions[True] == most}
+        if self.exact:
+            # The other participants are searched, both ends of a row one
+            # after the other so the rows done are whole
+            pending = [(p, worst) for p in range(n_players) for worst in (False, True) if not exact[worst][p]]
+            pool = None
+            if workers > 1 and len(pending) > 1:
+                setup = (self.preds, self.results, self.match_rows, self.node_limit, self.points, self.deadline)
+                pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=(setup,))
+            try:
+                # Every search gets a few nodes first, so a handful of hard
+                # ones cannot use up the budget, the time left goes to those
+                for node_limit in sorted({min(QUICK_NODES, self.node_limit), self.node_limit}):
+                    searches = [(p, worst, positions[worst][p], node_limit)
+                                for p, worst in pending if not exact[worst][p]]
+                    for (p, worst, *_), (value, done) in self.run_searches(searches, pool, workers):
+                        positions[worst][p] = value
+                        exact[worst][p] = done
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+
+        return [{
+            'nombre': name.split('.')[0].title(),
+            # In once some tournament has nobody above, out once the bounds
+            # or the search rule that out
+            'alive': True if positions[False][p] == 0 else False if exact[False][p] or fewest[p] > 0 else None,
+            'best_position': int(positions[False][p]) + 1,
+            'worst_position': int(positions[True][p]) + 1,
+            'exact': bool(exact[False][p] and exact[True][p]),
+        } for p, name in enumerate(self.preds.names)]
+
+
+_SOLVER = None
+
+
+def init_worker(setup):
+    global _SOLVER
+    _SOLVER = EliminationSolver(*setup)
+
+
+def run_worker_searches(searches):
+    return [_SOLVER.search(*search) for search in searches]
+
+
+def eliminate(preds, results, match_rows, workers=1, node_limit=50000, points=POINTS, budget=None):
+    # Whether every participant can still win, and the best and worst
+    # position they can still finish in
+    rows = EliminationSolver(preds, results, match_rows, node_limit, points).solve(workers, budget)
+    rows.sort(key=lambda row: (row['best_position'], row['worst_position'], row['nombre']))
+    return rows
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+from itertools import chain
+
+import numpy as np
+
+from app.fixtures import Stage
+from app.scoring import EXACT, MISS, NOT_SCORED, OUTCOME, POINTS
+
+GRID_COLUMNS = [
+    'slot', 'stage', 'kickoff', 'home_team', 'away_team', 'home_score', 'away_score',
+    'participant', 'home_prediction', 'away_prediction', 'pairing', 'state', 'points',
+]
+
+STATE_NAMES = {NOT_SCORED: None, EXACT: 'exact', OUTCOME: 'outcome', MISS: 'miss'}
+
+# Streamed responses are flushed in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+
+
+def cell_points(points=POINTS):
+    # Points of a match cell by state, the stage and champion bonuses are not
+    # tied to a single match
+    values = np.zeros(len(STATE_NAMES), dtype=np.int64)
+    values[EXACT] = points[0]
+    values[OUTCOME] = points[1]
+    return values
+
+
+def grid_fixtures(fixtures):
+    return [fixture for fixture in fixtures.matches
+            if fixture.listed and fixture.slot is not None]
+
+
+def participant_names(preds):
+    return [name.split('.')[0].title() for name in preds.names]
+
+
+def grid_records(view):
+    # One record per match and participant, generated lazily. Only one match
+    # column of the matrices is held as lists at a time.
+    preds = view.preds
+    names = participant_names(preds)
+    values = cell_points(view.points)
+    for fixture in grid_fixtures(view.fixtures):
+        slot = fixture.slot
+        knockout = fixture.stage != Stage.GROUP
+        homes = preds.home[:, slot].tolist()
+        aways = preds.away[:, slot].tolist()
+        valid = preds.valid[:, slot].tolist()
+        keys = preds.key[:, slot].tolist()
+        states = view.states[:, slot].tolist()
+        for p, name in enumerate(names):
+            state = states[p]
+            yield [
+                slot, fixture.type, fixture.date.isoformat(),
+                fixture.home_team, fixture.away_team, fixture.home_score, fixture.away_score,
+                name,
+                homes[p] if valid[p] else None,
+                aways[p] if valid[p] else None,
+                preds.pairing(keys[p]) if knockout and keys[p] >= 0 else None,
+                STATE_NAMES[state],
+                int(values[state]) if state != NOT_SCORED else None,
+            ]
+
+
+def chunked(lines):
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def csv_lines(records, columns=GRID_COLUMNS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in chain([columns], records):
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_lines(records, columns=GRID_COLUMNS):
+    for record in records:
+        yield json.dumps(dict(zip(columns, record)), ensure_ascii=False) + '\n'
+
+
+def grid_npz(view):
+    # Columnar copy of the whole grid for bulk loading: participant × slot
+    # matrices plus the match and participant labels
+    fixtures = grid_fixtures(view.fixtures)
+    slots = np.array([fixture.slot for fixture in fixtures], dtype=np.intp)
+    states = np.asarray(view.states)[:, slots]
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        participants=np.array(participant_names(view.preds)),
+        slots=slots,
+        stages=np.array([fixture.type for fixture in fixtures]),
+        kickoffs=np.array([fixture.date for fixture in fixtures], dtype='datetime64[m]'),
+        home_teams=np.array([fixture.home_team for fixture in fixtures]),
+        away_teams=np.array([fixture.away_team for fixture in fixtures]),
+        home_scores=np.array([-1 if fixture.home_score is None else fixture.home_score
+                              for fixture in fixtures], dtype=np.int16),
+        away_scores=np.array([-1 if fixture.away_score is None else fixture.away_score
+                              for fixture in fixtures], dtype=np.int16),
+        home_predictions=view.preds.home[:, slots],
+        away_predictions=view.preds.away[:, slots],
+        states=states,
+        points=cell_points(view.points)[states],
+    )
+    buffer.seek(0)
+    return buffer
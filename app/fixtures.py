@@ -0,0 +1,113 @@
+from collections import namedtuple
+from datetime import datetime
+from enum import IntEnum
+
+from app.constants import MATCH_SLOTS, TEAMS_EN_ES
+
+
+class Stage(IntEnum):
+    GROUP = 0
+    ROUND_OF_16 = 1
+    QUARTER_FINALS = 2
+    SEMI_FINALS = 3
+    FINAL = 4
+
+
+# Knockout round names of the feed, the group rounds are named Matchday n
+STAGE_ROUNDS = {
+    'Round of 16': Stage.ROUND_OF_16,
+    'Quarter-finals': Stage.QUARTER_FINALS,
+    'Semi-finals': Stage.SEMI_FINALS,
+    'Final': Stage.FINAL,
+}
+# Row type of each stage in the matches table
+STAGE_TYPES = ['group', *STAGE_ROUNDS]
+
+# One match of the feed, parsed, localized and matched to its prediction
+# slot. opens is set on the first match of a knockout stage and listed on the
+# matches the table shows (teams known, first time the tag appears).
+Fixture = namedtuple('Fixture', [
+    'slot', 'stage', 'type', 'date', 'date_label', 'tag', 'key',
+    'home_team', 'away_team', 'home_code', 'away_code',
+    'home_score', 'away_score', 'result', 'opens', 'listed',
+])
+
+
+class Fixtures:
+    # Every match of a data version, compiled once so the callbacks only
+    # project their views from it
+    def __init__(self, rounds):
+        matches = []
+        tags = set()
+        prev_type = 'group'
+        # Teams reaching each knockout stage, as the feed names them
+        self.real_teams = {round_type: [] for round_type in STAGE_ROUNDS}
+        # Winner of the final once played, extra time and penalties included
+        self.champion = None
+
+        for round in rounds:
+            round_matches = []
+            for match in round['matches']:
+                date = datetime.strptime(
+                    match['date'] + ' ' + match['time'], '%Y-%m-%d %H:%M')
+                round_matches.append((date, match))
+            round_matches.sort(key=lambda item: item[0])
+
+            group = round['name'].split(' ')[0] == 'Matchday'
+            round_type = 'group' if group else round['name']
+            stage = Stage.GROUP if group else STAGE_ROUNDS.get(round_type)
+
+            for date, match in round_matches:
+                home_team = TEAMS_EN_ES.get(
+                    match['team1']['name'], match['team1']['name'])
+                away_team = TEAMS_EN_ES.get(
+                    match['team2']['name'], match['team2']['name'])
+                key = f"{home_team}-{away_team}"
+                tag = key if group else match['date'] + ' ' + match['time']
+                if stage == Stage.SEMI_FINALS:
+                    tag += f" {match.get('num', 0)}"
+
+                score = match.get('score', {}).get('ft', None)
+                home_score = score[0] if score else None
+                away_score = score[1] if score else None
+                if stage == Stage.FINAL and score:
+                    decider = match['score'].get('p') or match['score'].get('et') or score
+                    if decider[0] != decider[1]:
+                        self.champion = home_team if decider[0] > decider[1] else away_team
+                if tag == 'Test-Test':
+                    home_score = 1
+                    away_score = 1
+
+                opens = (stage is not None and stage > Stage.GROUP
+                         and prev_type == STAGE_TYPES[stage - 1])
+                if stage is not None and stage > Stage.GROUP and (stage != Stage.FINAL or opens):
+                    self.real_teams[round_type] += [home_team, away_team]
+                prev_type = round_type
+
+                listed = tag not in tags and home_team != '--' and away_team != '--'
+                if listed:
+                    tags.add(tag)
+
+                matches.append(Fixture(
+                    slot=MATCH_SLOTS.get(tag),
+                    stage=stage,
+                    type=round_type,
+                    date=date,
+                    date_label=date.strftime('%a, %d %b, %H:%M').title(),
+                    tag=tag,
+                    key=key,
+                    home_team=home_team,
+                    away_team=away_team,
+                    home_code=match['team1']['code'],
+                    away_code=match['team2']['code'],
+                    home_score=home_score,
+                    away_score=away_score,
+                    result='Not started' if home_score is None else f'{home_score} - {away_score}',
+                    opens=opens,
+                    listed=listed,
+                ))
+
+        self.matches = tuple(matches)
+        self.slots = {match.slot: match for match in self.matches
+                      if match.listed and match.slot is not None}
+
@@ -0,0 +1,81 @@
+import base64
+import hashlib
+import logging
+import os
+import re
+import struct
+import sys
+
+log = logging.getLogger("app")
+
+# Every flag packed into one SVG sprite with a <view> per team code, so the
+# cells point to flags.<hash>.svg#GER and a page loads a single flag file
+# that can be cached forever. Inline data URIs are not an option, the table
+# markdown refuses data: links.
+FLAGS_DIR = 'app/assets/country-flags'
+ASSETS_DIR = 'app/assets'
+
+# Asset names carrying their content hash, safe to cache for good
+HASHED_ASSET = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+SPRITE_NAME = re.compile(r'^flags\.[0-9a-f]{12}\.svg$')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_size(data):
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('not a PNG file')
+    return struct.unpack('>II', data[16:24])
+
+
+def build_sprite(flags_dir=FLAGS_DIR):
+    # Flags are stacked vertically, each view showing just one of them
+    views = []
+    images = []
+    width = height = 0
+    for file in sorted(os.listdir(flags_dir)):
+        code, extension = os.path.splitext(file)
+        if extension != '.png':
+            continue
+        with open(os.path.join(flags_dir, file), 'rb') as f:
+            data = f.read()
+        w, h = png_size(data)
+        views.append(f'<view id="{code}" viewBox="0 {height} {w} {h}"/>')
+        images.append(
+            f'<image x="0" y="{height}" width="{w}" height="{h}" '
+            f'href="data:image/png;base64,{base64.b64encode(data).decode()}"/>')
+        width = max(width, w)
+        height += h
+
+    # No width or height on the root, so an <img> takes the aspect ratio of
+    # the view it points to
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}">' +
+        ''.join(views) + ''.join(images) + '</svg>'
+    )
+    codes = [view.split('"')[1] for view in views]
+    return svg.encode('utf-8'), codes
+
+
+def write_sprite(flags_dir=FLAGS_DIR, assets_dir=ASSETS_DIR):
+    # Returns the sprite file name and its codes, writing it when it does not
+    # exist yet and dropping the sprites of older flags
+    svg, codes = build_sprite(flags_dir)
+    name = f'flags.{hashlib.sha1(svg).hexdigest()[:12]}.svg'
+    path = os.path.join(assets_dir, name)
+    if not os.path.exists(path):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(svg)
+        os.replace(tmp, path)
+    for file in os.listdir(assets_dir):
+        if SPRITE_NAME.match(file) and file != name:
+            os.remove(os.path.join(assets_dir, file))
+    return name, codes
+
+
+if __name__ == "__main__":
+    flags_dir = sys.argv[1] if len(sys.argv) > 1 else FLAGS_DIR
+    assets_dir = sys.argv[2] if len(sys.argv) > 2 else ASSETS_DIR
+    name, codes = write_sprite(flags_dir, assets_dir)
+    print(f'Wrote {len(codes)} flags to {os.path.join(assets_dir, name)}')
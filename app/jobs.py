@@ -0,0 +1,73 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("app")
+
+
+class JobQueue:
+    # Runs the heavy recomputes in background threads instead of inside the
+    # requests. Jobs are keyed by the data they are computed from, so every
+    # visitor asking for the same key shares one run, and the last good result
+    # of each kind is kept to be served while the next one is computed.
+    def __init__(self, workers=1):
+        self.runs = 0
+        self.shared = 0
+        self.errors = 0
+        self._pending = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='jobs')
+
+    def submit(self, kind, key, compute):
+        with self._lock:
+            future = self._pending.get((kind, key))
+            if future is not None:
+                self.shared += 1
+                return future
+            # The job can not leave _pending before this lock is released
+            future = self._executor.submit(self._run, kind, key, compute)
+            self._pending[(kind, key)] = future
+            return future
+
+    def _run(self, kind, key, compute):
+        try:
+            result = compute()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self._pending.pop((kind, key), None)
+            log.exception(f'Background {kind} job failed, keeping the last good result')
+            raise
+
+        with self._lock:
+            self.runs += 1
+            self._latest[kind] = (key, result)
+            self._pending.pop((kind, key), None)
+        return result
+
+    def latest(self, kind):
+        # (key, result) of the last finished job of a kind, or None
+        with self._lock:
+            return self._latest.get(kind)
+
+    def invalidate(self, kind=None):
+        # Forget the last good results, the next request waits for its job
+        with self._lock:
+            if kind is None:
+                self._latest.clear()
+            else:
+                self._latest.pop(kind, None)
+
+    def pending(self, kind, key):
+        with self._lock:
+            return (kind, key) in self._pending
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'runs': self.runs,
+                'shared': self.shared,
+                'errors': self.errors,
+            }
@@ -0,0 +1,69 @@
+import logging
+import os
+import re
+from urllib.parse import urlsplit
+
+log = logging.getLogger("app")
+
+LEAGUE_NAME = re.compile(r'^[a-z0-9][a-z0-9-]{0,31}$')
+# First path segments of the app's own routes, never league names
+RESERVED = {'assets', 'events', 'metrics', 'submissions', 'leaderboard', 'scoring', 'odds', 'alive', 'export'}
+
+# Environ key holding the league picked for a request
+LEAGUE_KEY = 'app.league'
+
+
+def league_dirs(root):
+    # {name: directory} of the leagues under root, one directory each with
+    # its predictions/ folder
+    leagues = {}
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.isdir(os.path.join(path, 'predictions')):
+            continue
+        if LEAGUE_NAME.match(name) is None or name in RESERVED:
+            log.info(f'Skipping league {name}: not a valid league name')
+            continue
+        leagues[name] = path
+    return leagues
+
+
+class LeagueRouter:
+    # WSGI middleware picking the league of every request. A /<league>/ path
+    # prefix is moved to SCRIPT_NAME, so the same routes and Dash app serve
+    # every league. Requests the page makes on its own (Dash callbacks,
+    # layout) carry the page in the Referer, subdomains name the league
+    # directly and anything else goes to the default league.
+    def __init__(self, app, names):
+        self.app = app
+        self.names = set(names)
+
+    def path_league(self, path):
+        name = path.lstrip('/').split('/', 1)[0]
+        return name if name in self.names else None
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        name = self.path_league(path)
+        if name is not None:
+            rest = path[len(name) + 1:]
+            if not rest:
+                # Relative URLs of the page (events) need the trailing slash
+                start_response('301 Moved Permanently', [('Location', f'/{name}/'), ('Content-Length', '0')])
+                return [b'']
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + f'/{name}'
+            environ['PATH_INFO'] = rest
+        else:
+            name = self.referer_league(environ) or self.host_league(environ)
+        environ[LEAGUE_KEY] = name
+        return self.app(environ, start_response)
+
+    def referer_league(self, environ):
+        referer = urlsplit(environ.get('HTTP_REFERER', ''))
+        if referer.netloc != environ.get('HTTP_HOST'):
+            return None
+        return self.path_league(referer.path)
+
+    def host_league(self, environ):
+        subdomain = environ.get('HTTP_HOST', '').split(':')[0].split('.')[0]
+        return subdomain if subdomain in self.names else None
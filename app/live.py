@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+
+import requests as r
+
+from app.cache import fingerprint
+
+log = logging.getLogger("app")
+
+API_URL = 'https://raw.githubusercontent.com/openfootball/euro.json/master/2024/euro.json'
+FALLBACK_PATH = 'app/assets/final_matches.json'
+
+
+class ResultsPoller:
+    # Polls the results feed in a background thread and publishes the newest
+    # rounds for the callbacks to read, so no request ever waits on the API
+    def __init__(self, url=API_URL, fallback_path=FALLBACK_PATH, interval=60, timeout=8, session=None, on_change=None):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.session = session or r.Session()
+        # Called from the polling thread after a new version is published
+        self.on_change = on_change
+        self.etag = None
+        self.last_modified = None
+        self.polls = 0
+        self.not_modified = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        with open(fallback_path, 'r') as f:
+            self.publish(json.load(f)['rounds'])
+
+    def snapshot(self):
+        # (version, rounds) are swapped as one tuple, so readers never see a
+        # version that does not belong to its rounds
+        return self._snapshot
+
+    def publish(self, rounds):
+        self._snapshot = (fingerprint(rounds), rounds)
+
+    def poll_once(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        self.polls += 1
+        try:
+            response = self.session.get(
+                self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                self.not_modified += 1
+                return False
+            response.raise_for_status()
+            rounds = response.json()['rounds']
+        except Exception as e:
+            self.errors += 1
+            log.info(f'Results poll failed, keeping the last good rounds: {e}')
+            return False
+
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        version = self._snapshot[0]
+        self.publish(rounds)
+        return self._snapshot[0] != version
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.poll_once():
+                log.info(f'Published new results version {self._snapshot[0]}')
+                if self.on_change is not None:
+                    self.on_change()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='results-poller', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.timeout)
@@ -0,0 +1,204 @@
+import bisect
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+log = logging.getLogger("app")
+
+# Prometheus text format metrics. Every worker keeps its counters in a memory
+# mapped file of the metrics directory and /metrics adds up the files of all
+# workers, so observing is an array increment and scraping any worker returns
+# the totals. Wipe the directory on deploy to reset them.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'euro-2024-league-metrics')
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(**labels):
+    labels = {name: value for name, value in labels.items() if value is not None}
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') + '"'
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, label=None, label_values=(None,)):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label = label
+        self.offsets = {value: registry.reserve(self.width) for value in label_values}
+
+    def labels(self, value):
+        return {self.label: value} if self.label else {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+    width = 1
+
+    def inc(self, label=None, amount=1):
+        with self.registry.lock:
+            self.registry.values[self.offsets[label]] += amount
+
+    def samples(self, values):
+        for label, offset in self.offsets.items():
+            yield f'{self.name}{format_labels(**self.labels(label))} {format_value(values[offset])}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, label=None, label_values=(None,), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, +Inf and the sum
+        self.width = len(self.buckets) + 2
+        super().__init__(registry, name, help, label, label_values)
+
+    def observe(self, value, label=None):
+        offset = self.offsets[label]
+        with self.registry.lock:
+            values = self.registry.values
+            values[offset + bisect.bisect_left(self.buckets, value)] += 1
+            values[offset + len(self.buckets) + 1] += value
+
+    @contextmanager
+    def time(self, label=None):
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - tic, label)
+
+    def timed(self, label=None):
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.time(label):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self, values):
+        for label, offset in self.offsets.items():
+            counts = np.cumsum(values[offset:offset + len(self.buckets) + 1])
+            for bound, count in zip([*self.buckets, '+Inf'], counts):
+                yield f'{self.name}_bucket{format_labels(**self.labels(label), le=bound)} {format_value(count)}'
+            yield f'{self.name}_sum{format_labels(**self.labels(label))} {format_value(values[offset + len(self.buckets) + 1])}'
+            yield f'{self.name}_count{format_labels(**self.labels(label))} {format_value(counts[-1])}'
+
+
+class Gauge:
+    # Read from this worker when scraped, for values every worker shares
+    kind = 'gauge'
+
+    def __init__(self, name, help, label, collect):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.collect = collect
+
+    header = Metric.header
+
+    def samples(self, values):
+        collected = self.collect()
+        if not isinstance(collected, dict):
+            collected = {None: collected}
+        for label, value in collected.items():
+            labels = {self.label: label} if label is not None else {}
+            yield f'{self.name}{format_labels(**labels)} {format_value(value)}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.size = 0
+        self.values = np.zeros(0)
+        self.lock = threading.Lock()
+        self.directory = None
+
+    def reserve(self, width):
+        offset = self.size
+        self.size += width
+        self.values = np.zeros(self.size)
+        return offset
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, label=None, label_values=(None,)):
+        return self.add(Counter(self, name, help, label, label_values))
+
+    def histogram(self, name, help, label=None, label_values=(None,), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(self, name, help, label, label_values, buckets))
+
+    def gauge(self, name, help, collect, label=None):
+        return self.add(Gauge(name, help, label, collect))
+
+    def layout(self):
+        # Workers running different code never add up each other's files
+        layout = [
+            [metric.name, metric.kind, list(map(str, metric.offsets)), getattr(metric, 'buckets', None)]
+            for metric in self.metrics if isinstance(metric, Metric)
+        ]
+        return hashlib.sha1(json.dumps(layout).encode('utf-8')).hexdigest()[:12]
+
+    def open(self, directory=METRICS_DIR):
+        # Moves the values of this worker to its file, once every metric has
+        # been declared. Without a usable directory they stay per worker.
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{self.layout()}-{os.getpid()}.bin')
+            values = np.memmap(path, dtype=np.float64, mode='w+', shape=(self.size,))
+        except OSError as e:
+            log.info(f'Error opening the metrics directory {directory}: {e}')
+            return
+        with self.lock:
+            values[:] = self.values
+            self.values = values
+            self.directory = directory
+
+    def totals(self):
+        if self.directory is None:
+            return np.array(self.values)
+        totals = np.zeros(self.size)
+        for path in glob.glob(os.path.join(self.directory, f'{self.layout()}-*.bin')):
+            values = np.fromfile(path, dtype=np.float64)
+            if len(values) == self.size:
+                totals += values
+        return totals
+
+    def exposition(self):
+        values = self.totals()
+        lines = []
+        for metric in self.metrics:
+            lines += metric.header()
+            lines += metric.samples(values)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,327 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.constants import GROUP_MATCHES, GROUPS, KNOCKOUT_BRACKET, MATCH_SLOTS, MATCH_TAGS, ROUND_OF_16
+from app.scoring import FINAL, NO_KEY, POINTS, STAGES
+
+# Monte Carlo title odds. Every match that is not decided yet is played at
+# random, the bracket is followed from the group standings to the final and
+# every simulated tournament is scored for all participants at once.
+
+TEAMS = [team for group in GROUPS for team in group]
+TEAM_INDEX = {team: i for i, team in enumerate(TEAMS)}
+GROUP_LETTERS = 'ABCDEF'
+
+KNOCKOUT_STAGES = {
+    **{tag: STAGES.index('Round of 16') for tag in ROUND_OF_16},
+    **{tag: STAGES.index('Quarter-finals') for tag in list(KNOCKOUT_BRACKET)[:4]},
+    **{tag: STAGES.index('Semi-finals') for tag in list(KNOCKOUT_BRACKET)[4:6]},
+    **{tag: FINAL for tag in list(KNOCKOUT_BRACKET)[6:]},
+}
+FINAL_SLOT = MATCH_SLOTS[list(KNOCKOUT_BRACKET)[-1]]
+
+THIRD_SLOTS = [tag for tag, sides in ROUND_OF_16.items() if sides[1][0] == '3']
+
+
+def third_assignments():
+    # Group of the third placed team playing each THIRD_SLOTS match, for each
+    # set of four qualified groups (as a bitmask). UEFA publishes a fixed
+    # table; any assignment allowed by the bracket is used here.
+    allowed = [ROUND_OF_16[tag][1][1:] for tag in THIRD_SLOTS]
+    table = np.zeros((1 << len(GROUPS), len(THIRD_SLOTS)), dtype=np.intp)
+    for groups in itertools.combinations(range(len(GROUPS)), len(THIRD_SLOTS)):
+        for order in itertools.permutations(groups):
+            if all(GROUP_LETTERS[group] in letters for group, letters in zip(order, allowed)):
+                table[sum(1 << group for group in groups)] = order
+                break
+    return table
+
+
+THIRD_ASSIGNMENTS = third_assignments()
+
+
+class PoissonModel:
+    # Goals of each side drawn from a Poisson distribution, scaled by the
+    # relative strength of the teams (1 by default). A knockout draw goes to
+    # either team with odds proportional to their strength.
+    def __init__(self, home_rate=1.3, away_rate=1.3, strengths=None, max_goals=9):
+        self.home_rate = home_rate
+        self.away_rate = away_rate
+        self.max_goals = max_goals
+        self.strength = np.array([(strengths or {}).get(team, 1.0) for team in TEAMS])
+
+    def key(self):
+        return (self.home_rate, self.away_rate, self.max_goals, tuple(self.strength))
+
+    def goals(self, rng, home, away):
+        ratio = self.strength[home] / self.strength[away]
+        home_goals = rng.poisson(self.home_rate * ratio)
+        away_goals = rng.poisson(self.away_rate / ratio)
+        return (np.minimum(home_goals, self.max_goals).astype(np.int16),
+                np.minimum(away_goals, self.max_goals).astype(np.int16))
+
+    def settle(self, rng, home, away):
+        home_strength = self.strength[home]
+        return rng.random(len(home)) < home_strength / (home_strength + self.strength[away])
+
+
+class Tournament:
+    # What is already decided, read from the match rows of build_matches
+    def __init__(self, match_rows):
+        self.teams = {}
+        self.goals = {}
+        for match in match_rows:
+            slot = MATCH_SLOTS.get(match['tag'])
+            if slot is None or match['date'] == '-':
+                continue
+            if match['home_team'] in TEAM_INDEX and match['away_team'] in TEAM_INDEX:
+                self.teams[slot] = (TEAM_INDEX[match['home_team']], TEAM_INDEX[match['away_team']])
+                if match['result'] != 'Not started':
+                    self.goals[slot] = tuple(int(goals) for goals in match['result'].split('-'))
+
+        for slot, tag in enumerate(MATCH_TAGS[:GROUP_MATCHES]):
+            self.teams[slot] = tuple(TEAM_INDEX[team] for team in tag.split('-'))
+
+        # Knockout winners known from the teams of the next match, the only
+        # way to tell who went through after a draw
+        self.winners = {}
+        for tag, sides in KNOCKOUT_BRACKET.items():
+            for source, team in zip(sides, self.teams.get(MATCH_SLOTS[tag], ())):
+                self.winners[MATCH_SLOTS[source]] = team
+
+    def fixed(self, slot):
+        return slot in self.teams and slot in self.goals
+
+
+class Simulation:
+    # Teams and goals of every match slot in n simulated tournaments
+    def __init__(self, tournament, model, n, rng):
+        n_slots = len(MATCH_TAGS)
+        self.home = np.zeros((n_slots, n), dtype=np.intp)
+        self.away = np.zeros((n_slots, n), dtype=np.intp)
+        self.home_goals = np.zeros((n_slots, n), dtype=np.int16)
+        self.away_goals = np.zeros((n_slots, n), dtype=np.int16)
+        self.winner = {}
+        self.tournament = tournament
+        self.model = model
+        self.rng = rng
+        self.n = n
+
+        for slot in range(GROUP_MATCHES):
+            self.play(slot, *tournament.teams[slot])
+
+        standings = None
+        for tag, sides in ROUND_OF_16.items():
+            slot = MATCH_SLOTS[tag]
+            if slot in tournament.teams:
+                self.play(slot, *tournament.teams[slot], knockout=True)
+                continue
+            if standings is None:
+                standings, thirds = self.standings()
+            self.play(slot, *[self.qualified(side, standings, thirds, tag) for side in sides], knockout=True)
+
+        for tag, (home, away) in KNOCKOUT_BRACKET.items():
+            slot = MATCH_SLOTS[tag]
+            teams = tournament.teams.get(slot) or (
+                self.winner[MATCH_SLOTS[home]], self.winner[MATCH_SLOTS[away]])
+            self.play(slot, *teams, knockout=True)
+
+        self.champion = self.winner[FINAL_SLOT]
+
+    def play(self, slot, home, away, knockout=False):
+        home = np.broadcast_to(home, self.n)
+        away = np.broadcast_to(away, self.n)
+        self.home[slot] = home
+        self.away[slot] = away
+        if slot in self.tournament.goals:
+            self.home_goals[slot], self.away_goals[slot] = self.tournament.goals[slot]
+        else:
+            self.home_goals[slot], self.away_goals[slot] = self.model.goals(self.rng, home, away)
+
+        if knockout:
+            if slot in self.tournament.winners:
+                self.winner[slot] = np.broadcast_to(self.tournament.winners[slot], self.n)
+                return
+            home_wins = self.home_goals[slot] > self.away_goals[slot]
+            draw = self.home_goals[slot] == self.away_goals[slot]
+            if draw.any():
+                home_wins |= draw & self.model.settle(self.rng, home, away)
+            self.winner[slot] = np.where(home_wins, home, away)
+
+    def standings(self):
+        # Teams by position in each group, ranked by points, goal difference
+        # and goals scored, the rest of the tie breakers drawn at random
+        points = np.zeros((len(TEAMS), self.n))
+        difference = np.zeros((len(TEAMS), self.n))
+        scored = np.zeros((len(TEAMS), self.n))
+        for slot in range(GROUP_MATCHES):
+            home, away = self.tournament.teams[slot]
+            home_goals, away_goals = self.home_goals[slot], self.away_goals[slot]
+            points[home] += 3 * (home_goals > away_goals) + (home_goals == away_goals)
+            points[away] += 3 * (away_goals > home_goals) + (home_goals == away_goals)
+            difference[home] += home_goals - away_goals
+            difference[away] += away_goals - home_goals
+            scored[home] += home_goals
+            scored[away] += away_goals
+        key = points * 1e4 + (difference + 100) * 1e2 + np.minimum(scored, 99) + \
+            self.rng.random(points.shape)
+
+        group_size = len(GROUPS[0])
+        standings = np.stack([
+            group * group_size + np.argsort(-key[group * group_size:(group + 1) * group_size], axis=0)
+            for group in range(len(GROUPS))
+        ])
+
+        # Best third placed teams, then which group each third slot gets
+        columns = np.arange(self.n)
+        third_keys = key[standings[:, 2], columns]
+        best = np.argsort(-third_keys, axis=0)[:len(THIRD_SLOTS)]
+        masks = (1 << best).sum(axis=0)
+        thirds = {
+            tag: standings[THIRD_ASSIGNMENTS[masks, i], 2, columns]
+            for i, tag in enumerate(THIRD_SLOTS)
+        }
+        return standings, thirds
+
+    def qualified(self, side, standings, thirds, tag):
+        if side[0] == '3':
+            return thirds[tag]
+        return standings[GROUP_LETTERS.index(side[1]), int(side[0]) - 1]
+
+
+class Scorer:
+    # The scoring of score_predictions over many simulated results at once.
+    # Points are precomputed for every possible score and team pairing, so
+    # scoring a match slot is a few lookups per participant and simulation.
+    def __init__(self, preds, results, tournament, max_goals, points=POINTS):
+        self.preds = preds
+        self.tournament = tournament
+        self.points = points
+        self.champion_ids = np.array([preds.teams.get(team, NO_KEY) for team in TEAMS])
+        # A final already played keeps the champion of the leaderboard
+        self.champion = results.champion if tournament.fixed(FINAL_SLOT) else None
+
+        # Results as home goals * width + away goals
+        self.width = max([max_goals, *[max(goals) for goals in tournament.goals.values()]]) + 1
+        home_goals, away_goals = np.divmod(np.arange(self.width ** 2), self.width)
+        home = preds.home.T[:, :, None]
+        away = preds.away.T[:, :, None]
+        exact = (home == home_goals) & (away == away_goals)
+        outcome = ~exact & (preds.outcome.T[:, :, None] == np.sign(home_goals - away_goals))
+        self.result_points = (
+            (points[0] * exact + points[1] * outcome) * preds.valid.T[:, :, None]).astype(np.int16)
+
+        # Team pairings as home team * len(TEAMS) + away team
+        pair_home, pair_away = np.divmod(np.arange(len(TEAMS) ** 2), len(TEAMS))
+        team_ids = np.array([preds.team_id(team) for team in TEAMS])
+        pair_keys = np.array([
+            preds.keys.get(f'{TEAMS[home]}-{TEAMS[away]}', NO_KEY)
+            for home, away in zip(pair_home, pair_away)
+        ], dtype=np.int32)
+        self.pairing_ok = {}
+        self.stage_points = {}
+        for tag, stage in KNOCKOUT_STAGES.items():
+            slot = MATCH_SLOTS[tag]
+            teams = preds.stage_teams[stage]
+            self.pairing_ok[slot] = preds.key[:, slot, None] == pair_keys
+            self.stage_points[slot] = (points[2 + stage] * preds.valid[:, slot, None] * (
+                teams[:, team_ids[pair_home]].astype(np.int64) + teams[:, team_ids[pair_away]])).astype(np.int16)
+
+        # Matches already played score the same in every simulation
+        self.fixed_totals = np.zeros((len(preds.names), 1), dtype=np.int32)
+        for slot in range(len(MATCH_TAGS)):
+            if tournament.fixed(slot):
+                self.fixed_totals += self.slot_points(
+                    slot, *[np.array([value]) for value in tournament.teams[slot] + tournament.goals[slot]])
+
+    def slot_points(self, slot, home, away, home_goals, away_goals):
+        points = self.result_points[slot].take(home_goals * self.width + away_goals, axis=1)
+        if slot in self.stage_points:
+            pairs = home * len(TEAMS) + away
+            points = points * self.pairing_ok[slot].take(pairs, axis=1) + \
+                self.stage_points[slot].take(pairs, axis=1)
+        return points
+
+    def totals(self, sim):
+        totals = np.repeat(self.fixed_totals, sim.n, axis=1)
+        for slot in range(len(MATCH_TAGS)):
+            if not self.tournament.fixed(slot):
+                totals += self.slot_points(
+                    slot, sim.home[slot], sim.away[slot], sim.home_goals[slot], sim.away_goals[slot])
+
+        if self.champion is not None:
+            champion = np.full(sim.n, self.champion)
+        else:
+            champion = self.champion_ids[sim.champion]
+        totals += self.points[6] * (self.preds.valid[:, FINAL_SLOT, None] & (
+            self.preds.champion[:, None] == champion))
+        return totals
+
+
+def positions_within(totals, top):
+    # Participants placed in the top positions of each simulation, positions
+    # counted like the classification does, equal totals sharing one
+    ordered = -np.sort(-totals, axis=0)
+    new = np.ones(ordered.shape, dtype=bool)
+    new[1:] = ordered[1:] != ordered[:-1]
+    threshold = np.where(np.cumsum(new, axis=0) <= top, ordered, ordered[:1]).min(axis=0)
+    return totals >= threshold
+
+
+def prepare(setup):
+    # Lookup tables of a simulation, built once per process and shared by
+    # all its batches
+    preds, results, match_rows, model, top, points = setup
+    tournament = Tournament(match_rows)
+    return Scorer(preds, results, tournament, model.max_goals, points), model, top
+
+
+def run_batch(prepared, n, seed):
+    scorer, model, top = prepared
+    sim = Simulation(scorer.tournament, model, n, np.random.default_rng(seed))
+    totals = scorer.totals(sim)
+    first = (totals == totals.max(axis=0)).sum(axis=1)
+    return first, positions_within(totals, top).sum(axis=1), totals.sum(axis=1)
+
+
+_PREPARED = None
+
+
+def init_worker(setup):
+    global _PREPARED
+    _PREPARED = prepare(setup)
+
+
+def run_worker_batch(n, seed):
+    return run_batch(_PREPARED, n, seed)
+
+
+def simulate(preds, results, match_rows, sims=100000, top=3, model=None, workers=1, batch=10000, seed=None,
+             points=POINTS):
+    # Probability of every participant finishing first (ties included) or
+    # within the top positions, and their expected total
+    setup = (preds, results, match_rows, model or PoissonModel(), top, points)
+    seeds = np.random.SeedSequence(seed).spawn(-(-sims // batch))
+    sizes = [min(batch, sims - i * batch) for i in range(len(seeds))]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(setup,)) as pool:
+            batches = list(pool.map(run_worker_batch, sizes, seeds))
+    else:
+        prepared = prepare(setup)
+        batches = [run_batch(prepared, n, seed) for n, seed in zip(sizes, seeds)]
+
+    first, within, points = (sum(values) for values in zip(*batches))
+    rows = [
+        {
+            'nombre': name.split('.')[0].title(),
+            'first': float(first[p] / sims),
+            'top': float(within[p] / sims),
+            'expected_total': float(points[p] / sims),
+        }
+        for p, name in enumerate(preds.names)
+    ]
+    rows.sort(key=lambda row: (-row['first'], -row['top'], -row['expected_total']))
+    return rows
@@ -0,0 +1,133 @@
+import math
+import operator
+import re
+
+# Server side counterpart of the DataTable native paging, sorting and
+# filtering, used with page_action/sort_action/filter_action='custom'.
+# value(row, column) gives what a cell is filtered and sorted on, when that
+# differs from what is stored in the row.
+
+FILTER_PART = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s+(?P<value>.+)$')
+
+OPERATORS = {
+    '=': 'eq',
+    '!=': 'ne',
+    '<': 'lt',
+    '<=': 'le',
+    '>': 'gt',
+    '>=': 'ge',
+}
+
+COMPARISONS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+}
+
+TEXT_OPERATORS = ('contains', 'datestartswith')
+
+
+def parse_value(value):
+    # Returns the filter text and its numeric value, if it has one
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+        return value[1:-1].replace('\\' + value[0], value[0]), None
+    try:
+        return value, float(value)
+    except ValueError:
+        return value, None
+
+
+def known_operator(op):
+    return op in OPERATORS or op in COMPARISONS or op in TEXT_OPERATORS
+
+
+def parse_filter(filter_query):
+    filters = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_PART.match(part.strip())
+        if match is None:
+            continue
+        op = match['operator']
+        # The tables filter case insensitive unless told otherwise, the i/s
+        # prefix goes before the symbol or the name of any operator
+        case_sensitive = op[0] == 's' and known_operator(op[1:])
+        if op[0] in 'is' and known_operator(op[1:]):
+            op = op[1:]
+        op = OPERATORS.get(op, op)
+        filters.append(
+            (match['column'], op, *parse_value(match['value'].strip()), case_sensitive))
+    return filters
+
+
+def matches_filter(value, op, text, number, case_sensitive):
+    if value is None:
+        return False
+
+    if number is not None and isinstance(value, (int, float)) and op in COMPARISONS:
+        return COMPARISONS[op](value, number)
+
+    value = str(value)
+    if not case_sensitive:
+        value, text = value.lower(), text.lower()
+
+    if op == 'contains':
+        return text in value
+    if op == 'datestartswith':
+        return value.startswith(text)
+    if op in COMPARISONS:
+        return COMPARISONS[op](value, text)
+    # Unknown operators match nothing rather than everything
+    return False
+
+
+def row_value(row, column):
+    return row.get(column)
+
+
+def filter_rows(rows, filter_query, value=row_value):
+    filters = parse_filter(filter_query)
+    if not filters:
+        return rows
+    return [
+        row for row in rows
+        if all(matches_filter(value(row, column), *conditions)
+               for column, *conditions in filters)
+    ]
+
+
+def sort_rows(rows, sort_by, value=row_value):
+    # Applied from the last sort column to the first, relying on sort
+    # stability for the multi column order. Missing values always go last.
+    for sort in reversed(sort_by or []):
+        column = sort['column_id']
+        present = [row for row in rows if value(row, column) is not None]
+        missing = [row for row in rows if value(row, column) is None]
+        present.sort(key=lambda row: value(row, column),
+                     reverse=sort['direction'] == 'desc')
+        rows = present + missing
+    return rows
+
+
+def page_rows(rows, page_current, page_size):
+    page_current = page_current or 0
+    return rows[page_current * page_size:(page_current + 1) * page_size]
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(len(rows) / page_size))
+
+
+def project_rows(rows, columns):
+    return [{column: row[column] for column in columns if column in row} for row in rows]
+
+
+def query_rows(rows, page_current, page_size, sort_by, filter_query, columns=None, value=row_value):
+    rows = sort_rows(filter_rows(rows, filter_query, value), sort_by, value)
+    page = page_rows(rows, page_current, page_size)
+    if columns is not None:
+        page = project_rows(page, columns)
+    return page, page_count(rows, page_size)
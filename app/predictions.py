@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import os
+import re
+from array import array
+
+from app.constants import MATCH_TAGS, TEAMS_ES_EN
+
+log = logging.getLogger("app")
+
+# Prediction file layout (non empty lines)
+MATCH_SLICES = [(0, 36), (76, 84), (92, 96), (100, 102), (104, 105)]
+STAGE_TEAM_SLICES = [
+    (60, 76),  # teams advancing to knockout stage
+    (84, 92),  # quarter-finalists
+    (96, 100),  # semi-finalists
+    (102, 104),  # finalists
+]
+CHAMPION_LINE = 105
+MIN_LINES = CHAMPION_LINE + 1
+
+MISSING_GOALS = -1
+
+MATCH_LINE = re.compile(r'^(?:(?P<pairing>[^·]+)·)?(?P<symbol>[^|]*)\|\s*(?P<home>\d+)\s*-\s*(?P<away>\d+)$')
+
+
+class Prediction:
+    # One participant's predictions, parsed and validated once at load
+    __slots__ = ('name', 'digest', 'home', 'away',
+                 'pairings', 'stage_teams', 'champion', 'errors')
+
+    def __init__(self, name, digest):
+        self.name = name
+        self.digest = digest
+        self.home = array('h', [MISSING_GOALS] * len(MATCH_TAGS))
+        self.away = array('h', [MISSING_GOALS] * len(MATCH_TAGS))
+        self.pairings = [None] * len(MATCH_TAGS)
+        self.stage_teams = tuple(frozenset() for _ in STAGE_TEAM_SLICES)
+        self.champion = None
+        self.errors = []
+
+    def is_valid(self, slot):
+        return self.home[slot] != MISSING_GOALS
+
+
+def clean_lines(text):
+    return [line.strip() for line in text.splitlines() if line.strip() != '']
+
+
+def parse_prediction(name, text):
+    prediction = Prediction(
+        name, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    clean_preds = clean_lines(text)
+
+    if len(clean_preds) < MIN_LINES:
+        prediction.errors.append(
+            f'expected at least {MIN_LINES} lines, got {len(clean_preds)}')
+
+    match_lines = []
+    for start, end in MATCH_SLICES:
+        match_lines += [(line, clean_preds[line])
+                        for line in range(start, min(end, len(clean_preds)))]
+
+    for slot, (line, pred) in enumerate(match_lines):
+        match = MATCH_LINE.match(pred)
+        if match is None:
+            prediction.errors.append(f'line {line + 1}: bad prediction "{pred}"')
+            continue
+        prediction.home[slot] = int(match['home'])
+        prediction.away[slot] = int(match['away'])
+        prediction.pairings[slot] = match['pairing'] or pred
+        if match['pairing'] is not None:
+            for team in match['pairing'].split('-'):
+                if team not in TEAMS_ES_EN:
+                    prediction.errors.append(
+                        f'line {line + 1}: unknown team "{team}"')
+
+    prediction.stage_teams = tuple(
+        frozenset(clean_preds[start:end]) for start, end in STAGE_TEAM_SLICES)
+    for start, end in STAGE_TEAM_SLICES:
+        for line in range(start, min(end, len(clean_preds))):
+            if clean_preds[line] not in TEAMS_ES_EN:
+                prediction.errors.append(
+                    f'line {line + 1}: unknown team "{clean_preds[line]}"')
+
+    if len(clean_preds) > CHAMPION_LINE:
+        prediction.champion = clean_preds[CHAMPION_LINE]
+        if prediction.champion not in TEAMS_ES_EN:
+            prediction.errors.append(
+                f'line {CHAMPION_LINE + 1}: unknown team "{prediction.champion}"')
+
+    return prediction
+
+
+def load_prediction(base_dir, file):
+    with open(os.path.join(base_dir, file), 'r') as f:
+        prediction = parse_prediction(file, f.read())
+    for error in prediction.errors:
+        log.info(f'Error parsing {file} predictions: {error}')
+    return prediction
+
+
+def load_predictions(base_dir):
+    files = os.listdir(base_dir)
+    files.sort()
+    return {file: load_prediction(base_dir, file) for file in files}
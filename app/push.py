@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.constants import MATCH_SLOTS
+
+
+def sse_event(data, event_id=None):
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class StreamSlots:
+    # Cap on the event streams open in this worker. Each stream holds a
+    # worker thread for its whole lifetime, past the cap the threads are
+    # left to the Dash callbacks and new clients are told to poll instead.
+    def __init__(self, limit):
+        self.limit = limit
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.open >= self.limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+class Broadcaster:
+    # Fan-out of the table diffs to the open event streams. A diff is built
+    # and serialized once per data version, the streams only wait on one
+    # condition and copy the same text, whatever the number of viewers.
+    def __init__(self, keep=32, heartbeat=15, lifetime=300, retry=3000):
+        self.heartbeat = heartbeat
+        self.lifetime = lifetime
+        self.retry = retry
+        self.version = None
+        self.published = 0
+        self.streams = 0
+        self._events = deque(maxlen=keep)  # (seq, from version, text)
+        self._cond = threading.Condition()
+
+    def publish(self, version, data, previous=None):
+        with self._cond:
+            self.published += 1
+            self.version = version
+            self._events.append((self.published, previous, sse_event(data, version)))
+            self._cond.notify_all()
+
+    def missed(self, last_version):
+        # Diffs after last_version, or None when they are no longer kept
+        with self._cond:
+            events = list(self._events)
+        for i, (_, previous, _) in enumerate(events):
+            if previous == last_version:
+                return [text for _, _, text in events[i:]]
+        return None
+
+    def stream(self, last_version=None, lifetime=None, retry=None):
+        # Generator of the event stream text for one client. It ends after
+        # lifetime seconds, the browser reconnects on its own sending the id
+        # of the last event, so no diff is lost. With lifetime=0 it only
+        # sends what the client missed, and a long retry turns the stream
+        # into polling.
+        lifetime = self.lifetime if lifetime is None else lifetime
+        with self._cond:
+            self.streams += 1
+            seq = self.published
+            version = self.version
+        try:
+            yield f'retry: {self.retry if retry is None else retry}\n\n'
+            missed = None if last_version is None else (
+                [] if last_version == version else self.missed(last_version))
+            if missed is None:
+                yield sse_event({'type': 'version', 'version': version}, version)
+            else:
+                yield from missed
+
+            deadline = time.monotonic() + lifetime
+            while time.monotonic() < deadline:
+                with self._cond:
+                    if self.published == seq:
+                        self._cond.wait(self.heartbeat)
+                    events = [text for event_seq, _, text in self._events if event_seq > seq]
+                    dropped = self.published - seq > len(events)
+                    seq = self.published
+                    version = self.version
+                if dropped:
+                    yield sse_event({'type': 'reload', 'version': version}, version)
+                elif events:
+                    yield ''.join(events)
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            with self._cond:
+                self.streams -= 1
+
+
+def table_diff(old, new):
+    # Changed cells, point deltas and rank moves between two views of the
+    # same predictions and table rows, or None when the tables changed shape
+    if old.version[1] != new.version[1] or \
+            [row['tag'] for row in old.match_rows] != [row['tag'] for row in new.match_rows]:
+        return None
+
+    names = new.preds.names
+    matches = []
+    for old_row, row in zip(old.match_rows, new.match_rows):
+        slot = MATCH_SLOTS.get(row['tag'])
+        if slot is None or row['date'] == '-':
+            continue
+        changed = np.flatnonzero(old.states[:, slot] != new.states[:, slot])
+        if len(changed) or old_row['result'] != row['result']:
+            matches.append({
+                'tag': row['tag'],
+                'result': row['result'],
+                # [index, name, state], applied where the name is a column
+                'states': [[int(p), names[p], int(new.states[p, slot])] for p in changed],
+            })
+
+    old_rows = {row['nombre']: row for row in old.pred_rows}
+    ranks = {}
+    for row in new.pred_rows:
+        before = old_rows[row['nombre']]
+        if before['total'] != row['total'] or before['position'] != row['position']:
+            ranks[row['nombre']] = {
+                'total': row['total'],
+                'points': row['total'] - before['total'],
+                'position': row['position'],
+                'moved': before['position'] - row['position'],
+            }
+
+    return {'type': 'diff', 'matches': matches, 'ranks': ranks}
@@ -0,0 +1,53 @@
+import gzip
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Preferred first
+ENCODINGS = ['br', 'gzip']
+
+
+def encode_body(data):
+    # Every encoding of a body, compressed once when it is first served
+    bodies = {'identity': data, 'gzip': gzip.compress(data, 6)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(data, quality=5)
+    return bodies
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def encoded_response(bodies, etag, accept_encoding, mimetype='application/json'):
+    accepted = accepted_encodings(accept_encoding)
+    encoding = next(
+        (encoding for encoding in ENCODINGS if encoding in bodies and encoding in accepted), 'identity')
+    response = Response(bodies[encoding], mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
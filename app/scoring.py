@@ -0,0 +1,337 @@
+import json
+from collections import namedtuple
+
+import numpy as np
+
+from app.constants import MATCH_SLOTS, MATCH_TAGS
+
+STAGES = ['Round of 16', 'Quarter-finals', 'Semi-finals', 'Final']
+
+FINAL = STAGES.index('Final')
+
+STAT_COLUMNS = ['res_exacto', 'res_partido',
+                'octavos', 'cuartos', 'semis', 'final', 'campeon']
+POINTS = np.array([10, 5, 6, 12, 24, 48, 50], dtype=np.int64)
+
+# Scoring rules of a league: points per stat column and the real champion,
+# None to take it from the final. Hit counts do not depend on the points, so
+# new points only take a counts @ points product.
+ScoringRules = namedtuple('ScoringRules', ['points', 'champion'])
+
+# Cell states
+NOT_SCORED = 0
+EXACT = 1
+OUTCOME = 2
+MISS = 3
+
+MISSING = -1
+NO_KEY = -2
+
+
+class Interner(dict):
+    def id(self, value):
+        if value not in self:
+            self[value] = len(self)
+        return self[value]
+
+
+class PredictionMatrix:
+    # Dense participant × match-slot view of the compiled Prediction records.
+    # Team and pairing ids can be shared with a previous matrix so they stay
+    # stable across reloads. Team id 0 stands for any team nobody predicted.
+    def __init__(self, predictions, teams=None, keys=None):
+        self.names = list(predictions)
+        self.teams = teams if teams is not None else Interner({None: 0})
+        self.keys = keys if keys is not None else Interner()
+        self._allocate(len(self.names))
+
+        stage_team_ids = [
+            self._set_row(p, prediction)
+            for p, prediction in enumerate(predictions.values())
+        ]
+        self.stage_teams = np.zeros(
+            (len(STAGES), len(self.names), len(self.teams)), dtype=bool)
+        self._set_stage_teams(range(len(self.names)), stage_team_ids)
+        self._derive()
+
+    def _allocate(self, n_players):
+        n_slots = len(MATCH_TAGS)
+        self.home = np.full((n_players, n_slots), MISSING, dtype=np.int16)
+        self.away = np.full((n_players, n_slots), MISSING, dtype=np.int16)
+        self.key = np.full((n_players, n_slots), MISSING, dtype=np.int32)
+        self.champion = np.full(n_players, MISSING, dtype=np.int32)
+        self.champion_name = [None] * n_players
+        self.digests = [None] * n_players
+        self.errors = [0] * n_players
+
+    def _set_row(self, p, prediction):
+        self.digests[p] = prediction.digest
+        self.errors[p] = len(prediction.errors)
+        self.home[p] = prediction.home
+        self.away[p] = prediction.away
+        for slot, pairing in enumerate(prediction.pairings):
+            if pairing is not None:
+                self.key[p, slot] = self.keys.id(pairing)
+        if prediction.champion is not None:
+            self.champion[p] = self.teams.id(prediction.champion)
+            self.champion_name[p] = prediction.champion
+        return [[self.teams.id(team) for team in stage_teams]
+                for stage_teams in prediction.stage_teams]
+
+    def _set_stage_teams(self, rows, stage_team_ids):
+        # One boolean participant × team matrix per knockout stage
+        for p, stages in zip(rows, stage_team_ids):
+            for stage, ids in enumerate(stages):
+                self.stage_teams[stage, p, ids] = True
+
+    def _derive(self):
+        self.valid = self.home != MISSING
+        self.outcome = np.sign(self.home - self.away).astype(np.int8)
+
+    def replace(self, predictions, removed=()):
+        # New matrix with the given participants added or replaced and the
+        # removed ones dropped. Rows of everybody else are copied over.
+        names = sorted((set(self.names) - set(removed)) | set(predictions))
+        matrix = PredictionMatrix.__new__(PredictionMatrix)
+        matrix.names = names
+        matrix.teams = self.teams
+        matrix.keys = self.keys
+        matrix._allocate(len(names))
+
+        old_rows = {name: p for p, name in enumerate(self.names)}
+        kept = [(p, old_rows[name]) for p, name in enumerate(names)
+                if name not in predictions]
+        added = [p for p, name in enumerate(names) if name in predictions]
+        stage_team_ids = [matrix._set_row(p, predictions[names[p]]) for p in added]
+
+        matrix.stage_teams = np.zeros(
+            (len(STAGES), len(names), len(self.teams)), dtype=bool)
+        if kept:
+            new, old = np.array(kept, dtype=np.intp).T
+            for field in ('home', 'away', 'key', 'champion'):
+                getattr(matrix, field)[new] = getattr(self, field)[old]
+            matrix.stage_teams[:, new, :self.stage_teams.shape[2]] = self.stage_teams[:, old]
+            for p, q in kept:
+                matrix.champion_name[p] = self.champion_name[q]
+                matrix.digests[p] = self.digests[q]
+                matrix.errors[p] = self.errors[q]
+        matrix._set_stage_teams(added, stage_team_ids)
+        matrix._derive()
+        return matrix
+
+    def pairing(self, key):
+        if not hasattr(self, '_pairings'):
+            self._pairings = list(self.keys)
+        return self._pairings[key]
+
+    def team_id(self, team):
+        return self.teams.get(team, 0)
+
+
+class ResultVector:
+    # Real results laid out over the same match slots as PredictionMatrix
+    def __init__(self, preds, match_rows, real_champion):
+        n_slots = len(MATCH_TAGS)
+
+        self.present = np.zeros(n_slots, dtype=bool)
+        self.knockout = np.zeros(n_slots, dtype=bool)
+        self.home = np.full(n_slots, MISSING, dtype=np.int16)
+        self.away = np.full(n_slots, MISSING, dtype=np.int16)
+        self.key = np.full(n_slots, NO_KEY, dtype=np.int32)
+        self.stage = np.full(n_slots, MISSING, dtype=np.int8)
+        self.home_team = np.full(n_slots, preds.team_id(None), dtype=np.int32)
+        self.away_team = np.full(n_slots, preds.team_id(None), dtype=np.int32)
+        self.champion = preds.teams.get(real_champion, NO_KEY)
+
+        for match in match_rows:
+            slot = MATCH_SLOTS.get(match['tag'])
+            if match['date'] == '-' or slot is None:
+                continue
+            self.present[slot] = True
+            self.knockout[slot] = match['type'] != 'group'
+            self.key[slot] = preds.keys.get(match['match_key'], NO_KEY)
+            if match['type'] in STAGES:
+                self.stage[slot] = STAGES.index(match['type'])
+                self.home_team[slot] = preds.team_id(match['home_team'])
+                self.away_team[slot] = preds.team_id(match['away_team'])
+            if match['result'] != 'Not started':
+                self.home[slot], self.away[slot] = [
+                    int(goals) for goals in match['result'].split('-')]
+
+        self.outcome = np.sign(self.home - self.away).astype(np.int8)
+
+
+def score_predictions(preds, results, rows=slice(None)):
+    valid = preds.valid[rows]
+
+    # Knockout matches only score when the predicted pairing was right
+    pairing_ok = ~results.knockout | (preds.key[rows] == results.key)
+    scored = valid & results.present & (results.home != MISSING) & pairing_ok
+
+    exact = scored & (preds.home[rows] == results.home) & (
+        preds.away[rows] == results.away)
+    outcome = scored & ~exact & (preds.outcome[rows] == results.outcome)
+
+    states = np.full(scored.shape, NOT_SCORED, dtype=np.int8)
+    states[scored] = MISS
+    states[outcome] = OUTCOME
+    states[exact] = EXACT
+
+    counts = np.zeros((len(valid), len(STAT_COLUMNS)), dtype=np.int64)
+    counts[:, 0] = exact.sum(axis=1)
+    counts[:, 1] = outcome.sum(axis=1)
+
+    for stage in range(len(STAGES)):
+        slots = np.flatnonzero(results.present & (results.stage == stage))
+        teams = preds.stage_teams[stage][rows]
+        hits = teams[:, results.home_team[slots]].astype(np.int64) + \
+            teams[:, results.away_team[slots]]
+        counts[:, 2 + stage] = (hits * valid[:, slots]).sum(axis=1)
+
+    final_slots = np.flatnonzero(results.present & (results.stage == FINAL))
+    counts[:, 6] = (valid[:, final_slots] &
+                    (preds.champion[rows] == results.champion)[:, None]).sum(axis=1)
+
+    return states, counts
+
+
+def score_slot(preds, results, slot):
+    # Cell states and stat contributions of a single match slot
+    valid = preds.valid[:, slot]
+    states = np.full(len(preds.names), NOT_SCORED, dtype=np.int8)
+    stats = np.zeros((len(preds.names), len(STAT_COLUMNS)), dtype=np.int64)
+    if not results.present[slot]:
+        return states, stats
+
+    if results.home[slot] != MISSING:
+        scored = valid.copy()
+        if results.knockout[slot]:
+            scored &= preds.key[:, slot] == results.key[slot]
+        exact = scored & (preds.home[:, slot] == results.home[slot]) & (
+            preds.away[:, slot] == results.away[slot])
+        outcome = scored & ~exact & (
+            preds.outcome[:, slot] == results.outcome[slot])
+        states[scored] = MISS
+        states[outcome] = OUTCOME
+        states[exact] = EXACT
+        stats[:, 0] = exact
+        stats[:, 1] = outcome
+
+    stage = results.stage[slot]
+    if stage != MISSING:
+        teams = preds.stage_teams[stage]
+        stats[:, 2 + stage] = valid * (
+            teams[:, results.home_team[slot]].astype(np.int64) +
+            teams[:, results.away_team[slot]])
+        if stage == FINAL:
+            stats[:, 6] = valid & (preds.champion == results.champion)
+
+    return states, stats
+
+
+def changed_slots(old, new):
+    changed = (old.present != new.present) | \
+        (old.knockout != new.knockout) | \
+        (old.home != new.home) | \
+        (old.away != new.away) | \
+        (old.key != new.key) | \
+        (old.stage != new.stage) | \
+        (old.home_team != new.home_team) | \
+        (old.away_team != new.away_team)
+    if old.champion != new.champion:
+        changed |= (old.stage == FINAL) | (new.stage == FINAL)
+    return np.flatnonzero(changed)
+
+
+class Leaderboard:
+    # Keeps states and counts up to date by rescoring only the match slots
+    # that changed since the previous results
+    def __init__(self, preds):
+        self.preds = preds
+        self.results = None
+        self.states = None
+        self.counts = None
+
+    def update(self, results):
+        if self.results is None:
+            self.states, self.counts = score_predictions(self.preds, results)
+            self.results = results
+            return np.arange(len(MATCH_TAGS))
+
+        changed = changed_slots(self.results, results)
+        for slot in changed:
+            _, old_stats = score_slot(self.preds, self.results, slot)
+            states, new_stats = score_slot(self.preds, results, slot)
+            self.counts += new_stats - old_stats
+            self.states[:, slot] = states
+        self.results = results
+        return changed
+
+    def reload(self, preds, changed_names):
+        # Switch to a new PredictionMatrix, keeping the scores of every
+        # participant that did not change and scoring only the rest
+        old_rows = {name: p for p, name in enumerate(self.preds.names)}
+        self.preds = preds
+        if self.results is None:
+            return
+
+        kept = [(p, old_rows[name]) for p, name in enumerate(preds.names)
+                if name in old_rows and name not in changed_names]
+        rescored = np.array([p for p, name in enumerate(preds.names)
+                             if name not in old_rows or name in changed_names], dtype=np.intp)
+
+        states = np.zeros((len(preds.names), len(MATCH_TAGS)), dtype=np.int8)
+        counts = np.zeros((len(preds.names), len(STAT_COLUMNS)), dtype=np.int64)
+        if kept:
+            new, old = np.array(kept, dtype=np.intp).T
+            states[new] = self.states[old]
+            counts[new] = self.counts[old]
+        if len(rescored):
+            states[rescored], counts[rescored] = score_predictions(
+                preds, self.results, rows=rescored)
+        self.states = states
+        self.counts = counts
+
+
+def scoring_rules(points=None, champion=None):
+    # Columns missing from the points mapping keep their default
+    points = points or {}
+    unknown = sorted(set(points) - set(STAT_COLUMNS))
+    if unknown:
+        raise ValueError(f'Unknown scoring columns: {", ".join(unknown)}')
+    weights = np.array([int(points.get(column, default)) for column, default in zip(STAT_COLUMNS, POINTS)],
+                       dtype=np.int64)
+    if (weights < 0).any():
+        raise ValueError('Points must not be negative')
+    return ScoringRules(weights, champion)
+
+
+def load_rules(path):
+    # {"points": {"res_exacto": 10, ...}, "champion": "España"}
+    with open(path, 'r') as f:
+        config = json.load(f)
+    return scoring_rules(config.get('points'), config.get('champion'))
+
+
+DEFAULT_RULES = scoring_rules()
+
+
+def rank(names, counts, points=POINTS):
+    totals = counts @ points
+    order = np.argsort(-totals, kind='stable')
+
+    pred_rows = []
+    index = 0
+    prev_total = 0
+    for p in order:
+        total = int(totals[p])
+        if total != prev_total:
+            index += 1
+        prev_total = total
+        pred_rows.append({
+            'nombre': names[p].split('.')[0].title(),
+            'total': total,
+            **{column: int(count) for column, count in zip(STAT_COLUMNS, counts[p])},
+            'position': index,
+        })
+    return pred_rows
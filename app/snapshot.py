@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows, every process builds its own snapshot
+    fcntl = None
+
+log = logging.getLogger("app")
+
+SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), 'euro-2024-league')
+# Bump when the content of the snapshots changes
+SNAPSHOT_FORMAT = 1
+
+
+class SnapshotStore:
+    # Computed arrays shared between gunicorn workers. The first worker to
+    # take the lock of a data version builds it, the rest memory-map the
+    # .npy files read only, so the pages are shared through the page cache.
+    # Versions are '<family>-<hash>', the newest `keep` of every family
+    # (league) are kept.
+    def __init__(self, directory=SNAPSHOT_DIR, keep=4):
+        self.directory = directory
+        self.keep = keep
+        self.builds = 0
+        self.loads = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, version):
+        return os.path.join(self.directory, f'v{SNAPSHOT_FORMAT}-{version}')
+
+    def load(self, version):
+        path = self.path(version)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r') as f:
+                names = json.load(f)['arrays']
+            arrays = {
+                name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                for name in names
+            }
+        except FileNotFoundError:
+            # Pruned by another worker while we read it
+            return None
+        self.loads += 1
+        return arrays
+
+    @contextmanager
+    def lock(self, version):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path(version) + '.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load_or_build(self, version, build):
+        arrays = self.load(version)
+        if arrays is not None:
+            return arrays
+
+        with self.lock(version):
+            # Someone else may have built it while we waited for the lock
+            arrays = self.load(version)
+            if arrays is not None:
+                return arrays
+            built = build()
+            self.write(version, built)
+            self.builds += 1
+
+        self.prune(version)
+        arrays = self.load(version)
+        if arrays is None:
+            # Pruned already, serve read only copies like the mapped ones
+            arrays = {name: array.copy() for name, array in built.items()}
+            for array in arrays.values():
+                array.flags.writeable = False
+        return arrays
+
+    def write(self, version, arrays):
+        tmp = tempfile.mkdtemp(prefix=f'.{version}-', dir=self.directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f'{name}.npy'),
+                        np.ascontiguousarray(array))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump({'arrays': list(arrays)}, f)
+            # The rename publishes the whole snapshot at once
+            os.rename(tmp, self.path(version))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(self.path(version)):
+                raise
+
+    def family(self, name):
+        return name.rsplit('-', 1)[0]
+
+    def prune(self, version):
+        # Only the snapshots of the version's family compete for the `keep`
+        # slots. Workers still mapping a removed snapshot keep reading it,
+        # the files are only freed once the last mapping goes away
+        family = self.family(os.path.basename(self.path(version)))
+        try:
+            versions = [
+                entry for entry in os.scandir(self.directory)
+                if entry.is_dir() and not entry.name.startswith('.')
+                and self.family(entry.name) == family
+            ]
+            versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in versions[self.keep:]:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                if os.path.exists(entry.path + '.lock'):
+                    os.remove(entry.path + '.lock')
+        except OSError as e:
+            log.info(f'Error pruning snapshots: {e}')
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import struct
+import sys
+
+import numpy as np
+
+from app.cache import fingerprint
+from app.predictions import load_predictions
+from app.scoring import Interner, PredictionMatrix
+
+log = logging.getLogger("app")
+
+# Compiled binary copy of the predictions directory. The .txt files stay the
+# authoring format, the store only saves parsing them on every start.
+STORE_PATH = 'app/predictions.bin'
+
+MAGIC = b'EUROPRED'
+STORE_FORMAT = 2
+# magic, format, content hash, participants, metadata length
+HEADER = struct.Struct('<8sI40sIQ')
+ALIGN = 64
+
+STORE_ARRAYS = ['home', 'away', 'outcome', 'valid',
+                'key', 'champion', 'stage_teams']
+
+
+def align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def directory_signature(base_dir):
+    signature = {}
+    with os.scandir(base_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                signature[entry.name] = [stat.st_mtime_ns, stat.st_size]
+    return dict(sorted(signature.items()))
+
+
+def content_hash(matrix):
+    return fingerprint(dict(zip(matrix.names, matrix.digests)))
+
+
+def write_store(matrix, path, signature):
+    offsets = []
+    offset = 0
+    for name in STORE_ARRAYS:
+        array = getattr(matrix, name)
+        offsets.append([name, array.dtype.str, list(array.shape), offset])
+        offset = align(offset + array.nbytes)
+
+    meta = json.dumps({
+        'names': matrix.names,
+        'digests': matrix.digests,
+        'errors': matrix.errors,
+        'teams': list(matrix.teams),
+        'keys': list(matrix.keys),
+        'signature': signature,
+        'arrays': offsets,
+    }, ensure_ascii=False).encode('utf-8')
+    data_start = align(HEADER.size + len(meta))
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, STORE_FORMAT, content_hash(matrix).encode(),
+                            len(matrix.names), len(meta)))
+        f.write(meta)
+        for name, _, _, offset in offsets:
+            f.seek(data_start + offset)
+            f.write(np.ascontiguousarray(getattr(matrix, name)).tobytes())
+    os.replace(tmp, path)
+
+
+def load_store(path, signature=None):
+    # Memory-maps the store, or returns None when it is missing, from another
+    # format, out of date with the given directory signature or damaged
+    try:
+        with open(path, 'rb') as f:
+            magic, store_format, digest, n_players, meta_length = HEADER.unpack(
+                f.read(HEADER.size))
+            if magic != MAGIC or store_format != STORE_FORMAT:
+                return None
+            meta = json.loads(f.read(meta_length))
+    except (OSError, struct.error, ValueError):
+        return None
+
+    try:
+        if signature is not None and meta['signature'] != signature:
+            return None
+        matrix = map_store(path, meta, meta_length)
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+        log.info(f'Damaged predictions store {path}, rebuilding it: {e}')
+        return None
+    if matrix is None:
+        log.info(f'Truncated predictions store {path}, rebuilding it')
+        return None
+
+    if len(matrix.names) != n_players or content_hash(matrix) != digest.decode():
+        return None
+    return matrix
+
+
+def map_store(path, meta, meta_length):
+    # The matrix over the store's arrays, None when the file is shorter than
+    # the arrays it lists
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    data_start = align(HEADER.size + meta_length)
+    arrays = {}
+    for name, dtype, shape, offset in meta['arrays']:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if offset < 0 or data_start + offset + count * dtype.itemsize > len(buffer):
+            return None
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + offset).reshape(shape)
+
+    matrix = PredictionMatrix.__new__(PredictionMatrix)
+    matrix.names = meta['names']
+    matrix.digests = meta['digests']
+    matrix.errors = meta['errors']
+    matrix.teams = Interner((team, i) for i, team in enumerate(meta['teams']))
+    matrix.keys = Interner((key, i) for i, key in enumerate(meta['keys']))
+    for name, array in arrays.items():
+        setattr(matrix, name, array)
+    matrix.champion_name = [
+        meta['teams'][champion] if champion >= 0 else None
+        for champion in matrix.champion.tolist()
+    ]
+    return matrix
+
+
+def open_predictions(base_dir, path=STORE_PATH):
+    # Uses the store when it matches the .txt files, otherwise compiles them
+    # and refreshes the store for the next start
+    signature = directory_signature(base_dir)
+    matrix = load_store(path, signature)
+    if matrix is not None:
+        return matrix
+
+    matrix = PredictionMatrix(load_predictions(base_dir))
+    try:
+        write_store(matrix, path, signature)
+    except OSError as e:
+        log.info(f'Error writing the predictions store {path}: {e}')
+    return matrix
+
+
+if __name__ == "__main__":
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else 'app/assets/predictions/'
+    path = sys.argv[2] if len(sys.argv) > 2 else STORE_PATH
+    matrix = PredictionMatrix(load_predictions(base_dir))
+    write_store(matrix, path, directory_signature(base_dir))
+    print(f'Wrote {len(matrix.names)} participants to {path}')
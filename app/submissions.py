@@ -0,0 +1,219 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+
+from app.predictions import parse_prediction
+
+try:
+    import fcntl
+except ImportError:  # Windows, a single process is assumed
+    fcntl = None
+
+log = logging.getLogger("app")
+
+NAME = re.compile(r'^[a-z0-9][a-z0-9 _-]{0,31}$')
+MAX_TEXT = 16 * 1024
+
+ACCEPTED = 'accepted'
+FORBIDDEN = 'forbidden'
+
+
+def submission_file(name):
+    # Submitted participants live next to the .txt ones in the matrix
+    return f'{name}.txt'
+
+
+def validate(name, text):
+    # Parsed prediction and the reasons to reject it, if any
+    if not isinstance(name, str) or NAME.match(name) is None:
+        return None, ['name must be 1 to 32 lowercase letters, digits, spaces, "_" or "-"']
+    if not isinstance(text, str) or len(text) > MAX_TEXT:
+        return None, [f'predictions must be a text of at most {MAX_TEXT} characters']
+    prediction = parse_prediction(submission_file(name), text)
+    return prediction, prediction.errors
+
+
+def entry_predictions(entries):
+    # Latest prediction of every name in the entries
+    return {
+        submission_file(entry['name']): parse_prediction(submission_file(entry['name']), entry['text'])
+        for entry in entries
+    }
+
+
+def token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class SubmissionLog:
+    # Append-only log of the submitted predictions, one JSON entry per line.
+    # A single writer thread appends the pending entries in batches with one
+    # fsync each, callers wait until their batch is on disk. Every process
+    # follows the file and hands the new entries to on_entries, its own ones
+    # included, so all the gunicorn workers merge the same entries in the
+    # same order.
+    def __init__(self, path, on_entries=None, window=0.005, interval=1):
+        self.path = path
+        self.on_entries = on_entries
+        self.window = window
+        self.interval = interval
+        self.owners = {}
+        self.writes = 0
+        self.fsyncs = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._queue = []
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._writer = None
+        self._follower = None
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._fd = fd
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _read(self):
+        # Complete entries written since the last read, a torn last line is
+        # left for the next one
+        entries = []
+        size = os.fstat(self._fd).st_size
+        if size <= self._offset:
+            return entries
+        data = os.pread(self._fd, size - self._offset, self._offset)
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                log.info(f'Skipping a bad submission log line: {e}')
+                continue
+            # The first entry of a name owns it, later ones need its token
+            owner = self.owners.setdefault(entry['name'], entry['token'])
+            if owner == entry['token']:
+                entries.append(entry)
+        self._offset += end
+        return entries
+
+    def sync(self):
+        # Entries are handed over under the lock so they are merged in log
+        # order, whichever thread read them
+        with self._lock:
+            entries = self._read()
+            if entries and self.on_entries is not None:
+                self.on_entries(entries)
+        return entries
+
+    def submit(self, name, text, token=None):
+        # Resolves to (ACCEPTED, token) once the entry is durable, or to
+        # (FORBIDDEN, None) when the name belongs to another token
+        future = Future()
+        with self._ready:
+            self._queue.append((name, text, token, future))
+            self._ready.notify()
+            self.start()
+        return future
+
+    def _write(self, batch):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # Catch up with the other processes first, under their lock, so
+            # owners are up to date before checking the tokens
+            entries = self._read()
+            lines = []
+            results = []
+            for name, text, token, future in batch:
+                owner = self.owners.get(name)
+                if owner is None:
+                    token = token or secrets.token_urlsafe(16)
+                elif token is None or not hmac.compare_digest(owner, token_hash(token)):
+                    results.append((future, (FORBIDDEN, None)))
+                    continue
+                entry = {'name': name, 'text': text, 'token': token_hash(token),
+                         'time': time.time()}
+                self.owners[name] = entry['token']
+                lines.append(json.dumps(entry, ensure_ascii=False) + '\n')
+                entries.append(entry)
+                results.append((future, (ACCEPTED, token)))
+
+            if lines:
+                data = ''.join(lines).encode('utf-8')
+                os.write(self._fd, data)
+                os.fsync(self._fd)
+                self._offset += len(data)
+                self.writes += len(lines)
+                self.fsyncs += 1
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return entries, results
+
+    def _run_writer(self):
+        while not self._stop.is_set():
+            with self._ready:
+                while not self._queue and not self._stop.is_set():
+                    self._ready.wait(self.interval)
+            # Let more submissions join the batch before paying the fsync
+            self._stop.wait(self.window)
+            with self._ready:
+                batch, self._queue = self._queue, []
+            if not batch:
+                continue
+
+            with self._lock:
+                try:
+                    entries, results = self._write(batch)
+                except Exception as e:
+                    # The batch fails, the writer keeps serving the next ones
+                    log.exception(f'Error writing the submission log: {e}')
+                    for *_, future in batch:
+                        future.set_exception(e)
+                    continue
+
+                if entries and self.on_entries is not None:
+                    try:
+                        self.on_entries(entries)
+                    except Exception:
+                        log.exception('Error merging the submitted predictions')
+            for future, result in results:
+                future.set_result(result)
+
+    def _run_follower(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception:
+                log.exception('Error following the submission log')
+
+    def start(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._stop.clear()
+            self._writer = threading.Thread(
+                target=self._run_writer, name='submissions-writer', daemon=True)
+            self._writer.start()
+
+    def follow(self):
+        if self._follower is None or not self._follower.is_alive():
+            self._stop.clear()
+            self._follower = threading.Thread(
+                target=self._run_follower, name='submissions-follower', daemon=True)
+            self._follower.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in (self._writer, self._follower):
+            if thread is not None:
+                thread.join(self.interval + 1)
@@ -0,0 +1,113 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import threading
+
+log = logging.getLogger("app")
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def open_inotify(path):
+    # Returns an inotify fd watching path, or None where inotify is missing
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+class PredictionsWatcher:
+    # Watches the predictions directory and reports which files changed.
+    # inotify is only used to wake up early, the actual diff is always done
+    # on (mtime, size) so both modes behave the same.
+    def __init__(self, base_dir, on_change, interval=2):
+        self.base_dir = base_dir
+        self.on_change = on_change
+        self.interval = interval
+        self.mode = None
+        self._files = self.scan()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self):
+        files = {}
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def poll_once(self):
+        files = self.scan()
+        changed = sorted(
+            file for file, stat in files.items() if self._files.get(file) != stat)
+        removed = sorted(file for file in self._files if file not in files)
+        failed = ()
+        if changed or removed:
+            log.info(
+                f'Predictions changed: {changed}, removed: {removed}')
+            # If on_change raises nothing is committed and the next poll
+            # retries every change, the files it reports back as failed
+            # keep their old stat and are retried alone
+            failed = self.on_change(changed, removed) or ()
+        for file in failed:
+            if file in self._files:
+                files[file] = self._files[file]
+            else:
+                files.pop(file, None)
+        self._files = files
+        return changed, removed
+
+    def _run(self):
+        fd = open_inotify(self.base_dir)
+        self.mode = 'polling' if fd is None else 'inotify'
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._stop.wait(self.interval)
+                elif select.select([fd], [], [], self.interval)[0]:
+                    # Drain the events and let the writer finish the file
+                    try:
+                        while os.read(fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    self._stop.wait(0.2)
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    log.info(f'Error reloading predictions: {e}')
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='predictions-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
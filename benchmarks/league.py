@@ -0,0 +1,121 @@
+import copy
+import json
+import os
+import random
+
+from app.constants import KNOCKOUT_BRACKET, MATCH_TAGS, ROUND_OF_16, TEAMS_EN_ES
+from app.live import FALLBACK_PATH
+
+# Synthetic leagues for the benchmarks. Predictions are written in the same
+# layout as the real files, results are the stored tournament cut at a stage.
+
+STAGE_ROUNDS = {
+    'pre': 0,
+    'matchday-1': 1,
+    'matchday-2': 2,
+    'groups': 3,
+    'round-of-16': 4,
+    'quarter-finals': 5,
+    'semi-finals': 6,
+    'final': 7,
+}
+STAGE_NAMES = list(STAGE_ROUNDS)
+
+
+def load_rounds(path=FALLBACK_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)['rounds']
+
+
+def tournament_groups(rounds):
+    groups = {}
+    for round in rounds:
+        for match in round['matches']:
+            if 'group' in match:
+                teams = groups.setdefault(match['group'], [])
+                for team in (match['team1']['name'], match['team2']['name']):
+                    team = TEAMS_EN_ES.get(team, team)
+                    if team not in teams:
+                        teams.append(team)
+    return [groups[group] for group in sorted(groups)]
+
+
+def symbol(home, away):
+    return '1' if home > away else '2' if away > home else 'X'
+
+
+def knockout_goals(rng):
+    home, away = rng.randint(0, 4), rng.randint(0, 4)
+    if home == away:
+        home += 1
+    return home, away
+
+
+def generate_prediction(rng, groups):
+    lines = []
+    for _ in MATCH_TAGS[:36]:
+        home, away = rng.randint(0, 4), rng.randint(0, 4)
+        lines.append(f'{symbol(home, away)}|{home}-{away}')
+
+    for teams in groups:
+        lines += rng.sample(teams, len(teams))
+
+    # 16 of the 24 teams go through, then every round keeps the winners
+    teams = rng.sample([team for group in groups for team in group], 16)
+    while len(teams) > 1:
+        lines += teams
+        lines.append('')
+        winners = []
+        for home, away in zip(teams[::2], teams[1::2]):
+            home_goals, away_goals = knockout_goals(rng)
+            lines.append(
+                f'{home}-{away}·{symbol(home_goals, away_goals)}|{home_goals}-{away_goals}')
+            winners.append(home if home_goals > away_goals else away)
+        lines.append('')
+        teams = winners
+    lines += teams
+    return '\n'.join(lines) + '\n'
+
+
+def generate_predictions(directory, participants, seed=0):
+    # Writes participants prediction files named player0001.txt, ...
+    rng = random.Random(seed)
+    groups = tournament_groups(load_rounds())
+    os.makedirs(directory, exist_ok=True)
+    for n in range(participants):
+        with open(os.path.join(directory, f'player{n + 1:04d}.txt'), 'w') as f:
+            f.write(generate_prediction(rng, groups))
+    return directory
+
+
+def knockout_placeholders():
+    # Feed names of the knockout teams before they are known: group
+    # positions for the round of 16 and W<match number> after that
+    numbers = {tag: 37 + i for i, tag in enumerate(sorted([*ROUND_OF_16, *KNOCKOUT_BRACKET]))}
+    placeholders = {
+        tag: tuple(side if len(side) == 2 else f'{side[0]}{"/".join(side[1:])}' for side in sides)
+        for tag, sides in ROUND_OF_16.items()
+    }
+    for tag, sources in KNOCKOUT_BRACKET.items():
+        placeholders[tag] = tuple(f'W{numbers[source]}' for source in sources)
+    return placeholders
+
+
+def generate_rounds(stage, rounds=None):
+    # The stored rounds with every result after the given stage removed, and
+    # the teams of the knockout rounds those results decide replaced by the
+    # feed placeholders, as the feed shows them mid-tournament
+    rounds = copy.deepcopy(rounds if rounds is not None else load_rounds())
+    played = STAGE_ROUNDS[stage]
+    placeholders = knockout_placeholders()
+    for i, round in enumerate(rounds):
+        for match in round['matches']:
+            if i >= played:
+                match.pop('score', None)
+            tag = match['date'] + ' ' + match['time']
+            if 'num' in match and round['name'] == 'Semi-finals':
+                tag += f" {match['num']}"
+            if i > played and tag in placeholders:
+                for side, name in zip(('team1', 'team2'), placeholders[tag]):
+                    match[side] = {'name': name, 'code': name}
+    return rounds
@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.league import STAGE_NAMES, generate_predictions, generate_rounds
+
+# Benchmarks of the table callbacks over synthetic leagues. Every league size
+# runs in its own process so the app globals and the peak RSS are its own.
+#
+#   python -m benchmarks.run --participants 25 200 1000
+#   python -m benchmarks.run --compare benchmarks/results/<previous>.json
+
+RESULTS_DIR = 'benchmarks/results'
+
+# Callback arguments of the first page as the browser sends them
+SCENARIOS = {
+    'matches': ('load_matches', (None, [], [], 1, 0, 200, [], '')),
+    'matches+groups': ('load_matches', (None, [1], [], 1, 0, 200, [], '')),
+    'classification': ('load_classification', (None, 0, 200, [], '')),
+}
+
+METRICS = ['cold_ms', 'warm_ms', 'warm_p95_ms',
+           'payload_bytes', 'style_rules', 'peak_kib']
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(app, name, stage, repeat):
+    from dash._utils import to_json
+
+    function, args = SCENARIOS[name]
+    callback = getattr(app, function)
+
+    tic = time.perf_counter()
+    outputs = callback(*args)
+    cold = time.perf_counter() - tic
+
+    warm = []
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        callback(*args)
+        warm.append(time.perf_counter() - tic)
+
+    # Peak of a full rebuild, without the snapshot of the other workers
+    from app.snapshot import SnapshotStore
+    league = app.DEFAULT_LEAGUE
+    league.matches.invalidate()
+    app.JOBS.invalidate()
+    app.SNAPSHOTS = SnapshotStore(tempfile.mkdtemp(prefix='snapshots-'))
+    league.leaderboard = app.Leaderboard(league.matrix)
+    tracemalloc.start()
+    callback(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'scenario': name,
+        'stage': stage,
+        'cold_ms': cold * 1000,
+        'warm_ms': statistics.median(warm) * 1000,
+        'warm_p95_ms': percentile(warm, 0.95) * 1000,
+        'payload_bytes': len(to_json(list(outputs)).encode('utf-8')),
+        'style_rules': len(outputs[2]) if function == 'load_matches' else 0,
+        'peak_kib': peak / 1024,
+    }
+
+
+def run_worker(participants, stages, scenarios, repeat):
+    # Runs in the child process, with the league already pointed to by the
+    # environment
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app.app as app
+
+        runs = []
+        for stage in stages:
+            app.RESULTS_POLLER.publish(generate_rounds(stage))
+            # Cold runs measure the build, not the last stage served stale
+            app.JOBS.invalidate()
+            for name in scenarios:
+                runs.append({'participants': participants,
+                             **measure(app, name, stage, repeat)})
+
+    return {
+        'participants': participants,
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'runs': runs,
+    }
+
+
+def run_league(participants, stages, scenarios, repeat, seed):
+    with tempfile.TemporaryDirectory(prefix='league-') as directory:
+        predictions = generate_predictions(
+            os.path.join(directory, 'predictions'), participants, seed)
+        output = os.path.join(directory, 'result.json')
+        env = {
+            **os.environ,
+            'PREDICTIONS_DIR': predictions + os.sep,
+            'PREDICTIONS_STORE': os.path.join(directory, 'predictions.bin'),
+            'SNAPSHOT_DIR': os.path.join(directory, 'snapshots'),
+            'PREDICTIONS_WATCH': '0',
+            'LIVE_RESULTS_INTERVAL': '0',
+        }
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.run', '--worker', output,
+             '--participants', str(participants), '--stages', *stages,
+             '--scenarios', *scenarios, '--repeat', str(repeat)],
+            env=env, check=True)
+        with open(output, 'r') as f:
+            return json.load(f)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_key(run):
+    return (run['participants'], run['stage'], run['scenario'])
+
+
+def print_results(results, baseline=None):
+    previous = {run_key(run): run for run in baseline['runs']} if baseline else {}
+
+    table = Table(title=f"Benchmarks {results['commit']}" + (
+        f" vs {baseline['commit']}" if baseline else ''))
+    for column in ['participants', 'stage', 'scenario', *METRICS]:
+        table.add_column(column, justify='right')
+
+    for run in results['runs']:
+        cells = []
+        for metric in METRICS:
+            cell = f'{run[metric]:,.2f}' if isinstance(run[metric], float) else f'{run[metric]:,}'
+            before = previous.get(run_key(run), {}).get(metric)
+            if before:
+                change = (run[metric] - before) / before * 100
+                color = 'red' if change > 10 else 'green' if change < -10 else 'dim'
+                cell += f' [{color}]({change:+.0f}%)[/{color}]'
+            cells.append(cell)
+        table.add_row(str(run['participants']), run['stage'], run['scenario'], *cells)
+
+    console = Console()
+    console.print(table)
+    for participants, rss in results['max_rss_kib'].items():
+        console.print(f'{participants} participants: max RSS {int(rss) / 1024:,.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the table callbacks')
+    parser.add_argument('--participants', type=int, nargs='+', default=[25, 200, 1000])
+    parser.add_argument('--stages', nargs='+', choices=STAGE_NAMES,
+                        default=['pre', 'groups', 'quarter-finals', 'final'])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file, saved to benchmarks/results/ by default')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.participants[0], args.stages, args.scenarios, args.repeat)
+        with open(args.worker, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'max_rss_kib': {},
+        'runs': [],
+    }
+    for participants in args.participants:
+        league = run_league(participants, args.stages, args.scenarios, args.repeat, args.seed)
+        results['max_rss_kib'][participants] = league['max_rss_kib']
+        results['runs'] += league['runs']
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f'Saved to {output}')
+
+
+if __name__ == "__main__":
+    main()
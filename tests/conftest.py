@@ -0,0 +1,33 @@
+import pytest
+
+from app.fixtures import Fixtures
+from app.predictions import load_predictions
+from app.scoring import PredictionMatrix
+from benchmarks.league import load_rounds
+
+PREDICTIONS_DIR = 'app/assets/predictions/'
+
+
+def match_rows(rounds):
+    # The fields of the matches table rows the scorers read, header rows
+    # left out
+    return [{
+        'date': fixture.date_label,
+        'match_key': fixture.key,
+        'home_team': fixture.home_team,
+        'away_team': fixture.away_team,
+        'tag': fixture.tag,
+        'result': fixture.result,
+        'type': fixture.type,
+    } for fixture in Fixtures(rounds).matches if fixture.listed]
+
+
+@pytest.fixture(scope='session')
+def preds():
+    return PredictionMatrix(load_predictions(PREDICTIONS_DIR))
+
+
+@pytest.fixture(scope='session')
+def rounds():
+    return load_rounds()
+
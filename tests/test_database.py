@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.database import Database, import_files
+from app.fixtures import Fixtures
+from app.predictions import load_prediction
+from app.scoring import POINTS, ResultVector, rank, score_predictions
+from benchmarks.league import STAGE_NAMES, generate_rounds
+
+from tests.conftest import PREDICTIONS_DIR, match_rows
+
+
+def expected(preds, rounds, points=POINTS):
+    results = ResultVector(preds, match_rows(rounds), Fixtures(rounds).champion)
+    _, counts = score_predictions(preds, results)
+    return rank(preds.names, counts, points)
+
+
+@pytest.fixture
+def database(tmp_path, rounds):
+    database = Database(str(tmp_path / 'league.db'))
+    import_files(database, PREDICTIONS_DIR, rounds)
+    return database
+
+
+def test_import_matches_the_scoring_engine(preds, rounds, database):
+    assert database.count() == len(preds.names)
+    assert database.leaderboard(limit=len(preds.names)) == expected(preds, rounds)
+    assert database.leaderboard(offset=3, limit=2) == expected(preds, rounds)[3:5]
+
+
+def test_new_results_rescore_only_their_slots(preds, database):
+    # Back to the start and through the tournament again, one stage at a time
+    for stage in STAGE_NAMES:
+        rounds = generate_rounds(stage)
+        fixtures = Fixtures(rounds)
+        database.write_fixtures(fixtures, fixtures.champion)
+        assert database.write_fixtures(fixtures, fixtures.champion) == []
+        rows = database.leaderboard(limit=len(preds.names))
+        if stage == 'pre':
+            # Nobody scored yet, all share the first position (rank numbers
+            # that tie 0)
+            assert {(row['total'], row['position']) for row in rows} == {(0, 1)}
+        else:
+            assert rows == expected(preds, rounds)
+
+
+def test_reweight_and_reopen(preds, rounds, database):
+    points = np.array([3, 1, 2, 4, 8, 16, 20])
+    database.reweight(points)
+    assert database.leaderboard(limit=len(preds.names)) == expected(preds, rounds, points)
+    reopened = Database(database.path)
+    assert reopened.leaderboard(limit=len(preds.names)) == expected(preds, rounds)
+
+
+def test_participants_are_replaced_and_removed(preds, rounds, database):
+    files = sorted(os.listdir(PREDICTIONS_DIR))
+    first, second = files[:2]
+    digests = database.digests()
+    # Same digest, nothing written; a changed one is rescored
+    database.write_participants({first: load_prediction(PREDICTIONS_DIR, first)})
+    changed = load_prediction(PREDICTIONS_DIR, second)
+    changed.digest = 'changed'
+    database.write_participants({first: changed})
+    assert database.digests() == {**digests, first: 'changed'}
+    row = next(row for row in database.leaderboard(limit=len(files)) if row['nombre'] == first.split('.')[0].title())
+    assert row['total'] == next(row['total'] for row in expected(preds, rounds)
+                                if row['nombre'] == second.split('.')[0].title())
+
+    database.write_participants({}, removed={first, 'unknown.txt'})
+    assert database.count() == len(files) - 1
+    assert first not in database.digests()
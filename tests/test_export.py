@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.export import CHUNK_SIZE, GRID_COLUMNS, chunked, csv_lines, grid_npz, grid_records, ndjson_lines
+from app.fixtures import Fixtures
+from app.scoring import POINTS, ResultVector, score_predictions
+from benchmarks.league import generate_rounds
+
+from tests.conftest import match_rows
+
+
+@pytest.fixture(scope='module', params=['final', 'quarter-finals'])
+def view(request, preds):
+    rounds = generate_rounds(request.param)
+    fixtures = Fixtures(rounds)
+    states, counts = score_predictions(preds, ResultVector(preds, match_rows(rounds), fixtures.champion))
+    return SimpleNamespace(preds=preds, fixtures=fixtures, states=states, counts=counts, points=POINTS)
+
+
+def test_grid_records_score_like_the_classification(view):
+    records = list(grid_records(view))
+    fixtures = [fixture for fixture in view.fixtures.matches if fixture.listed and fixture.slot is not None]
+    assert len(records) == len(fixtures) * len(view.preds.names)
+    by_participant = {}
+    pairings = set()
+    for record in records:
+        row = dict(zip(GRID_COLUMNS, record))
+        by_participant[row['participant']] = by_participant.get(row['participant'], 0) + (row['points'] or 0)
+        assert (row['points'] is None) == (row['state'] is None)
+        if row['stage'] == 'group' or row['home_prediction'] is None:
+            assert row['pairing'] is None
+        else:
+            pairings.add(row['pairing'])
+    # Knockout cells name the pairing the participant predicted
+    assert all(pairing.count('-') == 1 for pairing in pairings) and pairings
+    match_points = view.counts[:, :2] @ view.points[:2]
+    for name, points in zip(view.preds.names, match_points):
+        assert by_participant[name.split('.')[0].title()] == points
+
+
+def test_csv_and_ndjson_carry_the_same_records(view):
+    records = list(grid_records(view))
+    text = ''.join(chunked(csv_lines(iter(records))))
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == GRID_COLUMNS
+    assert rows[1:] == [['' if value is None else str(value) for value in record] for record in records]
+
+    lines = list(ndjson_lines(iter(records)))
+    assert [json.loads(line) for line in lines] == [dict(zip(GRID_COLUMNS, record)) for record in records]
+
+
+def test_chunked_flushes_about_chunk_size():
+    lines = ['x' * 1000 + '\n'] * 200
+    chunks = list(chunked(lines))
+    assert ''.join(chunks) == ''.join(lines)
+    assert all(len(chunk) >= CHUNK_SIZE for chunk in chunks[:-1])
+    assert all(len(chunk) < CHUNK_SIZE + 1001 for chunk in chunks)
+    assert list(chunked([])) == []
+
+
+def test_npz_matches_the_records(view):
+    grid = np.load(grid_npz(view))
+    records = list(grid_records(view))
+    n = len(view.preds.names)
+    assert list(grid['participants']) == [record[7] for record in records[:n]]
+    assert list(grid['slots']) == [record[0] for record in records[::n]]
+    assert grid['states'].shape == grid['points'].shape == (n, len(grid['slots']))
+    points = np.array([[record[12] or 0 for record in records[i * n:(i + 1) * n]]
+                       for i in range(len(grid['slots']))]).T
+    assert (grid['points'] == points).all()
+    assert list(grid['home_scores']) == [-1 if record[5] is None else record[5] for record in records[::n]]
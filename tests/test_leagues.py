@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from app.leagues import LEAGUE_KEY, LeagueRouter, league_dirs
+
+
+def test_league_dirs_skip_invalid_names(tmp_path):
+    for name in ('work', 'family-2024', 'Bad Name', 'odds', '-dash'):
+        os.makedirs(tmp_path / name / 'predictions')
+    os.makedirs(tmp_path / 'empty')
+    (tmp_path / 'file.txt').write_text('')
+    assert league_dirs(str(tmp_path)) == {
+        'family-2024': str(tmp_path / 'family-2024'),
+        'work': str(tmp_path / 'work'),
+    }
+
+
+@pytest.fixture
+def router():
+    seen = []
+
+    def app(environ, start_response):
+        seen.append({key: environ.get(key) for key in ('SCRIPT_NAME', 'PATH_INFO', LEAGUE_KEY)})
+        start_response('200 OK', [])
+        return [b'ok']
+
+    router = LeagueRouter(app, ['work', 'family'])
+    router.seen = seen
+    return router
+
+
+def call(router, path, **headers):
+    statuses = []
+    environ = {'PATH_INFO': path, 'SCRIPT_NAME': '', 'HTTP_HOST': 'euro.example.com', **headers}
+    body = router(environ, lambda status, headers: statuses.append((status, dict(headers))))
+    return statuses[0], b''.join(body)
+
+
+def test_path_prefix_picks_the_league(router):
+    assert call(router, '/work/_dash-layout')[1] == b'ok'
+    assert router.seen[-1] == {'SCRIPT_NAME': '/work', 'PATH_INFO': '/_dash-layout', LEAGUE_KEY: 'work'}
+    call(router, '/work/')
+    assert router.seen[-1]['PATH_INFO'] == '/'
+    # A team or route named like no league stays on the default one
+    call(router, '/workers/')
+    assert router.seen[-1] == {'SCRIPT_NAME': '', 'PATH_INFO': '/workers/', LEAGUE_KEY: None}
+
+
+def test_bare_league_path_redirects_to_the_slash(router):
+    (status, headers), body = call(router, '/family')
+    assert status.startswith('301')
+    assert headers['Location'] == '/family/'
+    assert body == b''
+    assert router.seen == []
+
+
+def test_referer_and_subdomain_pick_the_league(router):
+    call(router, '/_dash-update-component', HTTP_REFERER='https://euro.example.com/family/')
+    assert router.seen[-1][LEAGUE_KEY] == 'family'
+    # Only the page's own host counts
+    call(router, '/_dash-update-component', HTTP_REFERER='https://other.example.com/family/')
+    assert router.seen[-1][LEAGUE_KEY] is None
+    call(router, '/leaderboard', HTTP_HOST='work.example.com:8050')
+    assert router.seen[-1] == {'SCRIPT_NAME': '', 'PATH_INFO': '/leaderboard', LEAGUE_KEY: 'work'}
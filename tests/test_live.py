@@ -0,0 +1,100 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.live import FALLBACK_PATH, ResultsPoller
+
+
+class Feed:
+    # What the stand-in results server answers, and the conditional headers
+    # it was sent
+    def __init__(self):
+        self.rounds = [{'name': 'Matchday 1', 'matches': []}]
+        self.etag = '"1"'
+        self.status = 200
+        self.requests = []
+
+
+@pytest.fixture
+def feed():
+    feed = Feed()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            feed.requests.append((self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')))
+            if feed.status != 200:
+                self.send_response(feed.status)
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == feed.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = json.dumps({'rounds': feed.rounds}).encode()
+            self.send_response(200)
+            self.send_header('ETag', feed.etag)
+            self.send_header('Last-Modified', 'Sat, 29 Jun 2024 18:00:00 GMT')
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    feed.url = f'http://127.0.0.1:{server.server_address[1]}/euro.json'
+    yield feed
+    server.shutdown()
+    server.server_close()
+
+
+def test_poll_once_uses_conditional_gets(feed):
+    poller = ResultsPoller(url=feed.url, timeout=2)
+    with open(FALLBACK_PATH, 'r') as f:
+        assert poller.snapshot()[1] == json.load(f)['rounds']
+
+    assert poller.poll_once()
+    version, rounds = poller.snapshot()
+    assert rounds == feed.rounds
+    assert not poller.poll_once()
+    assert poller.snapshot()[0] == version
+    assert poller.not_modified == 1
+    assert feed.requests == [(None, None), ('"1"', 'Sat, 29 Jun 2024 18:00:00 GMT')]
+
+    # A new body with the same rounds is not a new version
+    feed.etag = '"2"'
+    assert not poller.poll_once()
+    feed.rounds = [{'name': 'Matchday 1', 'matches': [{'num': 1}]}]
+    feed.etag = '"3"'
+    assert poller.poll_once()
+    assert poller.snapshot()[1] == feed.rounds
+
+
+def test_failed_polls_keep_the_last_good_rounds(feed):
+    poller = ResultsPoller(url=feed.url, timeout=2)
+    poller.poll_once()
+    snapshot = poller.snapshot()
+    feed.status = 500
+    assert not poller.poll_once()
+    poller.url = 'http://127.0.0.1:1/euro.json'
+    assert not poller.poll_once()
+    assert poller.snapshot() is snapshot
+    assert poller.errors == 2
+    assert poller.polls == 3
+
+
+def test_the_thread_calls_on_change_for_new_versions(feed):
+    changed = threading.Event()
+    poller = ResultsPoller(url=feed.url, timeout=2, interval=0.05, on_change=changed.set)
+    poller.start()
+    try:
+        assert changed.wait(5)
+        assert poller.snapshot()[1] == feed.rounds
+    finally:
+        poller.stop()
+    assert not poller._thread.is_alive()
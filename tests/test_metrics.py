@@ -0,0 +1,77 @@
+from app.metrics import Registry, format_labels, format_value
+
+
+def registry():
+    registry = Registry()
+    calls = registry.counter('calls_total', 'Calls.', 'callback', ('matches', 'classification'))
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    return registry, calls, latency
+
+
+def test_format_labels_and_values():
+    assert format_labels() == ''
+    assert format_labels(a=None) == ''
+    assert format_labels(a='x"y\\z\n', le=0.5) == '{a="x\\"y\\\\z\\n",le="0.5"}'
+    assert format_value(3.0) == '3'
+    assert format_value(0.25) == '0.25'
+
+
+def test_exposition():
+    metrics, calls, latency = registry()
+    metrics.gauge('streams', 'Open streams.', lambda: {'default': 2, 'other': 0}, label='league')
+    calls.inc('matches')
+    calls.inc('matches', amount=2)
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+
+    @latency.timed()
+    def work():
+        return 1
+
+    assert work() == 1
+    text = metrics.exposition()
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert lines[:2] == ['# HELP calls_total Calls.', '# TYPE calls_total counter']
+    assert 'calls_total{callback="matches"} 3' in lines
+    assert 'calls_total{callback="classification"} 0' in lines
+    assert '# TYPE latency_seconds histogram' in lines
+    # Buckets are cumulative, upper bounds inclusive
+    assert 'latency_seconds_bucket{le="0.1"} 3' in lines
+    assert 'latency_seconds_bucket{le="1"} 4' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 5' in lines
+    assert 'latency_seconds_count 5' in lines
+    assert float(next(line for line in lines if line.startswith('latency_seconds_sum')).split()[1]) >= 3.65
+    assert 'streams{league="default"} 2' in lines
+
+
+def test_workers_add_up_through_the_directory(tmp_path, monkeypatch):
+    first, first_calls, _ = registry()
+    second, second_calls, second_latency = registry()
+    first.open(str(tmp_path))
+    first_calls.inc('matches')
+    # Another worker, with a file of its own
+    monkeypatch.setattr('app.metrics.os.getpid', lambda: 1)
+    second.open(str(tmp_path))
+    second_calls.inc('matches', amount=2)
+    second_latency.observe(0.5)
+    assert len(list(tmp_path.iterdir())) == 2
+    lines = first.exposition().splitlines()
+    assert 'calls_total{callback="matches"} 3' in lines
+    assert 'latency_seconds_count 1' in lines
+
+    # Code with other metrics never reads these files
+    other = Registry()
+    other.counter('calls_total', 'Calls.')
+    other.open(str(tmp_path))
+    other.metrics[0].inc()
+    assert 'calls_total 1' in other.exposition().splitlines()
+
+
+def test_unusable_directory_keeps_values_per_worker(tmp_path):
+    metrics, calls, _ = registry()
+    (tmp_path / 'file').write_text('')
+    metrics.open(str(tmp_path / 'file' / 'metrics'))
+    calls.inc('classification')
+    assert metrics.directory is None
+    assert 'calls_total{callback="classification"} 1' in metrics.exposition().splitlines()
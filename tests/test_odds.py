@@ -0,0 +1,168 @@
+import numpy as np
+import pytest
+
+from app.constants import GROUP_MATCHES, GROUPS, KNOCKOUT_BRACKET, MATCH_SLOTS, ROUND_OF_16
+from app.elimination import eliminate, levels_above
+from app.fixtures import Fixtures
+from app.odds import (FINAL_SLOT, GROUP_LETTERS, TEAM_INDEX, THIRD_SLOTS, PoissonModel, Simulation, Tournament,
+                      prepare, simulate)
+from app.scoring import POINTS, ResultVector, rank, score_predictions
+from benchmarks.league import generate_rounds
+
+from tests.conftest import match_rows
+
+
+def inputs(preds, rounds):
+    rows = match_rows(rounds)
+    return preds, ResultVector(preds, rows, Fixtures(rounds).champion), rows
+
+
+@pytest.fixture(scope='module')
+def final_table(preds, rounds):
+    _, counts = score_predictions(preds, inputs(preds, rounds)[1])
+    return {row['nombre']: row for row in rank(preds.names, counts)}
+
+
+def test_simulate_a_finished_tournament(preds, rounds, final_table):
+    rows = simulate(*inputs(preds, rounds), sims=200, top=3, seed=1)
+    for row in rows:
+        expected = final_table[row['nombre']]
+        assert row['expected_total'] == expected['total']
+        assert row['first'] == (1.0 if expected['position'] == 1 else 0.0)
+        assert row['top'] == (1.0 if expected['position'] <= 3 else 0.0)
+
+
+def test_simulate_is_seeded_and_consistent(preds):
+    args = inputs(preds, generate_rounds('quarter-finals'))
+    rows = simulate(*args, sims=2000, top=3, seed=7)
+    assert rows == simulate(*args, sims=2000, top=3, seed=7)
+    assert sum(row['first'] for row in rows) >= 1
+    assert all(0 <= row['first'] <= row['top'] <= 1 for row in rows)
+
+
+def test_simulation_follows_an_open_bracket():
+    # Before the groups end the feed names the knockout teams by group
+    # position and match number, the simulator fills in every one of them
+    rows = match_rows(generate_rounds('matchday-2'))
+    tournament = Tournament(rows)
+    assert all(MATCH_SLOTS[tag] not in tournament.teams for tag in [*ROUND_OF_16, *KNOCKOUT_BRACKET])
+    sim = Simulation(tournament, PoissonModel(), 500, np.random.default_rng(2))
+    standings, thirds = sim.standings()
+
+    points = np.zeros((len(TEAM_INDEX), sim.n), dtype=int)
+    for slot in range(GROUP_MATCHES):
+        home, away = tournament.teams[slot]
+        home_goals, away_goals = sim.home_goals[slot], sim.away_goals[slot]
+        points[home] += 3 * (home_goals > away_goals) + (home_goals == away_goals)
+        points[away] += 3 * (away_goals > home_goals) + (home_goals == away_goals)
+    for group, teams in enumerate(GROUPS):
+        assert (np.sort(standings[group], axis=0).T == sorted(TEAM_INDEX[team] for team in teams)).all()
+        assert (np.diff(np.take_along_axis(points, standings[group], axis=0), axis=0) <= 0).all()
+
+    # Four thirds from different groups the slots allow, none left out
+    # with more points than one that went through
+    third_points = np.take_along_axis(points, standings[:, 2], axis=0)
+    groups = np.stack([thirds[tag] // len(GROUPS[0]) for tag in THIRD_SLOTS])
+    for tag, group in zip(THIRD_SLOTS, groups):
+        assert all(GROUP_LETTERS[g] in ROUND_OF_16[tag][1][1:] for g in group)
+        assert (standings[group, 2, np.arange(sim.n)] == thirds[tag]).all()
+    assert all(len(set(column)) == len(THIRD_SLOTS) for column in groups.T)
+    qualified = np.zeros(third_points.shape, dtype=bool)
+    np.put_along_axis(qualified, groups, True, axis=0)
+    worst_in = np.where(qualified, third_points, 99).min(axis=0)
+    assert (worst_in >= np.where(qualified, -1, third_points).max(axis=0)).all()
+
+    # The round of 16 drawn from the standings (the tie breakers drawn
+    # again, so teams compared by group and points), 16 different teams,
+    # then winners go through to the match the bracket sends them to
+    columns = np.arange(sim.n)
+    for tag, sides in ROUND_OF_16.items():
+        for teams, side in zip((sim.home[MATCH_SLOTS[tag]], sim.away[MATCH_SLOTS[tag]]), sides):
+            group = teams // len(GROUPS[0])
+            if side[0] == '3':
+                assert all(GROUP_LETTERS[g] in side[1:] for g in group)
+                expected = standings[group, 2, columns]
+            else:
+                assert (group == GROUP_LETTERS.index(side[1])).all()
+                expected = standings[group, int(side[0]) - 1, columns]
+            assert (points[teams, columns] == points[expected, columns]).all()
+    round_of_16 = np.concatenate([[sim.home[MATCH_SLOTS[tag]], sim.away[MATCH_SLOTS[tag]]] for tag in ROUND_OF_16])
+    assert all(len(set(column)) == 2 * len(ROUND_OF_16) for column in round_of_16.T)
+    for tag, (home, away) in KNOCKOUT_BRACKET.items():
+        slot = MATCH_SLOTS[tag]
+        assert (sim.home[slot] == sim.winner[MATCH_SLOTS[home]]).all()
+        assert (sim.away[slot] == sim.winner[MATCH_SLOTS[away]]).all()
+    for slot, winner in sim.winner.items():
+        assert ((winner == sim.home[slot]) | (winner == sim.away[slot])).all()
+    assert (sim.champion == sim.winner[FINAL_SLOT]).all()
+
+
+def test_eliminate_a_finished_tournament(preds, rounds, final_table):
+    for row in eliminate(*inputs(preds, rounds)):
+        position = final_table[row['nombre']]['position']
+        assert row['exact']
+        assert row['best_position'] == row['worst_position'] == position
+        assert row['alive'] == (position == 1)
+
+
+@pytest.mark.parametrize('stage', ['groups', 'round-of-16', 'quarter-finals', 'semi-finals'])
+def test_eliminate_agrees_with_simulate(preds, stage):
+    args = inputs(preds, generate_rounds(stage))
+    rows = {row['nombre']: row for row in eliminate(*args)}
+    assert all(row['exact'] for row in rows.values())
+    for row in simulate(*args, sims=5000, top=3, seed=3):
+        solved = rows[row['nombre']]
+        assert solved['best_position'] <= solved['worst_position']
+        # A participant winning some simulated tournament is still alive
+        if row['first'] > 0:
+            assert solved['alive'] is True
+
+
+@pytest.mark.parametrize('stage', ['groups', 'quarter-finals'])
+def test_eliminate_bounds_every_simulated_tournament(preds, stage):
+    # Positions counted like the classification, in tournaments the
+    # simulator plays, never fall outside the exact range
+    args = inputs(preds, generate_rounds(stage))
+    rows = {row['nombre']: row for row in eliminate(*args)}
+    scorer, model, _ = prepare((*args, PoissonModel(), 3, POINTS))
+    totals = scorer.totals(Simulation(scorer.tournament, model, 2000, np.random.default_rng(11)))
+    positions = levels_above(totals) + 1
+    for p, name in enumerate(preds.names):
+        row = rows[name.split('.')[0].title()]
+        assert row['best_position'] <= positions[p].min()
+        assert positions[p].max() <= row['worst_position']
+
+
+def test_eliminate_agrees_with_simulate_on_an_open_bracket(preds):
+    # Knockout teams still placeholders: every tournament the simulator
+    # plays through the standings and the bracket falls within the rows
+    # the solver proves, and its winners are never ruled out
+    args = inputs(preds, generate_rounds('matchday-2'))
+    assert {'1A', '3A/B/C/D', 'W49'} <= {row['home_team'] for row in args[2]} | {row['away_team'] for row in args[2]}
+    rows = {row['nombre']: row for row in eliminate(*args)}
+    assert any(row['exact'] for row in rows.values())
+    scorer, model, _ = prepare((*args, PoissonModel(), 3, POINTS))
+    totals = scorer.totals(Simulation(scorer.tournament, model, 2000, np.random.default_rng(13)))
+    positions = levels_above(totals) + 1
+    for p, name in enumerate(preds.names):
+        row = rows[name.split('.')[0].title()]
+        if (positions[p] == 1).any():
+            assert row['alive'] is not False
+        if row['exact']:
+            assert row['best_position'] <= positions[p].min()
+            assert positions[p].max() <= row['worst_position']
+
+
+def test_eliminate_never_claims_unproven_rows(preds):
+    # Before the round of 16 is set, or without time to search, rows carry
+    # the positions reached in some tournament: nobody is called alive or
+    # out without proof
+    for args, budget in ((inputs(preds, generate_rounds('matchday-2')), None),
+                         (inputs(preds, generate_rounds('groups')), 0)):
+        winners = {row['nombre'] for row in simulate(*args, sims=2000, seed=5) if row['first'] > 0}
+        for row in eliminate(*args, budget=budget):
+            if row['nombre'] in winners:
+                assert row['alive'] is not False
+            assert (row['alive'] is True) == (row['best_position'] == 1)
+            if row['alive'] is None:
+                assert not row['exact']
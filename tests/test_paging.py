@@ -0,0 +1,58 @@
+import pytest
+
+from app.paging import filter_rows, matches_filter, parse_filter, query_rows
+
+ROWS = [
+    {'name': 'Angel', 'points': 10},
+    {'name': 'ana', 'points': 20},
+    {'name': 'Bea', 'points': 30},
+    {'name': None, 'points': None},
+]
+
+
+@pytest.mark.parametrize('op, expected', [
+    ('=', 'eq'), ('!=', 'ne'), ('<', 'lt'), ('<=', 'le'), ('>', 'gt'), ('>=', 'ge'),
+    ('eq', 'eq'), ('ne', 'ne'), ('lt', 'lt'), ('le', 'le'), ('gt', 'gt'), ('ge', 'ge'),
+    ('contains', 'contains'), ('datestartswith', 'datestartswith'),
+])
+@pytest.mark.parametrize('prefix', ['', 'i', 's'])
+def test_parse_filter_operators(op, expected, prefix):
+    [(column, parsed, text, number, case_sensitive)] = parse_filter(f'{{points}} {prefix}{op} 20')
+    assert (column, parsed, text, number) == ('points', expected, '20', 20.0)
+    assert case_sensitive == (prefix == 's')
+
+
+@pytest.mark.parametrize('query, names', [
+    ('{points} i= 20', ['ana']),
+    ('{points} s!= 20', ['Angel', 'Bea']),
+    ('{points} i< 20', ['Angel']),
+    ('{points} s<= 20', ['Angel', 'ana']),
+    ('{points} i> 20', ['Bea']),
+    ('{points} s>= 20', ['ana', 'Bea']),
+    ('{name} icontains an', ['Angel', 'ana']),
+    ('{name} scontains an', ['ana']),
+    ('{name} contains "AN"', ['Angel', 'ana']),
+    ('{name} s= Angel', ['Angel']),
+    ('{name} i= angel', ['Angel']),
+    ('{name} ieq bea && {points} gt 10', ['Bea']),
+])
+def test_filter_rows(query, names):
+    assert [row['name'] for row in filter_rows(ROWS, query)] == names
+
+
+def test_unknown_operator_matches_nothing():
+    assert filter_rows(ROWS, '{name} like Angel') == []
+    assert not matches_filter('Angel', 'like', 'Angel', None, False)
+
+
+def test_empty_filter_keeps_every_row():
+    assert filter_rows(ROWS, '') is ROWS
+    assert filter_rows(ROWS, None) is ROWS
+
+
+def test_query_rows_sorts_pages_and_projects():
+    page, count = query_rows(ROWS, 0, 2, [{'column_id': 'points', 'direction': 'desc'}], '', columns=['name'])
+    assert page == [{'name': 'Bea'}, {'name': 'ana'}]
+    assert count == 2
+    page, _ = query_rows(ROWS, 1, 2, [{'column_id': 'points', 'direction': 'desc'}], '')
+    assert page[-1]['points'] is None
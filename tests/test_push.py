@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.constants import MATCH_TAGS
+from app.push import Broadcaster, StreamSlots, sse_event, table_diff
+
+
+def data(text):
+    return [json.loads(line[len('data: '):]) for line in text.splitlines() if line.startswith('data: ')]
+
+
+def test_sse_event_format():
+    assert sse_event({'a': 'ñ'}) == 'data: {"a": "ñ"}\n\n'
+    assert sse_event([1], 'v2') == 'id: v2\ndata: [1]\n\n'
+
+
+def test_stream_slots_cap_open_streams():
+    slots = StreamSlots(2)
+    assert slots.acquire() and slots.acquire()
+    assert not slots.acquire()
+    slots.release()
+    assert slots.acquire()
+    assert slots.open == 2
+
+
+def test_stream_sends_the_version_then_new_diffs():
+    push = Broadcaster(heartbeat=0.01)
+    push.publish('v1', {'type': 'diff', 'n': 1})
+    stream = push.stream(lifetime=5, retry=100)
+    assert next(stream) == 'retry: 100\n\n'
+    assert data(next(stream)) == [{'type': 'version', 'version': 'v1'}]
+    assert push.streams == 1
+
+    push.publish('v2', {'type': 'diff', 'n': 2}, previous='v1')
+    push.publish('v3', {'type': 'diff', 'n': 3}, previous='v2')
+    assert [event['n'] for event in data(next(stream))] == [2, 3]
+    assert next(stream) == ': keepalive\n\n'
+    stream.close()
+    assert push.streams == 0
+
+
+def test_reconnects_replay_what_they_missed():
+    push = Broadcaster(keep=2)
+    for n in range(1, 4):
+        push.publish(f'v{n}', {'n': n}, previous=f'v{n - 1}')
+    replay = ''.join(push.stream(last_version='v1', lifetime=0))
+    assert [event['n'] for event in data(replay)] == [2, 3]
+    assert 'id: v3' in replay
+    # Up to date, nothing to send
+    assert data(''.join(push.stream(last_version='v3', lifetime=0))) == []
+    # Older than the diffs kept, the client starts over from the version
+    assert data(''.join(push.stream(last_version='v0', lifetime=0))) == [{'type': 'version', 'version': 'v3'}]
+
+
+def test_streams_falling_behind_are_told_to_reload():
+    push = Broadcaster(keep=2, heartbeat=0.01)
+    push.publish('v1', {'n': 1})
+    stream = push.stream(lifetime=5)
+    next(stream), next(stream)
+    for n in range(2, 5):
+        push.publish(f'v{n}', {'n': n}, previous=f'v{n - 1}')
+    assert data(next(stream)) == [{'type': 'reload', 'version': 'v4'}]
+    stream.close()
+
+
+def view(version, results, states, totals):
+    names = ['ana', 'bea']
+    positions = [1 + sum(other > total for other in totals) for total in totals]
+    return SimpleNamespace(
+        version=version,
+        preds=SimpleNamespace(names=names),
+        match_rows=[{'tag': tag, 'date': 'Fri, 14 Jun, 21:00', 'result': result}
+                    for tag, result in zip(MATCH_TAGS, results)],
+        states=np.array(states),
+        pred_rows=[{'nombre': name, 'total': total, 'position': position}
+                   for name, total, position in zip(names, totals, positions)],
+    )
+
+
+def test_table_diff_reports_cells_and_rank_moves():
+    old = view(('r1', 'p1'), ['Not started', 'Not started'], [[0, 0], [0, 0]], [0, 0])
+    new = view(('r2', 'p1'), ['2-1', 'Not started'], [[1, 0], [3, 0]], [10, 0])
+    diff = table_diff(old, new)
+    assert diff['matches'] == [{'tag': MATCH_TAGS[0], 'result': '2-1', 'states': [[0, 'ana', 1], [1, 'bea', 3]]}]
+    assert diff['ranks'] == {
+        'ana': {'total': 10, 'points': 10, 'position': 1, 'moved': 0},
+        'bea': {'total': 0, 'points': 0, 'position': 2, 'moved': -1},
+    }
+    assert table_diff(new, new) == {'type': 'diff', 'matches': [], 'ranks': {}}
+    # Other predictions, the tables are sent again
+    assert table_diff(old, view(('r2', 'p2'), ['2-1', 'Not started'], [[1, 0], [3, 0]], [10, 0])) is None
@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.fixtures import Fixtures
+from app.predictions import load_prediction
+from app.scoring import DEFAULT_RULES, Leaderboard, ResultVector, rank, score_predictions, scoring_rules
+from benchmarks.league import STAGE_NAMES, generate_rounds
+
+from tests.conftest import PREDICTIONS_DIR, match_rows
+
+
+def results_at(preds, rounds):
+    return ResultVector(preds, match_rows(rounds), Fixtures(rounds).champion)
+
+
+def test_rank_matches_the_baseline_scorer(preds, rounds):
+    with open('tests/data/baseline_classification.json', 'r') as f:
+        baseline = json.load(f)
+    assert Fixtures(rounds).champion == 'España'
+
+    _, counts = score_predictions(preds, results_at(preds, rounds))
+    assert rank(preds.names, counts, DEFAULT_RULES.points) == baseline
+
+
+def test_no_champion_points_before_the_final(preds):
+    rounds = generate_rounds('semi-finals')
+    assert Fixtures(rounds).champion is None
+    _, counts = score_predictions(preds, results_at(preds, rounds))
+    assert not counts[:, -1].any()
+
+
+@pytest.mark.parametrize('order', [STAGE_NAMES, STAGE_NAMES[::-1], ['final', 'pre', 'groups', 'final']])
+def test_leaderboard_update_matches_full_scoring(preds, order):
+    leaderboard = Leaderboard(preds)
+    for stage in order:
+        results = results_at(preds, generate_rounds(stage))
+        leaderboard.update(results)
+        states, counts = score_predictions(preds, results)
+        assert np.array_equal(leaderboard.states, states), stage
+        assert np.array_equal(leaderboard.counts, counts), stage
+
+
+def test_leaderboard_update_only_rescoring_changes(preds, rounds):
+    leaderboard = Leaderboard(preds)
+    results = results_at(preds, rounds)
+    leaderboard.update(results)
+    assert len(leaderboard.update(results_at(preds, rounds))) == 0
+
+
+def test_leaderboard_reload_keeps_parity(preds, rounds):
+    results = results_at(preds, rounds)
+    leaderboard = Leaderboard(preds)
+    leaderboard.update(results)
+
+    first, second = preds.names[:2]
+    # One participant takes another one's predictions, the last one leaves
+    replaced = preds.replace({first: load_prediction(PREDICTIONS_DIR, second)}, removed=[preds.names[-1]])
+    leaderboard.reload(replaced, {first})
+    states, counts = score_predictions(replaced, results)
+    assert np.array_equal(leaderboard.states, states)
+    assert np.array_equal(leaderboard.counts, counts)
+
+
+def test_scoring_rules():
+    rules = scoring_rules({'res_exacto': 3}, 'Francia')
+    assert rules.points.tolist() == [3, *DEFAULT_RULES.points.tolist()[1:]]
+    assert rules.champion == 'Francia'
+    with pytest.raises(ValueError):
+        scoring_rules({'goles': 1})
+    with pytest.raises(ValueError):
+        scoring_rules({'final': -1})
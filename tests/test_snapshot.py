@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import numpy as np
+
+from app.snapshot import SnapshotStore
+
+
+def build(value):
+    return lambda: {'counts': np.full((2, 3), value)}
+
+
+def snapshots(store):
+    return sorted(
+        entry.name.split('-', 1)[1] for entry in os.scandir(store.directory)
+        if entry.is_dir() and not entry.name.startswith('.'))
+
+
+def age(store, version, seconds):
+    path = store.path(version)
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_load_or_build_builds_once(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    first = store.load_or_build('default-a', build(1))
+    second = store.load_or_build('default-a', build(2))
+    assert store.builds == 1
+    assert (first['counts'] == 1).all() and (second['counts'] == 1).all()
+    assert not second['counts'].flags.writeable
+
+
+def test_prune_keeps_the_newest_of_every_family(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    for i, version in enumerate(['default-a', 'default-b', 'default-c']):
+        store.load_or_build(version, build(i))
+        age(store, version, 100 - i)
+    for i, version in enumerate(['other-league-a', 'other-league-b']):
+        store.load_or_build(version, build(i))
+        age(store, version, 50 - i)
+    store.prune('default-c')
+    store.prune('other-league-b')
+    assert snapshots(store) == ['default-b', 'default-c', 'other-league-a', 'other-league-b']
+
+    # A busy league does not evict the snapshots of the others
+    for i, version in enumerate(['default-d', 'default-e', 'default-f']):
+        store.load_or_build(version, build(i))
+        age(store, version, 10 - i)
+    assert snapshots(store) == ['default-e', 'default-f', 'other-league-a', 'other-league-b']
+
+
+def test_load_missing_snapshot_is_a_miss(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    assert store.load('default-a') is None
+    store.load_or_build('default-a', build(1))
+
+    # Removed halfway by a concurrent prune
+    os.remove(os.path.join(store.path('default-a'), 'counts.npy'))
+    assert store.load('default-a') is None
+    os.remove(os.path.join(store.path('default-a'), 'meta.json'))
+    assert store.load('default-a') is None
+    shutil.rmtree(store.path('default-a'))
+    assert store.load('default-a') is None
+
+
+def test_load_or_build_serves_the_build_if_pruned(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    monkeypatch.setattr(store, 'prune', lambda version: shutil.rmtree(store.path(version)))
+    arrays = store.load_or_build('default-a', build(3))
+    assert (arrays['counts'] == 3).all()
+    assert not arrays['counts'].flags.writeable
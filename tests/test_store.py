@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.store import directory_signature, load_store, open_predictions
+
+from tests.conftest import PREDICTIONS_DIR
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / 'predictions.bin')
+    matrix = open_predictions(PREDICTIONS_DIR, path)
+    return path, matrix
+
+
+def test_load_store_round_trip(store):
+    path, matrix = store
+    loaded = load_store(path, directory_signature(PREDICTIONS_DIR))
+    assert loaded.names == matrix.names
+    assert np.array_equal(loaded.home, matrix.home)
+    assert loaded.champion_name == matrix.champion_name
+
+
+def test_load_store_out_of_date(store):
+    path, _ = store
+    assert load_store(path, {'other.txt': [0, 0]}) is None
+
+
+@pytest.mark.parametrize('keep', [0, 10, 100, 1000, -100, -1])
+def test_truncated_store_is_rebuilt(store, keep):
+    path, matrix = store
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:keep])
+    assert load_store(path, directory_signature(PREDICTIONS_DIR)) is None
+
+    rebuilt = open_predictions(PREDICTIONS_DIR, path)
+    assert rebuilt.names == matrix.names
+    assert os.path.getsize(path) == len(data)
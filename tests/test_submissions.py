@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from app.submissions import ACCEPTED, FORBIDDEN, SubmissionLog, entry_predictions, validate
+
+from tests.conftest import PREDICTIONS_DIR
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def text():
+    with open(PREDICTIONS_DIR + 'angel.txt', 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def merged():
+    return []
+
+
+@pytest.fixture
+def log(tmp_path, merged):
+    submissions = SubmissionLog(str(tmp_path / 'submissions.log'), on_entries=merged.extend, interval=0.1)
+    yield submissions
+    submissions.stop()
+
+
+def test_validate(text):
+    prediction, errors = validate('pepe', text)
+    assert errors == [] and prediction.name == 'pepe.txt'
+    assert validate('Pepe!', text)[1]
+    assert validate(3, text)[1]
+    assert validate('pepe', ['x'])[1]
+    assert validate('pepe', 'x' * 20000)[1]
+    assert validate('pepe', 'x')[1]
+
+
+def test_submit_and_replace(log, merged, text):
+    status, token = log.submit('pepe', text).result(TIMEOUT)
+    assert status == ACCEPTED and token
+    assert log.submit('pepe', text).result(TIMEOUT) == (FORBIDDEN, None)
+    assert log.submit('pepe', text, 'wrong').result(TIMEOUT) == (FORBIDDEN, None)
+    assert log.submit('pepe', text, token).result(TIMEOUT) == (ACCEPTED, token)
+    assert [entry['name'] for entry in merged] == ['pepe', 'pepe']
+    assert list(entry_predictions(merged)) == ['pepe.txt']
+
+
+def test_failed_batch_fails_its_callers_only(log, text, monkeypatch):
+    write = log._write
+    monkeypatch.setattr(log, '_write', lambda batch: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        log.submit('pepe', text).result(TIMEOUT)
+
+    # The writer thread survives and serves the next batch
+    monkeypatch.setattr(log, '_write', write)
+    assert log.submit('pepe', text).result(TIMEOUT)[0] == ACCEPTED
+
+
+def test_failed_merge_still_answers(tmp_path, text):
+    def on_entries(entries):
+        raise ValueError('bad merge')
+
+    submissions = SubmissionLog(str(tmp_path / 'submissions.log'), on_entries=on_entries, interval=0.1)
+    try:
+        assert submissions.submit('pepe', text).result(TIMEOUT)[0] == ACCEPTED
+    finally:
+        submissions.stop()
+
+
+def test_bad_and_torn_lines_are_skipped(log, text):
+    log.submit('pepe', text).result(TIMEOUT)
+    with open(log.path, 'a') as f:
+        f.write('not json\n')
+        f.write(json.dumps({'name': 'pepe', 'text': text, 'token': 'other', 'time': 0}) + '\n')
+        f.write('{"name": "torn"')
+
+    other = SubmissionLog(log.path)
+    try:
+        entries = other.sync()
+        assert [entry['name'] for entry in entries] == ['pepe']
+        with open(log.path, 'a') as f:
+            f.write(', "text": "", "token": "t", "time": 0}\n')
+        assert [entry['name'] for entry in other.sync()] == ['torn']
+    finally:
+        other.stop()
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from app.watcher import PredictionsWatcher
+
+
+def touch(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    # Distinct mtimes even on coarse clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_poll_once_reports_changes_once(tmp_path):
+    touch(tmp_path / 'a.txt', 'a')
+    calls = []
+    watcher = PredictionsWatcher(str(tmp_path), lambda changed, removed: calls.append((changed, removed)))
+    touch(tmp_path / 'a.txt', 'aa')
+    touch(tmp_path / 'b.txt', 'b')
+    assert watcher.poll_once() == (['a.txt', 'b.txt'], [])
+    os.remove(tmp_path / 'a.txt')
+    watcher.poll_once()
+    watcher.poll_once()
+    assert calls == [(['a.txt', 'b.txt'], []), ([], ['a.txt'])]
+
+
+def test_failed_on_change_is_retried(tmp_path):
+    calls = []
+
+    def on_change(changed, removed):
+        calls.append(changed)
+        if len(calls) == 1:
+            raise ValueError('bad file')
+
+    watcher = PredictionsWatcher(str(tmp_path), on_change)
+    touch(tmp_path / 'a.txt', 'a')
+    with pytest.raises(ValueError):
+        watcher.poll_once()
+    watcher.poll_once()
+    watcher.poll_once()
+    assert calls == [['a.txt'], ['a.txt']]
+
+
+def test_files_reported_as_failed_are_retried_alone(tmp_path):
+    touch(tmp_path / 'a.txt', 'a')
+    calls = []
+
+    def on_change(changed, removed):
+        calls.append(changed)
+        return ['b.txt'] if len(calls) == 1 else []
+
+    watcher = PredictionsWatcher(str(tmp_path), on_change)
+    touch(tmp_path / 'a.txt', 'aa')
+    touch(tmp_path / 'b.txt', 'b')
+    watcher.poll_once()
+    watcher.poll_once()
+    watcher.poll_once()
+    assert calls == [['a.txt', 'b.txt'], ['b.txt']]